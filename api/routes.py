@@ -1,5 +1,4 @@
 from flask import Blueprint, request, jsonify
-from functools import partial
 import os
 
 # Windows 多进程支持
@@ -10,19 +9,21 @@ if __name__ != '__main__' and os.name == 'nt':
     except:
         pass
 
-from utils.scan_engine import run_scan
 from functions.weather import WeatherPredictor
 from functions.mines import MinesPredictor
 from functions.chests import ChestsPredictor
-from functions.desert_festival import DesertFestivalPredictor
+from functions.desert_festival import DesertFestivalPredictor, DesertScenario
 from functions.night_events import predict_night_event_for_day
 from services.predict import (
     evaluate_weather_clauses,
-    no_infested_in_range,
-    collect_levels_from_rules,
     check_chest_rules_nested,
     evaluate_saloon_trash_range,
+    half_id_key_for,
 )
+from services.query_plan import compile_query, evaluate_plan, plan_block_seeds, plan_fingerprint, tune_plan
+from services import worker_pool
+from utils.scan_engine import ScanStats
+from utils.scan_journal import open_journal
 from config import (
     TARGET_TYPES, WEATHER_CLAUSES,
     MINES_START_DAY, MINES_END_DAY, FLOOR_START, FLOOR_END, REQUIRE_NO_INFESTED,
@@ -30,174 +31,14 @@ from config import (
     REQUIRE_LEAH, REQUIRE_JAS,
     saloon_start_day, saloon_end_day, saloon_daily_luck, saloon_has_book, saloon_require_min_hit,
     NIGHT_CHECK_DAY, NIGHT_GREENHOUSE_UNLOCKED,
-    USE_LEGACY,
+    USE_LEGACY, CHEST_INDEX_PATH, NIGHT_EVENT_INDEX_PATH, SCAN_TARGET_SECONDS, SCAN_JOURNAL_DIR,
+    PREDICATE_PILOT_SAMPLES, PREDICATE_STATS_PATH,
 )
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
-# 全局 worker 函数（多进程序列化需要）
-def search_worker_multiprocess(args):
-    """
-    多进程 worker 函数 - 必须在模块级别定义以支持序列化
-    args: (seed, 参数字典)
-    """
-    seed, params = args
-    
-    # 解包参数
-    enable_weather = params['enable_weather']
-    weather_clauses = params['weather_clauses']
-    weather_targets = params['weather_targets']
-    enable_mines = params['enable_mines']
-    mines_start_day = params['mines_start_day']
-    mines_end_day = params['mines_end_day']
-    floor_start = params['floor_start']
-    floor_end = params['floor_end']
-    require_no_infested = params['require_no_infested']
-    enable_chests = params['enable_chests']
-    chest_rules_mode = params['chest_rules_mode']
-    chest_rules = params['chest_rules']
-    enable_desert = params['enable_desert']
-    require_leah = params['require_leah']
-    require_jas = params['require_jas']
-    enable_saloon = params['enable_saloon']
-    saloon_start_day = params['saloon_start_day']
-    saloon_end_day = params['saloon_end_day']
-    saloon_daily_luck = params['saloon_daily_luck']
-    saloon_has_book = params['saloon_has_book']
-    saloon_require_min_hit = params['saloon_require_min_hit']
-    enable_night_event = params['enable_night_event']
-    night_check_day = params['night_check_day']
-    night_greenhouse_unlocked = params['night_greenhouse_unlocked']
-    use_legacy = params['use_legacy']
-    
-    # 默认返回容器（短路时也能返回）
-    matched = []
-    mines_detail = []
-    chests_detail = {}
-    desert_detail = {}
-    saloon_out = None
-    saloon_tag = None
-    saloon_ok = True
-    night_detail = None
-    night_ok = True
-
-    tasks = []  # (name, cost_estimate, fn)
-
-    # 夜间事件
-    if enable_night_event:
-        cost_night = 1
-        def _eval_night():
-            nonlocal night_detail, night_ok
-            ne = predict_night_event_for_day(
-                seed,
-                night_check_day,
-                day_adjust=0,
-                greenhouse_unlocked=night_greenhouse_unlocked,
-            )
-            night_detail = ne
-            night_ok = getattr(ne, 'is_fairy', False)
-            return night_ok
-        tasks.append(("night", cost_night, _eval_night))
-
-    # 沙漠节
-    if enable_desert:
-        cost_desert = 3  # 固定 3 天
-        def _eval_desert():
-            nonlocal desert_detail
-            ok = True
-            df = DesertFestivalPredictor(
-                game_id=seed,
-                use_legacy=use_legacy,
-                year=1,
-                leo_moved=False,
-                debug=False
-            )
-            res = df.vendors_for_three_days()
-            v15, v16, v17 = res[0], res[1], res[2]
-            desert_detail = {"春15": v15, "春16": v16, "春17": v17}
-            has_leah = any("Leah" in vendors for vendors in (v15, v16, v17))
-            has_jas  = any("Jas"  in vendors for vendors in (v15, v16, v17))
-            if require_leah and not has_leah:
-                ok = False
-            if require_jas and not has_jas:
-                ok = False
-            return ok
-        tasks.append(("desert", cost_desert, _eval_desert))
-
-    # 宝箱
-    if enable_chests and chest_rules:
-        unique_levels = len(collect_levels_from_rules(chest_rules))
-        cost_chests = max(1, unique_levels)
-        def _eval_chests():
-            nonlocal chests_detail
-            cp = ChestsPredictor(game_id=seed, use_legacy=use_legacy)
-            ok, detail = check_chest_rules_nested(cp, chest_rules, chest_rules_mode)
-            chests_detail = detail
-            return ok
-        tasks.append(("chests", cost_chests, _eval_chests))
-
-    # 天气（多区间 AND）
-    if enable_weather and weather_clauses:
-        # 估算成本：所有子区间长度之和（更贴近实际）
-        cost_weather = max(1, sum(int(c["end"]) - int(c["start"]) + 1 for c in weather_clauses))
-        def _eval_weather():
-            nonlocal matched
-            wp = WeatherPredictor(game_id=seed, use_legacy=use_legacy)
-            ok, matched_days = evaluate_weather_clauses(wp, weather_clauses, tuple(weather_targets))
-            matched = matched_days
-            return ok
-        tasks.append(("weather", cost_weather, _eval_weather))
-
-    # 垃圾桶
-    if enable_saloon:
-        span_saloon = max(0, saloon_end_day - saloon_start_day + 1)
-        cost_saloon = max(1, span_saloon * 220)  # 经验系数
-        def _eval_saloon():
-            nonlocal saloon_out, saloon_tag, saloon_ok
-            saloon_ok, saloon_tag, saloon_out = evaluate_saloon_trash_range(
-                seed,
-                start_day=saloon_start_day,
-                end_day=saloon_end_day,
-                daily_luck=saloon_daily_luck,
-                has_garbage_book=saloon_has_book,
-                daily_luck_by_day=None,
-                require_min_hit_days=saloon_require_min_hit,
-            )
-            return saloon_ok
-        tasks.append(("saloon", cost_saloon, _eval_saloon))
-
-    # 矿井
-    if enable_mines:
-        span_mines = max(0, mines_end_day - mines_start_day + 1)
-        cost_mines = max(1, span_mines * 1000)  # 经验系数（相对最贵）
-        def _eval_mines():
-            nonlocal mines_detail
-            mp = MinesPredictor(game_id=seed, use_legacy=use_legacy)
-            if require_no_infested:
-                ok, mines_detail_local = no_infested_in_range(mp, mines_start_day, mines_end_day, floor_start, floor_end)
-                mines_detail = mines_detail_local
-                return ok
-            else:
-                mines_detail = mp.predict_infested_in_range(mines_start_day, mines_end_day)
-                return True
-        tasks.append(("mines", cost_mines, _eval_mines))
-
-    # 没开任何功能 → 直接通过
-    if not tasks:
-        return (seed, matched, mines_detail, chests_detail, desert_detail, True, saloon_out, saloon_tag, saloon_ok, night_detail, night_ok)
-
-    # 动态排序 + 短路
-    tasks.sort(key=lambda x: x[1])
-    for task_name, _cost, fn in tasks:
-        try:
-            if not fn():
-                # 短路：第一个失败就返回
-                return (seed, matched, mines_detail, chests_detail, desert_detail, False, saloon_out, saloon_tag, saloon_ok, night_detail, night_ok)
-        except Exception as e:
-            return (seed, matched, mines_detail, chests_detail, desert_detail, False, saloon_out, saloon_tag, saloon_ok, night_detail, night_ok)
-
-    # 全部通过
-    return (seed, matched, mines_detail, chests_detail, desert_detail, True, saloon_out, saloon_tag, saloon_ok, night_detail, night_ok)
+# 单进程降级时每块的 gameID 数
+_FALLBACK_BLOCK = 1 << 16
 
 @bp.post('/weather')
 def api_weather():
@@ -229,21 +70,23 @@ def api_mines():
     floor_start = int(data.get('floor_start', FLOOR_START))
     floor_end = int(data.get('floor_end', FLOOR_END))
     require_no_infested = bool(data.get('require_no_infested', REQUIRE_NO_INFESTED))
+    with_slime = bool(data.get('with_slime', False))
     mp = MinesPredictor(game_id=seed, use_legacy=USE_LEGACY)
-    if require_no_infested:
-        ok, details = no_infested_in_range(mp, start_day, end_day, floor_start, floor_end)
-    else:
-        ok = True
-        details = mp.predict_infested_in_range(start_day, end_day)
+    atlas = mp.atlas(start_day, end_day, with_slime=with_slime)
+    ok = not atlas.any_in(floor_start, floor_end) if require_no_infested else True
+    days = []
+    for d in range(atlas.start_day, atlas.end_day + 1):
+        day = {'abs_day': d, 'floors': sorted(atlas.floors(d))}
+        if with_slime:
+            day['slime_floors'] = sorted(atlas.slime_floors(d))
+        days.append(day)
     return jsonify({
         'ok': bool(ok),
         'start_day': start_day,
         'end_day': end_day,
         'floor_start': floor_start,
         'floor_end': floor_end,
-        'days': [
-            {'abs_day': d.abs_day, 'floors': sorted(list(d.floors))} for d in details
-        ]
+        'days': days,
     })
 
 @bp.post('/chests/check')
@@ -329,6 +172,11 @@ def api_night_event():
         'is_fairy': getattr(ne, 'is_fairy', False),
     })
 
+@bp.get('/pool/health')
+def api_pool_health():
+    """常驻进程池状态：ok / busy / dead、在途扫描数、进程数、换新上限、重建次数、已处理的搜索数"""
+    return jsonify(worker_pool.shared().health())
+
 @bp.post('/search')
 def api_search():
     """
@@ -379,6 +227,8 @@ def api_search():
     enable_desert = bool(data.get('enable_desert', False))
     require_leah = bool(data.get('require_leah', False))
     require_jas = bool(data.get('require_jas', False))
+    # 可选：多个存档状态假设（NPC 顺序 / 年份 / Leo / dayAdjust），任一满足即通过
+    desert_scenarios = tuple(DesertScenario.from_dict(s) for s in data.get('desert_scenarios', []))
     
     enable_saloon = bool(data.get('enable_saloon', False))
     saloon_start_day = int(data.get('saloon_start_day', 1))
@@ -393,39 +243,32 @@ def api_search():
     
     use_legacy = bool(data.get('use_legacy', USE_LEGACY))
     
-    # 准备参数字典（传递给 worker 函数）
-    worker_params = {
-        'enable_weather': enable_weather,
-        'weather_clauses': weather_clauses,
-        'weather_targets': weather_targets,
-        'enable_mines': enable_mines,
-        'mines_start_day': mines_start_day,
-        'mines_end_day': mines_end_day,
-        'floor_start': floor_start,
-        'floor_end': floor_end,
-        'require_no_infested': require_no_infested,
-        'enable_chests': enable_chests,
-        'chest_rules_mode': chest_rules_mode,
-        'chest_rules': chest_rules,
-        'enable_desert': enable_desert,
-        'require_leah': require_leah,
-        'require_jas': require_jas,
-        'enable_saloon': enable_saloon,
-        'saloon_start_day': saloon_start_day,
-        'saloon_end_day': saloon_end_day,
-        'saloon_daily_luck': saloon_daily_luck,
-        'saloon_has_book': saloon_has_book,
-        'saloon_require_min_hit': saloon_require_min_hit,
-        'enable_night_event': enable_night_event,
-        'night_check_day': night_check_day,
-        'night_greenhouse_unlocked': night_greenhouse_unlocked,
-        'use_legacy': use_legacy,
-    }
-    
-    # 生成种子列表并准备多进程参数
+    # 编译查询计划：参数校验 / 宝箱别名解析 / 成本排序只做一次，子进程启动时装入一次
     # seed_range 是结束种子值，不是范围长度
-    seeds = list(range(seed_start, seed_range + 1))
-    seed_args = [(seed, worker_params) for seed in seeds]
+    seeds = range(seed_start, seed_range + 1)
+    try:
+        plan = compile_query(
+            use_legacy=use_legacy,
+            weather=(weather_clauses, tuple(weather_targets)) if enable_weather else None,
+            mines=(mines_start_day, mines_end_day, floor_start, floor_end, require_no_infested) if enable_mines else None,
+            chests=(chest_rules, chest_rules_mode) if enable_chests else None,
+            desert=(require_leah, require_jas, desert_scenarios) if enable_desert else None,
+            saloon=(saloon_start_day, saloon_end_day, saloon_daily_luck, saloon_has_book, saloon_require_min_hit) if enable_saloon else None,
+            night=(night_check_day, night_greenhouse_unlocked) if enable_night_event else None,
+            catch_errors=True,
+            details=False,  # 只返回命中的种子号
+            # 宝箱索引 / 垃圾桶样本表 / 天气子句 / 矿井无怪物层在 worker 里按块批量预筛，必然失败的种子不再逐个判定
+            sieve=True, chest_index=CHEST_INDEX_PATH, night_index=NIGHT_EVENT_INDEX_PATH,
+        )
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        # 参数对每个种子都必然判定失败：与逐个种子判定时一样返回 0 命中
+        return jsonify(_search_response(seed_start, seed_range, len(seeds), [], data, error=str(e)))
+
+    # 抽样实测各项耗时 / 通过率后重排判定顺序（见 services.query_plan.tune_plan）
+    plan, _ = tune_plan(plan, seeds, PREDICATE_PILOT_SAMPLES, PREDICATE_STATS_PATH)
+
+    # 启用的筛选全部只依赖 gameID / 2 时（矿井 / 沙漠节 / 夜间事件），成对的 gameID 只算一个（多进程时在子进程的块内合并）
+    half_key = half_id_key_for(plan.enabled, use_legacy)
     
     # 多进程处理（性能优化）
     import time
@@ -442,50 +285,87 @@ def api_search():
         print(f"[WARNING] 无法设置多进程启动方法: {e}")
         use_multiprocessing = False
     
+    # 配了 SCAN_JOURNAL_DIR 时记断点续扫日志：服务重启后同一请求只扫没扫完的块。
+    # 日志按原始区间定位，已完成的块在派发前跳过，块内预筛只在剩下的空档上做
+    # 日志目录不可写 / 文件损坏是配置问题，在扫描之前直接报错，不当作进程池故障去降级
+    journal = None
+    if use_multiprocessing and SCAN_JOURNAL_DIR:
+        try:
+            journal = open_journal(SCAN_JOURNAL_DIR, plan_fingerprint(plan), seeds)
+        except (OSError, ValueError) as e:
+            return jsonify(_search_response(seed_start, seed_range, 0, [], data, error=f"断点续扫日志不可用：{e}")), 500
+
     if use_multiprocessing:
         try:
             # print(f"[DEBUG] 开始多进程处理 {len(seeds)} 个种子...")
-            results = run_scan(seed_args, search_worker_multiprocess, processes=None, chunksize=min(1000, max(1, len(seeds) // 8)))
-            
-            hit_seeds = []
-            for seed, matched, mines_detail, chests_detail, desert_detail, ok, saloon_out, saloon_tag, saloon_ok, night_detail, night_ok in results:
-                if ok:
-                    hit_seeds.append(seed)
+            # 提交给服务常驻的进程池（子进程已预热，见 services.worker_pool）；
+            # 按区间块派发（任务只有 (start, stop) 或打包的候选 gameID），子进程回传打包的命中 gameID
+            # 块大小按实测吞吐自适应（第一批 min(4096, 总数/8)），尾部逐块变小
+            scan_stats = ScanStats()
+            try:
+                hit_seeds = list(worker_pool.shared().scan_blocks(
+                    seeds, plan, block=min(4096, max(1, len(seeds) // 8)),
+                    target_seconds=SCAN_TARGET_SECONDS, stats=scan_stats, journal=journal,
+                ))
+            finally:
+                if journal is not None:
+                    journal.close()
             
             elapsed = time.time() - start_time
             # print(f"[DEBUG] 多进程处理完成，耗时 {elapsed:.2f} 秒，命中 {len(hit_seeds)} 个种子")
                     
         except Exception as e:
+            # 不重建共享池（别的请求可能正在用）；worker_pool 会在下次空闲取池时先做健康检查
             print(f"[ERROR] 多进程处理失败: {e}")
             use_multiprocessing = False
     
     if not use_multiprocessing:
         # print("[DEBUG] 使用单线程处理...")
         # 降级到单线程
+        # 逐个判定只留命中；同一 half_key 的 gameID 在有序区间里相邻，沿用上一个的结论
+        # 同样按块预筛（见 services.query_plan.plan_block_seeds），内存只与块大小有关
         hit_seeds = []
-        for seed_arg in seed_args:
-            result = search_worker_multiprocess(seed_arg)
-            _, _, _, _, _, ok, _, _, _, _, _ = result
-            if ok:
-                hit_seeds.append(seed_arg[0])  # seed_arg[0] 是种子值
+        last_key = ok = None
+        for lo in range(seeds.start, seeds.stop, _FALLBACK_BLOCK):
+            for seed in plan_block_seeds(plan, (lo, min(lo + _FALLBACK_BLOCK, seeds.stop))):
+                k = None if half_key is None else half_key(seed)
+                if k is None or k != last_key:
+                    ok = evaluate_plan(plan, seed)[5]
+                    last_key = k
+                if ok:
+                    hit_seeds.append(seed)
         
         elapsed = time.time() - start_time
         # print(f"[DEBUG] 单线程处理完成，耗时 {elapsed:.2f} 秒，命中 {len(hit_seeds)} 个种子")
     
-    return jsonify({
+    out = _search_response(seed_start, seed_range, len(seeds), hit_seeds, data, order=plan.order)
+    if use_multiprocessing:
+        out['scan_stats'] = scan_stats.as_dict()  # 块大小范围与各子进程利用率
+        if journal is not None:
+            out['resumed_seeds'] = journal.resumed_seeds  # 从日志里直接取命中的 gameID 数
+    return jsonify(out)
+
+
+def _search_response(seed_start: int, seed_range: int, total_checked: int, hit_seeds, data, error=None, order=()):
+    out = {
         'seed_start': seed_start,
         'seed_range': seed_range,
-        'total_checked': len(seeds),
+        'total_checked': total_checked,
         'hit_count': len(hit_seeds),
         'hit_seeds': hit_seeds,
         'conditions': {
-            'weather': enable_weather,
-            'mines': enable_mines,
-            'chests': enable_chests,
-            'desert': enable_desert,
-            'saloon': enable_saloon,
-            'night_event': enable_night_event
+            'weather': bool(data.get('enable_weather', False)),
+            'mines': bool(data.get('enable_mines', False)),
+            'chests': bool(data.get('enable_chests', False)),
+            'desert': bool(data.get('enable_desert', False)),
+            'saloon': bool(data.get('enable_saloon', False)),
+            'night_event': bool(data.get('enable_night_event', False)),
         },
         # 可选：返回前几个详细结果作为示例（多进程版本简化返回）
-        'sample_results': []
-    })
+        'sample_results': [],
+        # 实际采用的判定顺序（抽样实测后按期望耗时排好）
+        'order': list(order),
+    }
+    if error is not None:
+        out['error'] = error
+    return out
@@ -17,6 +17,10 @@ SEED_RANGE = 500    # 共筛这么多个
 TARGET_TYPES: Tuple[str, ...] = ("Rain", "Storm", "Green Rain")  # 默认雨天类型集合
 
 # 每条规则：start, end, min_count, 可选 targets（不写则用上面的 TARGET_TYPES）
+# 可选 type（默认 "count"，还可写 max_count 上限）：
+#   {"type": "none",   "start": 5, "end": 7}                 5~7 日没有目标天气
+#   {"type": "streak", "start": 1, "end": 28, "length": 3}   春季至少连续 3 天目标天气
+#   {"type": "weekly", "start": 1, "end": 28}                每个游戏周至少 1 天（可写 min_count）
 WEATHER_CLAUSES: List[Dict] = [
     {"start": 7,  "end": 7,  "min_count": 1},
     {"start": 14, "end": 26, "min_count": 4},
@@ -48,6 +52,9 @@ CHEST_RULES: _List[ChestRule] = [
 # ========= 沙漠节筛选参数 =========
 REQUIRE_LEAH = True  # 至少一天出现 Leah
 REQUIRE_JAS  = True  # 至少一天出现 Jas
+# 可选：多个存档状态假设，任一场景满足即通过；空列表 = 只按默认（凌晨2点顺序、第1年、Leo 未搬家）判定
+# 每项可写 characters_in_order / year / leo_moved / day_adjust，未写的字段取默认值
+DESERT_SCENARIOS: List[Dict] = []
 
 # ===== Saloon 垃圾桶（日期区间） =====
 saloon_start_day = 1               # 开始日期（春1 = 1）
@@ -65,6 +72,15 @@ USE_LEGACY   = True
 SHOW_DATES   = True
 PROCESSES    = 0
 CHUNKSIZE    = 1000
+RNG_SAMPLE_CACHE_SIZE = 1 << 16    # 每个 worker 进程按 int32 RNG 种子缓存的样本前缀条数（0=关闭）
+RNG_SAMPLE_TABLE_PATH: Optional[str] = None  # 预计算样本表（python -m utils.sample_table build 生成），None=不用
+CHEST_INDEX_PATH: Optional[str] = None       # 宝箱结果索引（python -m functions.chest_index build 生成），None=不用
+NIGHT_EVENT_INDEX_PATH: Optional[str] = None # 夜间事件稀有种子索引（python -m functions.night_event_index build 生成），None=不用
+PREDICATE_PILOT_SAMPLES = 128                # 扫描前均匀抽这么多个 gameID 实测各筛选项的耗时 / 通过率，据此排判定顺序（0=按固定成本估计）
+PREDICATE_STATS_PATH: Optional[str] = None   # 实测统计按筛选项 + 参数形状存成 JSON，下次运行作为先验，None=不保存
+WORKER_MAX_TASKS: Optional[int] = 1000       # Flask 常驻进程池：每个子进程执行这么多个块后换新进程，None=不换
+SCAN_TARGET_SECONDS: Optional[float] = 0.25  # 区间块扫描每块的目标耗时（按实测吞吐调块大小，CHUNKSIZE 只作第一批），None=固定 CHUNKSIZE
+SCAN_JOURNAL_DIR: Optional[str] = None       # 断点续扫日志目录（每个查询 + 种子区间一个文件），中断后同一查询只扫剩下的块；扫完的日志保留，再扫直接读出；None=不记
 
 __all__ = [
     # switches
@@ -78,11 +94,13 @@ __all__ = [
     # chests
     'ChestAtom','ChestGroup','ChestRule','CHEST_RULES_MODE','CHEST_RULES',
     # desert
-    'REQUIRE_LEAH','REQUIRE_JAS',
+    'REQUIRE_LEAH','REQUIRE_JAS','DESERT_SCENARIOS',
     # saloon
     'saloon_start_day','saloon_end_day','saloon_daily_luck','saloon_has_book','saloon_require_min_hit',
     # night
     'NIGHT_CHECK_DAY','NIGHT_GREENHOUSE_UNLOCKED',
     # misc
-    'USE_LEGACY','SHOW_DATES','PROCESSES','CHUNKSIZE'
+    'USE_LEGACY','SHOW_DATES','PROCESSES','CHUNKSIZE','RNG_SAMPLE_CACHE_SIZE','RNG_SAMPLE_TABLE_PATH','CHEST_INDEX_PATH','NIGHT_EVENT_INDEX_PATH',
+    'PREDICATE_PILOT_SAMPLES','PREDICATE_STATS_PATH','WORKER_MAX_TASKS','SCAN_TARGET_SECONDS',
+    'SCAN_JOURNAL_DIR'
 ]
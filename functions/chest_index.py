@@ -0,0 +1,247 @@
+# functions/chest_index.py
+# 混合宝箱结果索引：对一段 gameID 预先算好每个“多选一”楼层的掉落下标，
+# 宝箱规则查询直接在索引上做集合运算、枚举命中的 gameID，不再逐个 gameID 播种。
+#
+# 文件格式（小端）：
+#   头 32 字节：magic(8s) = b"SDVCHX01", id_start(q), id_count(q), n_floors(i), flags(i)（bit0 = use_legacy）
+#   楼层表：n_floors 个 int32
+#   数据：按楼层分列，每列 id_count 个 uint8（该 gameID 在该层的掉落池下标），第 r 个对应 gameID id_start + r
+#
+# 生成（每台机器一次）：
+#   python -m functions.chest_index build --out chest_index.bin --start 0 --count 200000000
+# 然后在 config.py 里设置 CHEST_INDEX_PATH = "chest_index.bin"
+#
+# 查询时按块（默认 4M 个 gameID）把每个原子条件翻译成 0/1 字节串，转成大整数做 AND / OR，
+# 全程是 bytes.translate / 大整数位运算，不依赖 NumPy。
+
+import argparse
+import mmap
+import os
+import struct
+import time
+from typing import Dict, Iterator, Optional
+
+from data.chests_data import CHOICES as CHEST_CHOICES
+from functions.chests import ChestsPredictor
+
+MAGIC = b"SDVCHX01"
+HEADER = struct.Struct("<8sqqii")
+FLAG_LEGACY = 1
+# 只有这些楼层的掉落依赖种子（单一掉落的楼层结果恒定，不必入索引）
+INDEXED_FLOORS = sorted(lv for lv, pool in CHEST_CHOICES.items() if len(pool) > 1)
+
+
+class ChestIndex:
+    """只读映射一个宝箱索引文件"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, start, count, n_floors, flags = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} 不是宝箱索引文件（magic={magic!r}）")
+        floors = list(struct.unpack_from(f"<{n_floors}i", self._mm, HEADER.size))
+        data_off = HEADER.size + 4 * n_floors
+        expected = data_off + count * n_floors
+        if len(self._mm) < expected:
+            self.close()
+            raise ValueError(f"{path} 文件不完整：需要 {expected} 字节，实际 {len(self._mm)}")
+        self.id_start = start
+        self.id_count = count
+        self.use_legacy = bool(flags & FLAG_LEGACY)
+        self.floors = floors
+        self._col_off: Dict[int, int] = {lv: data_off + i * count for i, lv in enumerate(floors)}
+
+    def covers(self, lo: int, hi: int, use_legacy: bool = True) -> bool:
+        return (
+            self._mm is not None
+            and bool(use_legacy) == self.use_legacy
+            and self.id_start <= lo
+            and hi < self.id_start + self.id_count
+        )
+
+    def _column(self, floor: int, off: int, n: int) -> bytes:
+        base = self._col_off[floor] + off
+        return self._mm[base:base + n]
+
+    def outcome(self, game_id: int, floor: int) -> Optional[str]:
+        """索引里记录的掉落（英文标准名）；不在索引范围内的 gameID / 楼层返回 None"""
+        off = game_id - self.id_start
+        if floor not in self._col_off or not (0 <= off < self.id_count):
+            return None
+        return CHEST_CHOICES[floor][self._mm[self._col_off[floor] + off]]
+
+    def match_rules(self, rules, mode: str, lo: int, hi: int, block: int = 1 << 22) -> Iterator[int]:
+        """
+        按 services.predict.check_chest_rules_nested 的语义，升序枚举 [lo, hi] 内满足规则的 gameID。
+        规则里的物品名按 ChestsPredictor.normalize_item 归一（与逐个判定完全一致）。
+        """
+        if not self.covers(lo, hi, self.use_legacy):
+            raise ValueError(f"[{lo}, {hi}] 不在索引范围内")
+        cp = ChestsPredictor(0, self.use_legacy)
+
+        def norm(node):
+            if isinstance(node, list):
+                return [norm(x) for x in node]
+            lv, item = node
+            return (lv, cp.normalize_item(item))
+
+        rules_norm = [norm(r) for r in rules or []]
+        any_mode = mode.upper() == "ANY"
+
+        start = lo
+        while start <= hi:
+            n = min(block, hi - start + 1)
+            off = start - self.id_start
+            ones = int.from_bytes(b"\x01" * n, "little")
+            tables: Dict[tuple, int] = {}
+
+            def atom(node) -> int:
+                lv, want = node
+                key = (lv, want)
+                mask = tables.get(key)
+                if mask is None:
+                    pool = CHEST_CHOICES.get(lv)
+                    if pool is None:
+                        mask = 0                      # 非宝箱层：pred 为 None，永不相等
+                    elif lv not in self._col_off:
+                        mask = ones if pool[0] == want else 0
+                    else:
+                        table = bytes(1 if i < len(pool) and pool[i] == want else 0 for i in range(256))
+                        mask = int.from_bytes(self._column(lv, off, n).translate(table), "little")
+                    tables[key] = mask
+                return mask
+
+            def or_group(group) -> int:
+                acc = 0
+                for elem in group:
+                    if isinstance(elem, list):
+                        sub = ones
+                        for a in elem:
+                            sub &= atom(a)
+                        acc |= sub
+                    else:
+                        acc |= atom(elem)
+                return acc
+
+            if not rules_norm:
+                result = ones
+            else:
+                result = 0 if any_mode else ones
+                for node in rules_norm:
+                    m = or_group(node) if isinstance(node, list) else atom(node)
+                    result = (result | m) if any_mode else (result & m)
+
+            flags = result.to_bytes(n, "little")
+            pos = flags.find(1)
+            while pos >= 0:
+                yield start + pos
+                pos = flags.find(1, pos + 1)
+            start += n
+
+    def close(self) -> None:
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+            self._file = None
+
+
+_opened: Dict[str, ChestIndex] = {}
+
+
+def open_index(path: Optional[str]) -> Optional[ChestIndex]:
+    """按路径缓存打开的索引；path 为空或文件不存在时返回 None（调用方回退到逐个判定）"""
+    if not path:
+        return None
+    idx = _opened.get(path)
+    if idx is None:
+        if not os.path.exists(path):
+            print(f"[WARNING] 宝箱索引 {path} 不存在，回退到逐个判定")
+            return None
+        idx = _opened[path] = ChestIndex(path)
+    return idx
+
+
+# —— 生成 ——
+
+def _column_numpy(floor: int, start: int, count: int, use_legacy: bool) -> bytes:
+    import numpy as np
+    from utils.dotnet_random_batch import nth_doubles
+    from utils.rng_wrappers_batch import get_random_seed_array
+
+    ids = np.arange(start, start + count, dtype=np.int64)
+    seeds = get_random_seed_array(ids * 512, floor, use_legacy=use_legacy)
+    idx = (nth_doubles(seeds, 1) * len(CHEST_CHOICES[floor])).astype(np.uint8)
+    return idx.tobytes()
+
+
+def _column_python(floor: int, start: int, count: int, use_legacy: bool) -> bytes:
+    from utils.dotnet_random import first_double
+
+    n = len(CHEST_CHOICES[floor])
+    cp = ChestsPredictor(0, use_legacy)
+    out = bytearray(count)
+    for r in range(count):
+        cp.game_id = start + r
+        out[r] = int(first_double(cp._seed_for_level(floor)) * n)
+    return bytes(out)
+
+
+def build(path: str, start: int, count: int, use_legacy: bool = True, block: int = 1 << 22, verbose: bool = True) -> None:
+    """把 gameID ∈ [start, start+count) 的各层掉落下标写到 path（先写临时文件，完成后原子替换）"""
+    if count < 1:
+        raise ValueError("count 必须 >= 1")
+    try:
+        import numpy  # noqa: F401
+        column = _column_numpy
+    except ImportError:
+        column = _column_python
+        block = min(block, 1 << 16)
+
+    floors = INDEXED_FLOORS
+    tmp = path + ".tmp"
+    t0 = time.time()
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, start, count, len(floors), FLAG_LEGACY if use_legacy else 0))
+        f.write(struct.pack(f"<{len(floors)}i", *floors))
+        for i, lv in enumerate(floors):
+            done = 0
+            while done < count:
+                n = min(block, count - done)
+                f.write(column(lv, start + done, n, use_legacy))
+                done += n
+                if verbose:
+                    print(f"\r楼层 {lv}（{i + 1}/{len(floors)}）：{done}/{count}（{time.time() - t0:.1f}s）", end="", flush=True)
+    os.replace(tmp, path)
+    if verbose:
+        size_mb = (HEADER.size + 4 * len(floors) + count * len(floors)) / (1 << 20)
+        print(f"\n完成：{path}，{size_mb:.1f} MB")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="混合宝箱结果索引")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="生成索引")
+    b.add_argument("--out", default="chest_index.bin")
+    b.add_argument("--start", type=int, default=0, help="起始 gameID（含）")
+    b.add_argument("--count", type=int, default=1 << 24, help="gameID 个数")
+    b.add_argument("--hash-seed", action="store_true", help="按 1.6 新随机（非 legacy）播种")
+    i = sub.add_parser("info", help="查看索引头")
+    i.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        build(args.out, args.start, args.count, use_legacy=not args.hash_seed)
+    else:
+        idx = ChestIndex(args.path)
+        mode = "legacy" if idx.use_legacy else "hash"
+        print(f"{idx.path}: gameID [{idx.id_start}, {idx.id_start + idx.id_count}), floors={idx.floors}, {mode}")
+        idx.close()
+
+
+if __name__ == "__main__":
+    main()
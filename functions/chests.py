@@ -2,7 +2,7 @@
 from dataclasses import dataclass
 from typing import Dict, Optional, List
 from utils.rng_wrappers import get_random_seed
-from utils.dotnet_random import DotNetRandom
+from utils.dotnet_random import first_double
 from data.chests_data import CHOICES as CHEST_CHOICES, ALIASES as CHEST_ALIASES
 
 @dataclass
@@ -25,9 +25,8 @@ class ChestsPredictor:
         return CHEST_ALIASES
 
     # —— RNG —— 
-    def _rng_for_level(self, floor: int) -> DotNetRandom:
-        seed = get_random_seed(self.game_id * 512, floor, use_legacy=self.use_legacy)
-        return DotNetRandom(seed)
+    def _seed_for_level(self, floor: int) -> int:
+        return get_random_seed(self.game_id * 512, floor, use_legacy=self.use_legacy)
 
     # —— 名称归一/显示 —— 
     def _normalize_quotes(self, s: str) -> str:
@@ -49,9 +48,9 @@ class ChestsPredictor:
         """返回英文标准名；非宝箱层返回 None"""
         if floor not in self.choices:
             return None
-        rng = self._rng_for_level(floor)
         pool = self.choices[floor]
-        idx = rng.Next(len(pool))
+        # 等价于 DotNetRandom(seed).Next(len(pool))
+        idx = int(first_double(self._seed_for_level(floor)) * len(pool))
         return pool[idx]
 
     def get_reward_name_for_level(self, floor: int) -> Optional[str]:
@@ -1,8 +1,31 @@
-from typing import Dict, List, Tuple
-from utils.dotnet_random import DotNetRandom
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Sequence, Tuple
+from utils.sample_cache import cached_doubles
 from utils.rng_wrappers import get_random_seed
 from data.characters_order import CHARACTERS_IN_ORDER
 
+
+@dataclass(frozen=True)
+class DesertScenario:
+    """
+    一种存档状态假设：NPC 顺序（受前几晚睡觉时间影响）、年份、Leo 是否已搬家、dayAdjust。
+    同一 gameID 下不同场景的 RNG 样本序列只随 day_adjust 变化，其余字段只影响商人池。
+    """
+    characters_in_order: Tuple[str, ...] = tuple(CHARACTERS_IN_ORDER)
+    year: int = 1
+    leo_moved: bool = False
+    day_adjust: int = 0
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "DesertScenario":
+        return cls(
+            characters_in_order=tuple(d.get("characters_in_order", CHARACTERS_IN_ORDER)),
+            year=int(d.get("year", 1)),
+            leo_moved=bool(d.get("leo_moved", False)),
+            day_adjust=int(d.get("day_adjust", 0)),
+        )
+
 class DesertFestivalPredictor:
     # 来自 mouseypounds / 游戏：有资格成为沙漠节商人的角色集合
     POSSIBLE_VENDORS = {
@@ -27,24 +50,29 @@ class DesertFestivalPredictor:
         # 固定顺序（来自 save.characters），不要排序
         self.characters_in_order: List[str] = list(CHARACTERS_IN_ORDER)
 
-    def _rng(self, day_abs: int) -> DotNetRandom:
+    def _seed(self, day_abs: int) -> int:
         # 传统随机 + 整数除法 gameID//2
-        seed = get_random_seed(day_abs, self.game_id / 2, use_legacy=self.use_legacy)
-        return DotNetRandom(seed)
+        return get_random_seed(day_abs, self.game_id / 2, use_legacy=self.use_legacy)
 
-    def _build_pool_for_day(self, d: int) -> List[str]:
+    @classmethod
+    def _vendor_pool(cls, characters_in_order: Iterable[str], year: int, leo_moved: bool, d: int) -> List[str]:
+        """春 15+d 的商人池：按 characters_in_order 的顺序，去掉非商人、当天有日程的、第一年的 Kent、没搬家的 Leo"""
+        exc = cls.SCHEDULE_EXCLUSION[d]
         pool: List[str] = []
-        exc = self.SCHEDULE_EXCLUSION[d]
-        for name in self.characters_in_order:
-            if name not in self.POSSIBLE_VENDORS:
+        for name in characters_in_order:
+            if name not in cls.POSSIBLE_VENDORS:
                 continue
             if name in exc:
                 continue
-            if name == 'Kent' and self.year < 2:
+            if name == 'Kent' and year < 2:
                 continue
-            if name == 'Leo' and not self.leo_moved:
+            if name == 'Leo' and not leo_moved:
                 continue
             pool.append(name)
+        return pool
+
+    def _build_pool_for_day(self, d: int) -> List[str]:
+        pool = self._vendor_pool(self.characters_in_order, self.year, self.leo_moved, d)
         if self.debug:
             print(f"[DEBUG] 春{15+d} vendorPool: {pool}")
         return pool
@@ -54,25 +82,73 @@ class DesertFestivalPredictor:
         for d in range(3):  # 0→春15, 1→春16, 2→春17
             day_abs = 15 + d
             pool = self._build_pool_for_day(d)
-            rng = self._rng(day_abs)
+            # 当天共 2*d + 2 次 rng.Next(len(pool))，一次取齐
+            rolls = iter(cached_doubles(self._seed(day_abs), 2 * d + 2))
 
             # 先移除 2*d 个（跨日不重复）
             for _ in range(d):
                 for __ in range(2):
-                    idx = rng.Next(len(pool))
+                    idx = int(next(rolls) * len(pool))
                     if self.debug:
                         print(f"[DEBUG] 春{15+d} 预移除 idx={idx}, {pool[idx]}")
                     pool.pop(idx)
 
             # 当天抽 2 人
             for __ in range(2):
-                idx = rng.Next(len(pool))
+                idx = int(next(rolls) * len(pool))
                 pick = pool.pop(idx)
                 if self.debug:
                     print(f"[DEBUG] 春{15+d} 选择 idx={idx}, {pick}")
                 vendors[d].append(pick)
         return vendors
 
+    # —— 多场景：每个 (day_adjust, 天) 只取一次样本，只在下标上重放 pop，再按各场景的商人池取名字 ——
+    @classmethod
+    def _scenario_pool(cls, scenario: DesertScenario, d: int) -> Tuple[str, ...]:
+        return tuple(cls._vendor_pool(scenario.characters_in_order, scenario.year, scenario.leo_moved, d))
+
+    @classmethod
+    @lru_cache(maxsize=64)
+    def _scenario_plan(cls, scenarios: Tuple[DesertScenario, ...]):
+        """每天：各场景的 (day_adjust, 商人池) 及用到的 (day_adjust, 池大小) 组合（与种子无关，按场景集合缓存）"""
+        plan = []
+        for d in range(3):
+            pools = [(sc.day_adjust, cls._scenario_pool(sc, d)) for sc in scenarios]
+            shapes = sorted({(adj, len(pool)) for adj, pool in pools})
+            plan.append((pools, shapes))
+        return plan
+
+    def vendors_for_scenarios(self, scenarios: Sequence[DesertScenario]) -> List[Tuple[str, ...]]:
+        """
+        对每个场景返回春15/16/17 的 6 个商人（每天 2 人，按天依次排开），与逐个场景调用
+        vendors_for_three_days 的结果一致。pop 的下标序列只取决于样本和池大小，
+        所以每个 (day_adjust, 池大小) 只模拟一次，得到被选中的是原池第几个，再到各场景的池里取名字。
+        """
+        out: List[List[str]] = [[] for _ in scenarios]
+        for d, (pools, shapes) in enumerate(self._scenario_plan(tuple(scenarios))):
+            picked = {}
+            for adj, size in shapes:
+                rolls = cached_doubles(self._seed(15 + d + adj), 2 * d + 2)
+                slots = list(range(size))
+                for x in rolls[:2 * d]:
+                    slots.pop(int(x * len(slots)))
+                a = slots.pop(int(rolls[2 * d] * len(slots)))
+                b = slots.pop(int(rolls[2 * d + 1] * len(slots)))
+                picked[adj, size] = (a, b)
+            for i, (adj, pool) in enumerate(pools):
+                a, b = picked[adj, len(pool)]
+                out[i].append(pool[a])
+                out[i].append(pool[b])
+        return [tuple(v) for v in out]
+
+    def vendor_presence(self, scenarios: Sequence[DesertScenario], names: Iterable[str]) -> List[int]:
+        """每个场景一个位掩码：names[j] 在三天任意一天出摊则第 j 位为 1"""
+        names = list(names)
+        return [
+            sum(1 << j for j, n in enumerate(names) if n in vendors)
+            for vendors in self.vendors_for_scenarios(scenarios)
+        ]
+
     def leah_in_festival(self) -> Dict[int, Tuple[bool, List[str]]]:
         vmap = self.vendors_for_three_days()
         return {d: ('Leah' in vmap[d], vmap[d]) for d in range(3)}
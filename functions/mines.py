@@ -1,15 +1,61 @@
 # functions/mines.py
 # 矿井“怪物层 / 史莱姆层（Infested）”预测 —— 1.6+ 实现
 from dataclasses import dataclass
-from typing import List, Set
-from utils.dotnet_random import DotNetRandom
-from utils.rng_wrappers import get_random_seed
+from typing import List, Optional, Set, Tuple
+from utils.dotnet_random import first_double, nth_double
+from utils.rng_wrappers import MBIG, get_random_seed
+
+INFESTED_CHANCE = 0.044
 
 @dataclass
 class DayInfested:
     abs_day: int        # 绝对天数（Year1 春1 = 1）
     floors: Set[int]    # 当天所有“怪物/史莱姆层”的楼层号（常规矿井 1..120）
 
+def _bit_floors(mask: int) -> Set[int]:
+    floors = set()
+    while mask:
+        low = mask & -mask
+        floors.add(low.bit_length() - 1)
+        mask ^= low
+    return floors
+
+def _floor_mask(floor_start: int, floor_end: int) -> int:
+    """第 floor_start..floor_end 位为 1（楼层号即位号）"""
+    lo, hi = max(0, floor_start), min(119, floor_end)
+    return ((1 << (hi + 1)) - (1 << lo)) if hi >= lo else 0
+
+@dataclass
+class MinesAtlas:
+    """
+    连续若干天的怪物层位图：rows[i] 是第 start_day + i 天，第 L 位 = 第 L 层为怪物/史莱姆层。
+    只算了 [floor_start, floor_end] 内的楼层；slime 非 None 时同样按天给出“史莱姆层”位图。
+    """
+    start_day: int
+    floor_start: int
+    floor_end: int
+    rows: List[int]
+    slime: Optional[List[int]] = None
+
+    @property
+    def end_day(self) -> int:
+        return self.start_day + len(self.rows) - 1
+
+    def floors(self, abs_day: int) -> Set[int]:
+        return _bit_floors(self.rows[abs_day - self.start_day])
+
+    def slime_floors(self, abs_day: int) -> Set[int]:
+        if self.slime is None:
+            raise ValueError("atlas 未区分怪物 / 史莱姆（with_slime=False）")
+        return _bit_floors(self.slime[abs_day - self.start_day])
+
+    def any_in(self, floor_start: int, floor_end: int) -> bool:
+        mask = _floor_mask(floor_start, floor_end)
+        return any(r & mask for r in self.rows)
+
+    def days(self) -> List[DayInfested]:
+        return [DayInfested(abs_day=self.start_day + i, floors=_bit_floors(r)) for i, r in enumerate(self.rows)]
+
 class MinesPredictor:
     def __init__(self, game_id: int, use_legacy: bool = True):
         self.game_id = int(game_id)
@@ -20,12 +66,9 @@ class MinesPredictor:
         self.quarry_unlocked = False # save.quarryUnlocked，新档默认未解锁
         # 备注：1.5 移除了“被感染的采石场层”，但这不影响我们“无怪物层”的筛选
 
-    def _cs_random(self, seed: int) -> DotNetRandom:
-        return DotNetRandom(seed)  # legacy RNG（System.Random）
-
-    def _seed_rng(self, *seed_args) -> DotNetRandom:
-        seed = get_random_seed(*seed_args, use_legacy=self.use_legacy)
-        return self._cs_random(seed)
+    def _next_double(self, *seed_args) -> float:
+        # legacy RNG（System.Random）播种后的第一次 NextDouble()
+        return first_double(get_random_seed(*seed_args, use_legacy=self.use_legacy))
 
     @staticmethod
     def _is_theme_window(level: int) -> bool:
@@ -33,42 +76,140 @@ class MinesPredictor:
         mod = level % 40
         return (mod > 5) and (mod < 30) and (mod != 19)
 
+    def _level_seed(self, day: int, level: int) -> int:
+        # 1.6+ 的播种方式（注意 game_id / 2 是“浮点除法”，不能用 //）
+        return get_random_seed(day + self.day_adjust, self.game_id / 2, level * 100, use_legacy=self.use_legacy)
+
     def _infested_floors_for_day(self, abs_day: int) -> Set[int]:
         """
         对应 mouseypounds 1.6 分支：
         rng = new CSRandom(getRandomSeed(day + save.dayAdjust, save.gameID/2, mineLevel*100))
         if (rng.NextDouble() < 0.044 && in theme window) -> Infested (Monster/Slime)
         """
-        day = abs_day
-        floors: Set[int] = set()
+        return self.atlas(abs_day, abs_day).floors(abs_day)
 
-        for level in range(1, 120):  # 1..119
-            if level % 5 == 0:
-                continue  # 跳过电梯层
-            # 1.6+ 的播种方式（注意 game_id / 2 是“浮点除法”，不能用 //）
-            rng = self._seed_rng(day + self.day_adjust, self.game_id / 2, level * 100)
-
-            if self._is_theme_window(level) and rng.NextDouble() < 0.044:
-                # 第二次 NextDouble() 仅用于 Monster/Slime 分类，这里我们二者都算“怪物层”
-                # rng.NextDouble() < 0.5 -> Monster，否则 Slime（不影响我们集合里是否收录）
-                _ = rng.NextDouble()
-                floors.add(level)
-                continue
-
-            # 1.6 分支还会判断“quarryLevel”，但与你的“无怪物层”筛选无关，这里可以忽略
-            # if rng.NextDouble() < 0.044 and self.quarry_unlocked and (level % 40 > 1):
-            #     pass  # 我们不将其计入怪物层集合
+    @staticmethod
+    def _check_days(start_abs_day: int, end_abs_day: int) -> None:
+        if start_abs_day < 1 or end_abs_day < start_abs_day:
+            raise ValueError("Invalid day range")
 
-            # 之后还有蘑菇层/光照等检查，与“是否怪物层”无关，省略
+    def atlas(
+        self,
+        start_abs_day: int,
+        end_abs_day: int,
+        floor_start: int = 1,
+        floor_end: int = 119,
+        *,
+        with_slime: bool = False,
+    ) -> MinesAtlas:
+        """
+        [start_abs_day, end_abs_day] 每天一个楼层位图，只播种 [floor_start, floor_end] 内会抽签的楼层。
+        with_slime=True 时再抽第二次 NextDouble() 区分怪物 / 史莱姆（< 0.5 为 Monster，否则 Slime）。
+        （1.6 分支之后还有采石场层 / 蘑菇层等判定，与“是否怪物层”无关，不模拟）
+        """
+        self._check_days(start_abs_day, end_abs_day)
+        levels = [lv for lv in _THEME_LEVELS if floor_start <= lv <= floor_end]
+        rows, slime = [], ([] if with_slime else None)
+        for day in range(start_abs_day, end_abs_day + 1):
+            row = s_row = 0
+            for level in levels:
+                seed = self._level_seed(day, level)
+                if first_double(seed) < INFESTED_CHANCE:
+                    row |= 1 << level
+                    if with_slime and nth_double(seed, 2) >= 0.5:
+                        s_row |= 1 << level
+            rows.append(row)
+            if with_slime:
+                slime.append(s_row)
+        return MinesAtlas(start_abs_day, floor_start, floor_end, rows, slime)
 
-        return floors
+    def first_infested(self, start_abs_day: int, end_abs_day: int, floor_start: int = 1, floor_end: int = 119) -> Optional[Tuple[int, int]]:
+        """只要是 / 否时用：按天、按楼层找第一个怪物层 (abs_day, level)，找到即返回；没有返回 None"""
+        self._check_days(start_abs_day, end_abs_day)
+        levels = [lv for lv in _THEME_LEVELS if floor_start <= lv <= floor_end]
+        for day in range(start_abs_day, end_abs_day + 1):
+            for level in levels:
+                if first_double(self._level_seed(day, level)) < INFESTED_CHANCE:
+                    return day, level
+        return None
 
     # 对外：在给定绝对天数范围内，按天返回结果
     def predict_infested_in_range(self, start_abs_day: int, end_abs_day: int) -> List[DayInfested]:
-        if start_abs_day < 1 or end_abs_day < start_abs_day:
-            raise ValueError("Invalid day range")
-        out: List[DayInfested] = []
-        for d in range(start_abs_day, end_abs_day + 1):
-            floors = self._infested_floors_for_day(d)
-            out.append(DayInfested(abs_day=d, floors=floors))
-        return out
+        return self.atlas(start_abs_day, end_abs_day).days()
+
+# 会抽 NextDouble() 的楼层：非电梯层且在主题窗口内
+_THEME_LEVELS = [lv for lv in range(1, 120) if lv % 5 != 0 and MinesPredictor._is_theme_window(lv)]
+
+
+# ---------------- 连续 gameID 区间的“无怪物层”筛 ----------------
+# legacy 播种下 getRandomSeed(day, gameID / 2, level * 100) = day + floor(gameID / 2) + 100 * level
+# （gameID 在 int32 内时各项都不会在 % MBIG 处回绕）。于是整段区间用到的 RNG 种子是几段连续整数：
+# 对每个种子只抽一次“NextDouble() < 0.044”，存成一个大整数位图 B（第 i 位 = 种子 s_lo + i），
+# 再对每个 (day, level) 把 B 右移 day + 100*level + h0 - s_lo 位、与坏 gameID 位图做 OR，
+# 一次移位就筛掉这一层在所有 gameID 上的命中（h = floor(gameID/2) - h0 为位图下标）。
+
+def _infested_bits(intervals, s_lo: int, span: int) -> int:
+    """intervals 内每个种子的感染位，打包成以 s_lo 为第 0 位的整数；区间外的位为 0"""
+    try:
+        import numpy as np
+        from utils.dotnet_random_batch import nth_doubles
+    except ImportError:
+        chars = bytearray(b"0" * span)
+        for a, b in intervals:
+            for s in range(a, b + 1):
+                if first_double(s) < INFESTED_CHANCE:
+                    chars[s - s_lo] = 49  # "1"
+        chars.reverse()
+        return int(chars, 2)
+    bits = np.zeros(span, dtype=bool)
+    for a, b in intervals:
+        bits[a - s_lo:b - s_lo + 1] = nth_doubles(np.arange(a, b + 1, dtype=np.int64), 1) < INFESTED_CHANCE
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+def scan_no_infested(
+    start_id: int,
+    end_id: int,
+    start_day: int,
+    end_day: int,
+    floor_start: int,
+    floor_end: int,
+    use_legacy: bool = True,
+) -> Optional[List[bool]]:
+    """
+    对 gameID ∈ [start_id, end_id] 批量判定 services.predict.no_infested_in_range 的 ok
+    （[start_day, end_day] 内 [floor_start, floor_end] 没有怪物层），按 gameID 顺序返回 bool 列表。
+    非 legacy 播种或 gameID 越出 int32 时返回 None，调用方应退回逐个 gameID 计算。
+    """
+    if end_id < start_id:
+        return []
+    if start_day < 1 or end_day < start_day:
+        return None
+    if not use_legacy or start_id < -(1 << 31) or end_id >= (1 << 31):
+        return None
+    levels = [lv for lv in _THEME_LEVELS if floor_start <= lv <= floor_end]
+    if not levels:
+        return [True] * (end_id - start_id + 1)
+
+    h0, h1 = start_id >> 1, end_id >> 1
+    width = h1 - h0 + 1
+    # 每层用到的种子：[start_day + 100L + h0, end_day + 100L + h1]，合并重叠段
+    intervals = []
+    for lv in levels:
+        a, b = start_day + 100 * lv + h0, end_day + 100 * lv + h1
+        if intervals and a <= intervals[-1][1] + 1:
+            intervals[-1][1] = max(intervals[-1][1], b)
+        else:
+            intervals.append([a, b])
+    s_lo, s_hi = intervals[0][0], intervals[-1][1]
+    if s_lo <= -MBIG or s_hi >= MBIG:
+        return None
+
+    seed_bits = _infested_bits(intervals, s_lo, s_hi - s_lo + 1)
+    bad = 0
+    for day in range(start_day, end_day + 1):
+        for lv in levels:
+            bad |= seed_bits >> (day + 100 * lv + h0 - s_lo)
+    bad_bytes = (bad & ((1 << width) - 1)).to_bytes((width + 7) >> 3, "little")
+    return [not (bad_bytes[i >> 3] >> (i & 7)) & 1
+            for i in ((g >> 1) - h0 for g in range(start_id, end_id + 1))]
@@ -0,0 +1,265 @@
+# functions/night_event_index.py
+# 夜间事件稀有种子索引：夜间事件只看 RNG 第 11~16 次 NextDouble() 是否落在 0.005 / 0.008 / 0.01 以下，
+# 绝大多数种子（约 94%）这几次都 >= 0.01，无论哪天都是 "None"。
+# 索引只保存“至少有一次 < 0.01”的 int32 种子（升序）及其 6 个分档码，查询时按
+#   seed = day + 1 + dayAdjust + floor(gameID / 2)
+# 把种子区间二分出来，再算回 gameID（2h、2h+1），不必逐个种子模拟。
+#
+# 文件格式（小端）：
+#   头 32 字节：magic(8s) = b"SDVNEX01", seed_start(q), seed_count(q), n_entries(q)
+#   数据：n_entries 个 int32 种子（升序），随后 n_entries 个 uint16 分档码
+#   分档码第 2k~2k+1 位 = 第 11+k 次 NextDouble() 的分档：0: <0.005, 1: <0.008, 2: <0.01, 3: >=0.01
+#
+# 生成（每台机器一次）：
+#   python -m functions.night_event_index build --out night_index.bin --start -1000000 --count 200000000
+# 然后在 config.py 里设置 NIGHT_EVENT_INDEX_PATH = "night_index.bin"
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional
+
+from utils.dotnet_random import first_doubles
+
+MAGIC = b"SDVNEX01"
+HEADER = struct.Struct("<8sqqq")
+WARMUP = 10          # 预热 NextDouble() 次数
+N_ROLLS = 6          # 第 11~16 次（温室修复时整体后移一位，故多存一次）
+THRESHOLDS = (0.005, 0.008, 0.01)
+BUCKET_NONE = 3
+CODE_NONE = sum(BUCKET_NONE << (2 * k) for k in range(N_ROLLS))  # 不在索引里的种子
+EVENTS = ("Fairy", "Witch", "Meteor", "Stone Owl", "Strange Capsule", "None")
+
+
+def _bucket(x: float) -> int:
+    return sum(1 for t in THRESHOLDS if x >= t)
+
+
+def event_from_code(code: int, day_number: int, *, day_adjust: int = 0, greenhouse_unlocked: bool = False) -> str:
+    """由分档码还原 functions.night_events.predict_night_event_for_day 的 event（条件链完全一致）"""
+    k = 1 if greenhouse_unlocked else 0
+    b = [(code >> (2 * (k + i))) & 3 for i in range(5)]
+    day_for_rng = day_number + 1 + day_adjust
+    month_index = (day_number - 1) // 28
+    year = 1 + (day_number - 1) // 112
+    if b[0] <= 2 and (month_index % 4) < 3:
+        return "Fairy"
+    if b[1] <= 2 and day_for_rng > 20:
+        return "Witch"
+    if b[2] <= 2 and day_for_rng > 5:
+        return "Meteor"
+    if b[3] == 0:
+        return "Stone Owl"
+    if b[4] <= 1 and year > 1:
+        return "Strange Capsule"
+    return "None"
+
+
+class NightEventIndex:
+    """只读映射一个夜间事件索引文件"""
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise RuntimeError("索引按小端存储，当前平台不支持直接映射")
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, start, count, n = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} 不是夜间事件索引文件（magic={magic!r}）")
+        expected = HEADER.size + n * 6
+        if len(self._mm) < expected:
+            self.close()
+            raise ValueError(f"{path} 文件不完整：需要 {expected} 字节，实际 {len(self._mm)}")
+        self.seed_start = start
+        self.seed_count = count
+        self.n_entries = n
+        self._seeds = memoryview(self._mm)[HEADER.size:HEADER.size + 4 * n].cast("i")
+        self._codes = memoryview(self._mm)[HEADER.size + 4 * n:expected].cast("H")
+
+    def covers_seeds(self, lo: int, hi: int) -> bool:
+        return self._mm is not None and self.seed_start <= lo and hi < self.seed_start + self.seed_count
+
+    def code(self, seed: int) -> int:
+        """种子的分档码；不在索引里（或索引范围外）一律视为 CODE_NONE——调用方应先用 covers_seeds 确认"""
+        i = bisect_left(self._seeds, seed)
+        if i < self.n_entries and self._seeds[i] == seed:
+            return self._codes[i]
+        return CODE_NONE
+
+    def event_for(self, game_id: int, day_number: int, *, day_adjust: int = 0, greenhouse_unlocked: bool = False) -> str:
+        """单个 gameID 单个白天 D 的夜间事件（legacy 播种，gameID 在 int32 内）"""
+        seed = day_number + 1 + day_adjust + (int(game_id) >> 1)
+        if not self.covers_seeds(seed, seed):
+            raise ValueError(f"种子 {seed} 不在索引范围内")
+        return event_from_code(self.code(seed), day_number, day_adjust=day_adjust, greenhouse_unlocked=greenhouse_unlocked)
+
+    def game_ids_with_event(
+        self,
+        event: str,
+        days: Iterable[int],
+        lo: int,
+        hi: int,
+        *,
+        day_adjust: int = 0,
+        greenhouse_unlocked: bool = False,
+    ) -> Optional[List[int]]:
+        """
+        gameID ∈ [lo, hi] 中，在 days 里任意一晚出现 event 的 gameID（升序）。
+        区间超出索引覆盖范围或 gameID 越出 int32 时返回 None（调用方回退到逐个判定）。
+        event 为 "None" 时不走索引（几乎所有种子都是 None），同样返回 None。
+        """
+        if event not in EVENTS or event == "None":
+            return None
+        if lo > hi:
+            return []
+        if lo < -(1 << 31) or hi >= (1 << 31):
+            return None
+        days = sorted(set(int(d) for d in days))
+        h0, h1 = lo >> 1, hi >> 1
+        if not days or not self.covers_seeds(days[0] + 1 + day_adjust + h0, days[-1] + 1 + day_adjust + h1):
+            return None if days else []
+
+        halves = set()
+        seeds, codes = self._seeds, self._codes
+        for d in days:
+            base = d + 1 + day_adjust
+            i = bisect_left(seeds, base + h0)
+            j = bisect_right(seeds, base + h1)
+            for p in range(i, j):
+                if event_from_code(codes[p], d, day_adjust=day_adjust, greenhouse_unlocked=greenhouse_unlocked) == event:
+                    halves.add(seeds[p] - base)
+        out = []
+        for h in sorted(halves):
+            for g in (2 * h, 2 * h + 1):
+                if lo <= g <= hi:
+                    out.append(g)
+        return out
+
+    def close(self) -> None:
+        for name in ("_seeds", "_codes"):
+            mv = getattr(self, name, None)
+            if mv is not None:
+                mv.release()
+                setattr(self, name, None)
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+            self._file = None
+
+
+_opened: Dict[str, NightEventIndex] = {}
+
+
+def open_index(path: Optional[str]) -> Optional[NightEventIndex]:
+    """按路径缓存打开的索引；path 为空或文件不存在时返回 None（调用方回退到逐个判定）"""
+    if not path:
+        return None
+    idx = _opened.get(path)
+    if idx is None:
+        if not os.path.exists(path):
+            print(f"[WARNING] 夜间事件索引 {path} 不存在，回退到逐个判定")
+            return None
+        idx = _opened[path] = NightEventIndex(path)
+    return idx
+
+
+# —— 生成 ——
+
+def _entries_numpy(start: int, count: int):
+    import numpy as np
+    from utils.dotnet_random_batch import nth_doubles
+
+    seeds = np.arange(start, start + count, dtype=np.int64)
+    code = np.zeros(count, dtype=np.uint16)
+    for k in range(N_ROLLS):
+        d = nth_doubles(seeds, WARMUP + 1 + k)
+        b = sum((d >= t).astype(np.uint16) for t in THRESHOLDS)
+        code |= b << np.uint16(2 * k)
+    keep = code != CODE_NONE
+    return seeds[keep].astype("<i4").tobytes(), code[keep].astype("<u2").tobytes()
+
+
+def _entries_python(start: int, count: int):
+    seeds, codes = array("i"), array("H")
+    for s in range(start, start + count):
+        rolls = first_doubles(s, WARMUP + N_ROLLS)[WARMUP:]
+        code = 0
+        for k, x in enumerate(rolls):
+            code |= _bucket(x) << (2 * k)
+        if code != CODE_NONE:
+            seeds.append(s)
+            codes.append(code)
+    return seeds.tobytes(), codes.tobytes()
+
+
+def build(path: str, start: int, count: int, block: int = 1 << 22, verbose: bool = True) -> None:
+    """扫描种子 [start, start+count)，把有稀有 roll 的种子写到 path（先写临时文件，完成后原子替换）"""
+    if count < 1 or start < -(1 << 31) or start + count - 1 >= (1 << 31):
+        raise ValueError("种子范围必须落在 int32 内")
+    try:
+        import numpy  # noqa: F401
+        entries = _entries_numpy
+    except ImportError:
+        entries = _entries_python
+        block = min(block, 1 << 16)
+
+    tmp = path + ".tmp"
+    codes_tmp = path + ".codes.tmp"
+    t0 = time.time()
+    n = 0
+    with open(tmp, "wb") as f, open(codes_tmp, "w+b") as fc:
+        f.write(HEADER.pack(MAGIC, start, count, 0))
+        done = 0
+        while done < count:
+            m = min(block, count - done)
+            s_bytes, c_bytes = entries(start + done, m)
+            f.write(s_bytes)
+            fc.write(c_bytes)
+            n += len(s_bytes) // 4
+            done += m
+            if verbose:
+                print(f"\r已扫描 {done}/{count} 个种子，收录 {n}（{time.time() - t0:.1f}s）", end="", flush=True)
+        fc.seek(0)
+        while True:
+            chunk = fc.read(1 << 24)
+            if not chunk:
+                break
+            f.write(chunk)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, start, count, n))
+    os.remove(codes_tmp)
+    os.replace(tmp, path)
+    if verbose:
+        print(f"\n完成：{path}，{(HEADER.size + 6 * n) / (1 << 20):.1f} MB")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="夜间事件稀有种子索引")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="生成索引")
+    b.add_argument("--out", default="night_index.bin")
+    b.add_argument("--start", type=int, default=-(1 << 24), help="起始 int32 种子（含）")
+    b.add_argument("--count", type=int, default=1 << 25, help="种子个数")
+    i = sub.add_parser("info", help="查看索引头")
+    i.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        build(args.out, args.start, args.count)
+    else:
+        idx = NightEventIndex(args.path)
+        print(f"{idx.path}: seeds [{idx.seed_start}, {idx.seed_start + idx.seed_count}), entries={idx.n_entries}")
+        idx.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,8 @@
 # 说明：事件在次日早上 6:00 进行 roll，因此 RNG 用 (D + 1)。
 # ------------------------------------------------------------
 from dataclasses import dataclass
-from typing import Dict, Any
-from utils.dotnet_random import DotNetRandom
+from typing import Dict, Any, List, Optional
+from utils.sample_cache import cached_doubles
 from utils.rng_wrappers import get_random_seed
 
 @dataclass
@@ -44,22 +44,19 @@ def predict_night_event_for_day(
     # RNG 初始化（注意 gameID / 2 为浮点，get_random_seed 支持）
     day_for_rng = day_number + 1 + day_adjust
     seed = get_random_seed(day_for_rng, game_id / 2)
-    rng = DotNetRandom(seed)
-
-    # 预热 10 次
-    for _ in range(10):
-        rng.NextDouble()
+    # 预热 10 次 + 风暴树 1 次 + 关键 roll 序列最多 5 次，一次取齐
+    rolls = iter(cached_doubles(seed, 16 if greenhouse_unlocked else 15)[10:])
 
     dbg: Dict[str, Any] = {"seed": seed, "day_for_rng": day_for_rng}
 
     # 风暴树（只影响风暴可能性提示，不影响 Fairy 判定）
     if greenhouse_unlocked:
-        could_be_windstorm = rng.NextDouble() < 0.1
+        could_be_windstorm = next(rolls) < 0.1
     else:
         could_be_windstorm = None  # 暂存，等 nextRoll 出来再赋值
 
     # 关键 roll 序列
-    next_roll = rng.NextDouble()
+    next_roll = next(rolls)
     if greenhouse_unlocked is False:
         could_be_windstorm = next_roll < 0.1
 
@@ -72,13 +69,13 @@ def predict_night_event_for_day(
     # Fairy 只在春夏秋触发（month%4 < 3）
     if next_roll < 0.01 and (month_index % 4) < 3:
         event = "Fairy"
-    elif rng.NextDouble() < 0.01 and day_for_rng > 20:
+    elif next(rolls) < 0.01 and day_for_rng > 20:
         event = "Witch"
-    elif rng.NextDouble() < 0.01 and day_for_rng > 5:
+    elif next(rolls) < 0.01 and day_for_rng > 5:
         event = "Meteor"
-    elif rng.NextDouble() < 0.005:
+    elif next(rolls) < 0.005:
         event = "Stone Owl"
-    elif rng.NextDouble() < 0.008 and year > 1:
+    elif next(rolls) < 0.008 and year > 1:
         event = "Strange Capsule"
 
     dbg.update({
@@ -94,3 +91,50 @@ def predict_night_event_for_day(
         is_fairy=(event == "Fairy"),
         debug=dbg,
     )
+
+
+def predict_night_events_in_range(
+    game_id: int,
+    start_day: int,
+    end_day: int,
+    *,
+    day_adjust: int = 0,
+    greenhouse_unlocked: bool = False,
+) -> List[NightEventResult]:
+    """单个 gameID 在白天 [start_day, end_day] 每晚的夜间事件"""
+    if start_day < 1 or end_day < start_day:
+        raise ValueError("Invalid day range")
+    return [
+        predict_night_event_for_day(game_id, d, day_adjust=day_adjust, greenhouse_unlocked=greenhouse_unlocked)
+        for d in range(start_day, end_day + 1)
+    ]
+
+
+def game_ids_with_night_event(
+    event: str,
+    start_day: int,
+    end_day: int,
+    lo: int,
+    hi: int,
+    *,
+    day_adjust: int = 0,
+    greenhouse_unlocked: bool = False,
+    index=None,
+) -> List[int]:
+    """
+    gameID ∈ [lo, hi] 中，白天 [start_day, end_day] 任意一晚出现 event（如 "Fairy"）的 gameID（升序）。
+    index 为 functions.night_event_index.NightEventIndex 且覆盖所需种子时直接查索引，否则逐个 gameID 判定。
+    """
+    if start_day < 1 or end_day < start_day:
+        raise ValueError("Invalid day range")
+    days = range(start_day, end_day + 1)
+    found: Optional[List[int]] = None
+    if index is not None:
+        found = index.game_ids_with_event(event, days, lo, hi, day_adjust=day_adjust, greenhouse_unlocked=greenhouse_unlocked)
+    if found is not None:
+        return found
+    return [
+        g for g in range(lo, hi + 1)
+        if any(predict_night_event_for_day(g, d, day_adjust=day_adjust, greenhouse_unlocked=greenhouse_unlocked).event == event
+               for d in days)
+    ]
@@ -6,13 +6,16 @@
 # - 种子推导与预热严格对齐 mouseypounds 1.6 逻辑
 # ------------------------------------------------------------
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 
-from utils.dotnet_random import DotNetRandom
-from utils.rng_wrappers import get_random_seed, get_hash_from_string
+from utils.dotnet_random import first_double, nth_double
+from utils.rng_wrappers import MBIG, get_random_seed, get_hash_from_string
 
 _CAN_ID_SALOON = "Saloon"               # canID[5] = "Saloon"
 _KEY_SALOON_DISH = "garbage_saloon_dish"
+# 播种用的字符串哈希常量（导入时算一次）
+_HASH_CAN_SALOON = get_hash_from_string(_CAN_ID_SALOON)
+_HASH_SALOON_DISH = get_hash_from_string(_KEY_SALOON_DISH)
 
 @dataclass
 class TrashResult:
@@ -21,7 +24,7 @@ class TrashResult:
     source: str             # 命中来源：DishOfTheDay / Fallback / QiBean / None
     debug: Dict[str, Any]   # 调试信息
 
-def _init_main_rng(game_id: int, day_number: int, day_adjust: int) -> DotNetRandom:
+def _main_seed(game_id: int, day_number: int, day_adjust: int) -> int:
     """
     JS 1.6：
     seed = getRandomSeed(day + save.dayAdjust, save.gameID / 2, 777 + getHashFromString(canID[whichCan]))
@@ -29,36 +32,34 @@ def _init_main_rng(game_id: int, day_number: int, day_adjust: int) -> DotNetRand
     """
     a = day_number + day_adjust
     b = game_id / 2          # JS 是除以 2（得到浮点），你的 get_random_seed 支持浮点参与
-    c = 777 + get_hash_from_string(_CAN_ID_SALOON)
-    seed = get_random_seed(a, b, c)
-    return DotNetRandom(seed)
+    c = 777 + _HASH_CAN_SALOON
+    return get_random_seed(a, b, c)
 
-def _prewarm_rng(rng: DotNetRandom) -> Dict[str, Any]:
+def _prewarm_rng(seed: int) -> Dict[str, Any]:
     """
     按 JS：预热两次
       prewarm = rng.Next(0,100); burn NextDouble() prewarm 次
       再重复一遍
+    不逐个丢弃样本：新播种 RNG 的第 n 个样本可直接算出（等价于 skip(n-1)），
+    返回的 "next_pos" 是预热之后下一次 NextDouble() 在序列中的位置（从 1 开始）。
     """
     dbg = {}
-    pre1 = rng.Next(0, 100)
-    for _ in range(pre1):
-        rng.NextDouble()
-    pre2 = rng.Next(0, 100)
-    for _ in range(pre2):
-        rng.NextDouble()
+    pre1 = int(nth_double(seed, 1) * 100)
+    pre2 = int(nth_double(seed, 2 + pre1) * 100)
     dbg["prewarm_counts"] = (pre1, pre2)
+    dbg["next_pos"] = 3 + pre1 + pre2
     return dbg
 
-def _init_synced_rng_for_saloon_dish(game_id: int, day_number: int, day_adjust: int) -> DotNetRandom:
+def _saloon_dish_roll(game_id: int, day_number: int, day_adjust: int) -> float:
     """
     JS：
-    new CSRandom(getRandomSeed(getHashFromString("garbage_saloon_dish"), save.gameID, day + save.dayAdjust))
+    new CSRandom(getRandomSeed(getHashFromString("garbage_saloon_dish"), save.gameID, day + save.dayAdjust)).NextDouble()
     """
-    a = get_hash_from_string(_KEY_SALOON_DISH)
+    a = _HASH_SALOON_DISH
     b = game_id
     c = day_number + day_adjust
     seed = get_random_seed(a, b, c)
-    return DotNetRandom(seed)
+    return first_double(seed)
 
 def _predict_saloon_drop_day_1_6(
     game_id: int,
@@ -86,24 +87,26 @@ def _predict_saloon_drop_day_1_6(
         luck_check += 0.2
 
     # 主 RNG & 预热
-    main_rng = _init_main_rng(game_id, day_number, day_adjust)
-    dbg = _prewarm_rng(main_rng)
+    main_seed = _main_seed(game_id, day_number, day_adjust)
+    dbg = _prewarm_rng(main_seed)
+    pos = dbg["next_pos"]
 
     source = "None"
     has_item = False
 
     # 齐豆优先（第一年默认 False）
-    if qi_crops_active and main_rng.NextDouble() < 0.25:
+    if qi_crops_active and nth_double(main_seed, pos) < 0.25:
         has_item = True
         source = "QiBean"
     else:
+        if qi_crops_active:
+            pos += 1  # 齐豆判定消耗了一次 NextDouble()
         # 基础通过判定
-        base_chance_passed = (main_rng.NextDouble() < luck_check)
+        base_chance_passed = (nth_double(main_seed, pos) < luck_check)
 
         if base_chance_passed:
             # Saloon 专属：Dish of the Day（独立同步 RNG）
-            dish_rng = _init_synced_rng_for_saloon_dish(game_id, day_number, day_adjust)
-            if dish_rng.NextDouble() < (0.2 + daily_luck):
+            if _saloon_dish_roll(game_id, day_number, day_adjust) < (0.2 + daily_luck):
                 has_item = True
                 source = "DishOfTheDay"
             else:
@@ -232,3 +235,187 @@ def predict_saloon_trash_in_range(
             "hit_days": hit_days,
         }
     }
+
+# === 原始样本表：任意运势 / 垃圾书设置都不必重新模拟 =========================
+# 区间判定（无齐豆）里真正用到 RNG 的只有两次 NextDouble()：预热之后的 base roll 与 Dish roll，
+# 运势和垃圾书只改变比较阈值。所以对一段 gameID × 天数先把这两次的 InternalSample()（int32，精确）
+# 存下来，之后每换一组 daily_luck / daily_luck_by_day / has_garbage_book 只是对整列做一次比较。
+# NextDouble() = sample * (1 / MBIG) 随 sample 单调，所以“NextDouble() < t”等价于“sample < 整数门限”，
+# 门限按同样的浮点运算校正（_sample_cut），比较直接在 int32 列上做，结果与逐个模拟逐位一致。
+# 与 _predict_saloon_drop_day_1_6 一样固定 legacy 播种。
+
+def _sample_cut(t: float) -> int:
+    """最小的 k 使 k * (1 / MBIG) >= t：sample * (1 / MBIG) < t 当且仅当 sample < k"""
+    inv = 1.0 / MBIG
+    k = min(max(int(t * MBIG), 0), MBIG)
+    while k > 0 and (k - 1) * inv >= t:
+        k -= 1
+    while k < MBIG and k * inv < t:
+        k += 1
+    return k
+
+
+# 建表时每段 gameID 的个数（NumPy 临时数组的长度）
+_BUILD_SLICE = 1 << 18
+
+
+class SaloonRollTable:
+    """gameID ∈ [start_id, end_id] × 游戏日 ∈ [start_day, end_day] 的 base / Dish 原始样本"""
+
+    def __init__(
+        self,
+        start_id: int,
+        end_id: int,
+        start_day: int,
+        end_day: int,
+        *,
+        day_adjust: int = 0,
+    ):
+        if start_day < 1 or end_day < start_day:
+            raise ValueError("start_day / end_day 必须为 >= 1 且 start_day <= end_day")
+        if end_id < start_id:
+            raise ValueError("end_id 必须 >= start_id")
+        self.start_id = int(start_id)
+        self.end_id = int(end_id)
+        self.start_day = int(start_day)
+        self.end_day = int(end_day)
+        self.day_adjust = int(day_adjust)
+        try:
+            import numpy  # noqa: F401
+            self._np = True
+            self.base, self.dish = self._build_numpy()
+        except ImportError:
+            self._np = False
+            self.base, self.dish = self._build_python()
+
+    def _build_numpy(self):
+        import numpy as np
+        from utils.dotnet_random_batch import nth_samples
+        from utils.rng_wrappers_batch import get_random_seed_array
+
+        inv = 1.0 / MBIG
+        n_ids = self.end_id - self.start_id + 1
+        n_days = self.end_day - self.start_day + 1
+        base = np.empty((n_days, n_ids), dtype=np.int32)
+        dish = np.empty((n_days, n_ids), dtype=np.int32)
+        # 按 gameID 分段算：int64 / float64 临时数组只有一段大，不随区间长度增长
+        for lo in range(0, n_ids, _BUILD_SLICE):
+            hi = min(n_ids, lo + _BUILD_SLICE)
+            ids = np.arange(self.start_id + lo, self.start_id + hi, dtype=np.int64)
+            for k in range(n_days):
+                day = self.start_day + k + self.day_adjust
+                main = get_random_seed_array(day, ids / 2, 777 + _HASH_CAN_SALOON)
+                pre1 = (nth_samples(main, 1) * inv * 100).astype(np.int64)
+                pre2 = (nth_samples(main, 2 + pre1) * inv * 100).astype(np.int64)
+                base[k, lo:hi] = nth_samples(main, 3 + pre1 + pre2)
+                dish[k, lo:hi] = nth_samples(get_random_seed_array(_HASH_SALOON_DISH, ids, day), 1)
+        return base, dish
+
+    def _build_python(self):
+        from array import array
+        from utils.dotnet_random import nth_sample
+
+        base, dish = [], []
+        for day in range(self.start_day, self.end_day + 1):
+            col_b, col_d = array("i"), array("i")
+            for g in range(self.start_id, self.end_id + 1):
+                main = _main_seed(g, day, self.day_adjust)
+                col_b.append(nth_sample(main, _prewarm_rng(main)["next_pos"]))
+                col_d.append(nth_sample(get_random_seed(_HASH_SALOON_DISH, g, day + self.day_adjust), 1))
+            base.append(col_b)
+            dish.append(col_d)
+        return base, dish
+
+    def matches(self, start_id: int, end_id: int, start_day: int, end_day: int, *, day_adjust: int = 0) -> bool:
+        return (self.start_id, self.end_id, self.start_day, self.end_day, self.day_adjust) == \
+            (int(start_id), int(end_id), int(start_day), int(end_day), int(day_adjust))
+
+    def dish_day_counts(
+        self,
+        *,
+        daily_luck: float = -0.1,
+        has_garbage_book: bool = False,
+        daily_luck_by_day: Optional[Dict[int, float]] = None,
+    ):
+        """每个 gameID 在天数区间内 source == "DishOfTheDay" 的天数（NumPy 时为 int 数组，否则为 list）"""
+        luck_map = daily_luck_by_day or {}
+        counts = None
+        if self._np:
+            import numpy as np
+        for k in range(self.end_day - self.start_day + 1):
+            luck = luck_map.get(self.start_day + k, daily_luck)
+            luck_check = 0.2 + luck
+            if has_garbage_book:
+                luck_check += 0.2
+            cut_b, cut_d = _sample_cut(luck_check), _sample_cut(0.2 + luck)
+            if self._np:
+                hit = (self.base[k] < cut_b) & (self.dish[k] < cut_d)
+                counts = hit.astype(np.int32) if counts is None else counts + hit
+            else:
+                hit = [b < cut_b and d < cut_d for b, d in zip(self.base[k], self.dish[k])]
+                counts = [int(h) for h in hit] if counts is None else [c + h for c, h in zip(counts, hit)]
+        return counts
+
+    def passing_ids(self, require_min_hit_days: int = 1, **luck) -> List[int]:
+        """与 services.predict.evaluate_saloon_trash_range 的 ok 相同：Dish 命中天数 >= max(1, require_min_hit_days)"""
+        need = max(1, int(require_min_hit_days))
+        counts = self.dish_day_counts(**luck)
+        if self._np:
+            import numpy as np
+            return (np.flatnonzero(counts >= need) + self.start_id).tolist()
+        return [self.start_id + i for i, c in enumerate(counts) if c >= need]
+
+
+# 单张表最多这么多个 (gameID, 天) 格子（两列 int32，约 32 MB）；只有不超过它的表会留作缓存，
+# 更大的区间按块建表，每块用完即丢（常驻的 Flask 进程里最多多占一张小表）
+SALOON_TABLE_MAX_CELLS = 1 << 22
+
+_last_table: Optional[SaloonRollTable] = None
+
+
+def saloon_roll_table(start_id: int, end_id: int, start_day: int, end_day: int, *, day_adjust: int = 0) -> SaloonRollTable:
+    """
+    同一区间重复查询（只改运势 / 垃圾书）时复用上一张表；只保留最近一张，
+    且格子数超过 SALOON_TABLE_MAX_CELLS 的表不缓存（照建照用，调用方用完即释放）。
+    """
+    global _last_table
+    if _last_table is not None and _last_table.matches(start_id, end_id, start_day, end_day, day_adjust=day_adjust):
+        return _last_table
+    _last_table = None  # 先释放旧表再建新表
+    table = SaloonRollTable(start_id, end_id, start_day, end_day, day_adjust=day_adjust)
+    if (int(end_id) - int(start_id) + 1) * (int(end_day) - int(start_day) + 1) <= SALOON_TABLE_MAX_CELLS:
+        _last_table = table
+    return table
+
+
+def scan_saloon_dish(
+    start_id: int,
+    end_id: int,
+    start_day: int,
+    end_day: int,
+    *,
+    daily_luck: float = -0.1,
+    has_garbage_book: bool = False,
+    daily_luck_by_day: Optional[Dict[int, float]] = None,
+    require_min_hit_days: int = 1,
+) -> Optional[List[int]]:
+    """
+    gameID ∈ [start_id, end_id] 中 services.predict.evaluate_saloon_trash_range 判定为 ok 的 gameID（升序）。
+    天数不合法时返回 None（调用方交给逐个判定，报错信息与原来一致）。
+    """
+    if start_day < 1 or end_day < 1:
+        return None
+    if end_day < start_day:
+        start_day, end_day = end_day, start_day
+    if end_id < start_id:
+        return []
+    luck = dict(daily_luck=daily_luck, has_garbage_book=has_garbage_book, daily_luck_by_day=daily_luck_by_day)
+    n_days = end_day - start_day + 1
+    if (end_id - start_id + 1) * n_days <= SALOON_TABLE_MAX_CELLS:
+        return saloon_roll_table(start_id, end_id, start_day, end_day).passing_ids(require_min_hit_days, **luck)
+    block = max(1, SALOON_TABLE_MAX_CELLS // n_days)
+    out: List[int] = []
+    for lo in range(start_id, end_id + 1, block):
+        table = SaloonRollTable(lo, min(end_id, lo + block - 1), start_day, end_day)
+        out.extend(table.passing_ids(require_min_hit_days, **luck))
+    return out
@@ -1,8 +1,9 @@
 # functions/weather.py
 from dataclasses import dataclass
-from typing import List, Literal, Dict
-from utils.dotnet_random import DotNetRandom
-from utils.rng_wrappers import get_random_seed, get_hash_from_string
+from itertools import accumulate
+from typing import List, Literal, Dict, Optional, Tuple
+from utils.dotnet_random import first_double
+from utils.rng_wrappers import MBIG, get_random_seed, get_hash_from_string
 
 WeatherEN = Literal["Sun", "Rain", "Storm", "Wind", "Green Rain", "Festival"]
 SEASON_EN = Literal["Spring", "Summer", "Fall", "Winter"]
@@ -21,6 +22,18 @@ FESTIVAL_MAP = {
 }
 FORCE_SUN_FESTIVALS = {13, 24, 72, 83, 92, 109}
 
+# 天气码：日历按天存 WEATHER_CODES 的下标（一字节一天）
+WEATHER_CODES: Tuple[str, ...] = ("Sun", "Rain", "Storm", "Wind", "Green Rain", "Festival")
+WEATHER_CODE: Dict[str, int] = {w: i for i, w in enumerate(WEATHER_CODES)}
+CODE_SUN, CODE_RAIN, CODE_STORM, CODE_GREEN_RAIN = (WEATHER_CODE[w] for w in ("Sun", "Rain", "Storm", "Green Rain"))
+
+GREEN_RAIN_DAYS = (5, 6, 7, 14, 15, 16, 18, 23)
+SPRING_FALL_RAIN_CHANCE = 0.183
+
+# 播种用的字符串哈希常量（导入时算一次）
+HASH_LOCATION_WEATHER = get_hash_from_string("location_weather")
+HASH_SUMMER_RAIN_CHANCE = get_hash_from_string("summer_rain_chance")
+
 @dataclass
 class DayWeather:
     abs_day: int
@@ -37,66 +50,74 @@ class WeatherPredictor:
         self.game_id = int(game_id)
         self.use_legacy = bool(use_legacy)
 
-    def _cs_random(self, seed: int) -> DotNetRandom:
-        return DotNetRandom(seed)  # legacy only for now
-
-    def _seed_rng(self, *seed_args) -> DotNetRandom:
-        seed = get_random_seed(*seed_args, use_legacy=self.use_legacy)
-        return self._cs_random(seed)
+    def _next_double(self, *seed_args) -> float:
+        # 每个 RNG 只取一次 NextDouble()，走 first_double 快速路径（legacy only for now）
+        return first_double(get_random_seed(*seed_args, use_legacy=self.use_legacy))
 
     @staticmethod
     def _season_of_month(m: int) -> SEASON_EN:
         return ("Spring", "Summer", "Fall", "Winter")[m % 4]
 
     def _green_rain_day_for_summer(self, year: int) -> int:
-        rng = self._seed_rng(year * 777, self.game_id)
-        return [5, 6, 7, 14, 15, 16, 18, 23][rng.Next(8)]
+        # rng.Next(8)
+        return GREEN_RAIN_DAYS[int(self._next_double(year * 777, self.game_id) * 8)]
 
-    def _roll_one(self, day1: int) -> DayWeather:
-        day = day1
-        month = (day - 1) // 28
-        season: SEASON_EN = self._season_of_month(month)
-        dom = ((day - 1) % 28) + 1
+    def calendar(self, start_abs_day: int, end_abs_day: int) -> bytes:
+        """
+        [start_abs_day, end_abs_day] 每天一个天气码（WEATHER_CODES 的下标），按天排成 bytes。
+        与种子无关的日子直接查年表，绿雨日每年只算一次，只有需要 RNG 的日子才播种。
+        """
+        if start_abs_day < 1 or end_abs_day < start_abs_day:
+            raise ValueError("Invalid day range")
+        green_rain: Dict[int, int] = {}
+        return bytes(self.day_code(day, green_rain) for day in range(start_abs_day, end_abs_day + 1))
+
+    def day_code(self, day: int, green_rain: Optional[Dict[int, int]] = None) -> int:
+        """
+        单日天气码（只算这一天，供稀疏 / 提前结束的判定用）。
+        green_rain：年份 -> 当年夏季绿雨日的备忘，多次调用间共享可避免每个夏日都重抽一次。
+        """
+        kind = _day_kind(day)
+        if kind >= 0:
+            return kind
+        if kind == _ROLL_SPRING_FALL:
+            roll = self._next_double(HASH_LOCATION_WEATHER, self.game_id, day - 1)
+            return CODE_RAIN if roll < SPRING_FALL_RAIN_CHANCE else CODE_SUN
         year = 1 + (day - 1) // 112
+        dom = ((day - 1) % 28) + 1
+        if green_rain is None:
+            green_rain = {}
+        if year not in green_rain:
+            green_rain[year] = self._green_rain_day_for_summer(year)
+        if dom == green_rain[year]:
+            return CODE_GREEN_RAIN
+        if dom % 13 == 0:
+            return CODE_STORM
+        # 注意：JS 用的是 / 2（浮点除法），不能用整除 //
+        roll = self._next_double(day - 1, self.game_id / 2, HASH_SUMMER_RAIN_CHANCE)
+        return CODE_RAIN if roll < 0.12 + 0.003 * (dom - 1) else CODE_SUN
+
+    def calendar_years(self, first_year: int = 1, n_years: int = 1) -> bytes:
+        """整年（每年 112 天）的天气码，从第 first_year 年春1 开始连续 n_years 年"""
+        if first_year < 1 or n_years < 1:
+            raise ValueError("Invalid year range")
+        return self.calendar((first_year - 1) * 112 + 1, (first_year - 1 + n_years) * 112)
+
+    @staticmethod
+    def day_weather(day: int, code: int) -> DayWeather:
+        """天气码 → DayWeather（只在需要展示时构造）"""
+        season: SEASON_EN = WeatherPredictor._season_of_month((day - 1) // 28)
         d112 = day % 112
+        w = WEATHER_CODES[code]
+        return DayWeather(day, season, ((day - 1) % 28) + 1, 1 + (day - 1) // 112, w, WEATHER_ZH_MAP[w],
+                          FESTIVAL_MAP.get(d112), d112 in FORCE_SUN_FESTIVALS)
 
-        # Fixed days
-        if day in (1, 2, 4) or (day % 28) == 1:
-            return DayWeather(day, season, dom, year, "Sun", WEATHER_ZH_MAP["Sun"], FESTIVAL_MAP.get(d112), d112 in FORCE_SUN_FESTIVALS)
-        if day == 3:
-            return DayWeather(day, season, dom, year, "Rain", WEATHER_ZH_MAP["Rain"], FESTIVAL_MAP.get(d112), False)
-
-        # Festival
-        festival_name = FESTIVAL_MAP.get(d112)
-        if festival_name and d112 in FORCE_SUN_FESTIVALS:
-            return DayWeather(day, season, dom, year, "Sun", WEATHER_ZH_MAP["Sun"], festival_name, True)
-
-        # Seasonal rules
-        if season in ("Spring", "Fall"):
-            rng = self._seed_rng(get_hash_from_string("location_weather"), self.game_id, day - 1)
-            w = "Rain" if rng.NextDouble() < 0.183 else "Sun"
-            return DayWeather(day, season, dom, year, w, WEATHER_ZH_MAP[w], festival_name, False)
-
-        if season == "Summer":
-            gr = self._green_rain_day_for_summer(year)
-            # 注意：JS 用的是 / 2（浮点除法），不能用整除 //
-            rng = self._seed_rng(day - 1, self.game_id / 2, get_hash_from_string("summer_rain_chance"))
-            if dom == gr:
-                w = "Green Rain"
-            elif dom % 13 == 0:
-                w = "Storm"
-            else:
-                rain_chance = 0.12 + 0.003 * (dom - 1)
-                w = "Rain" if rng.NextDouble() < rain_chance else "Sun"
-            return DayWeather(day, season, dom, year, w, WEATHER_ZH_MAP[w], festival_name, False)
-
-        # Winter（先占位）
-        return DayWeather(day, season, dom, year, "Sun", WEATHER_ZH_MAP["Sun"], festival_name, False)
+    def _roll_one(self, day1: int) -> DayWeather:
+        return self.day_weather(day1, self.calendar(day1, day1)[0])
 
     def predict_range(self, start_abs_day: int, end_abs_day: int) -> List[DayWeather]:
-        if start_abs_day < 1 or end_abs_day < start_abs_day:
-            raise ValueError("Invalid day range")
-        return [self._roll_one(d) for d in range(start_abs_day, end_abs_day + 1)]
+        codes = self.calendar(start_abs_day, end_abs_day)
+        return [self.day_weather(d, c) for d, c in zip(range(start_abs_day, end_abs_day + 1), codes)]
 
     @staticmethod
     def pretty_print(days: List[DayWeather]) -> None:
@@ -104,3 +125,212 @@ class WeatherPredictor:
             fest = f"（{d.festival_name}）" if d.festival_name else ""
             forced = "（强制晴）" if d.forced_sun else ""
             print(f"第{d.abs_day}天 / {d.season_en} {d.dom:02d}（第{d.year}年）: {d.weather_zh}{fest}{forced}")
+
+
+# ---------------- 连续 gameID 区间的天气子句批量判定 ----------------
+# 春 / 秋的雨由 getRandomSeed(hash, gameID, day-1) 决定，legacy 播种下只依赖 gameID + day - 1：
+# (gameID+1, day) 与 (gameID, day+1) 是同一个 RNG 种子，相邻 gameID 的春秋日历互为平移。
+# 因此整段区间只需对每个 t = gameID + day - 1 抽一次，得到一条雨 / 晴比特流，
+# 每个子句里的春秋天数用前缀和 O(1) 求出。夏季（绿雨 / 夏雨）用批量日历（weather_calendars）。
+
+def _static_weather(day: int) -> Optional[str]:
+    """与 gameID 无关的天气（固定日 / 强制晴节日 / 冬季）；需要 RNG 的日子返回 None"""
+    if day in (1, 2, 4) or (day % 28) == 1:
+        return "Sun"
+    if day == 3:
+        return "Rain"
+    if (day % 112) in FORCE_SUN_FESTIVALS:
+        return "Sun"
+    if WeatherPredictor._season_of_month((day - 1) // 28) == "Winter":
+        return "Sun"
+    return None
+
+
+def _is_spring_fall(day: int) -> bool:
+    return WeatherPredictor._season_of_month((day - 1) // 28) in ("Spring", "Fall")
+
+
+# ---------------- 年表 ----------------
+# 每天的“种类”：>= 0 为与 gameID 无关的天气码，否则标明需要哪种 RNG。
+# 固定日只在第 1 年（abs_day 1~4），其余规则都以 112 天为周期，所以只需第 1 年和之后各年两张表。
+_ROLL_SPRING_FALL = -1
+_ROLL_SUMMER = -2
+
+
+def _kind_of(day: int) -> int:
+    w = _static_weather(day)
+    if w is not None:
+        return WEATHER_CODE[w]
+    return _ROLL_SPRING_FALL if _is_spring_fall(day) else _ROLL_SUMMER
+
+
+_KINDS_YEAR1 = tuple(_kind_of(d) for d in range(1, 113))
+_KINDS_LATER = tuple(_kind_of(d) for d in range(113, 225))
+
+
+def _day_kind(day: int) -> int:
+    return _KINDS_YEAR1[day - 1] if day <= 112 else _KINDS_LATER[(day - 1) % 112]
+
+
+def day_chance(day: int, tcodes) -> float:
+    """随机 gameID 下第 day 天天气落在 tcodes 里的概率（估计子句的挑剔程度用，各天视为独立）"""
+    kind = _day_kind(day)
+    if kind >= 0:
+        return 1.0 if kind in tcodes else 0.0
+    if kind == _ROLL_SPRING_FALL:
+        return (SPRING_FALL_RAIN_CHANCE if CODE_RAIN in tcodes else 0.0) + \
+               (1.0 - SPRING_FALL_RAIN_CHANCE if CODE_SUN in tcodes else 0.0)
+    dom = ((day - 1) % 28) + 1
+    green = 1.0 / len(GREEN_RAIN_DAYS) if dom in GREEN_RAIN_DAYS else 0.0
+    p = green if CODE_GREEN_RAIN in tcodes else 0.0
+    if dom % 13 == 0:
+        return p + ((1.0 - green) if CODE_STORM in tcodes else 0.0)
+    rain = 0.12 + 0.003 * (dom - 1)
+    return p + (1.0 - green) * ((rain if CODE_RAIN in tcodes else 0.0) + (1.0 - rain if CODE_SUN in tcodes else 0.0))
+
+
+def weather_calendars(game_ids, start_abs_day: int, end_abs_day: int, use_legacy: bool = True):
+    """
+    多个 gameID 的天气码日历：有 NumPy 时返回 (len(game_ids), 天数) 的 uint8 数组，
+    否则返回每个 gameID 一条 WeatherPredictor.calendar 的 bytes 列表。结果与逐个 gameID 计算一致。
+    """
+    if start_abs_day < 1 or end_abs_day < start_abs_day:
+        raise ValueError("Invalid day range")
+    try:
+        import numpy as np
+        from utils.dotnet_random_batch import nth_doubles
+        from utils.rng_wrappers_batch import get_random_seed_array
+    except ImportError:
+        return [WeatherPredictor(g, use_legacy).calendar(start_abs_day, end_abs_day) for g in game_ids]
+
+    ids = np.asarray(game_ids, dtype=np.int64).reshape(-1)
+    out = np.empty((ids.size, end_abs_day - start_abs_day + 1), dtype=np.uint8)
+    gr_table = np.array(GREEN_RAIN_DAYS, dtype=np.int64)
+    green_rain = {}
+    for k, day in enumerate(range(start_abs_day, end_abs_day + 1)):
+        kind = _day_kind(day)
+        if kind >= 0:
+            out[:, k] = kind
+            continue
+        if kind == _ROLL_SPRING_FALL:
+            roll = nth_doubles(get_random_seed_array(HASH_LOCATION_WEATHER, ids, day - 1, use_legacy=use_legacy), 1)
+            out[:, k] = np.where(roll < SPRING_FALL_RAIN_CHANCE, CODE_RAIN, CODE_SUN)
+            continue
+        year = 1 + (day - 1) // 112
+        dom = ((day - 1) % 28) + 1
+        if year not in green_rain:
+            gr_roll = nth_doubles(get_random_seed_array(year * 777, ids, use_legacy=use_legacy), 1)
+            green_rain[year] = gr_table[(gr_roll * 8).astype(np.int64)]
+        if dom % 13 == 0:
+            w = np.full(ids.size, CODE_STORM, dtype=np.uint8)
+        else:
+            roll = nth_doubles(get_random_seed_array(day - 1, ids / 2, HASH_SUMMER_RAIN_CHANCE, use_legacy=use_legacy), 1)
+            w = np.where(roll < 0.12 + 0.003 * (dom - 1), CODE_RAIN, CODE_SUN)
+        out[:, k] = np.where(green_rain[year] == dom, CODE_GREEN_RAIN, w)
+    return out
+
+
+def count_codes(calendars, cols: List[int], codes) -> List[int]:
+    """每条日历在第 cols 列（相对日历首日的下标）里天气码属于 codes 的天数"""
+    codes = set(codes)
+    if not cols or not codes:
+        return [0] * len(calendars)
+    if isinstance(calendars, list):
+        return [sum(1 for c in cols if row[c] in codes) for row in calendars]
+    import numpy as np
+    return np.isin(calendars[:, cols], sorted(codes)).sum(axis=1).tolist()
+
+
+def _rain_bits(t_start: int, t_end: int) -> List[int]:
+    """t ∈ [t_start, t_end]：种子 getRandomSeed(hash, t) 的第一次 NextDouble() < 0.183 记 1"""
+    try:
+        import numpy as np
+        from utils.dotnet_random_batch import nth_doubles
+        from utils.rng_wrappers_batch import get_random_seed_array
+    except ImportError:
+        return [
+            1 if first_double(get_random_seed(HASH_LOCATION_WEATHER, t)) < SPRING_FALL_RAIN_CHANCE else 0
+            for t in range(t_start, t_end + 1)
+        ]
+    seeds = get_random_seed_array(HASH_LOCATION_WEATHER, np.arange(t_start, t_end + 1, dtype=np.int64))
+    return (nth_doubles(seeds, 1) < SPRING_FALL_RAIN_CHANCE).astype(np.int64).tolist()
+
+
+def scan_weather_clauses(
+    start_id: int,
+    end_id: int,
+    clauses: List[Dict],
+    default_targets: Tuple[str, ...],
+    use_legacy: bool = True,
+) -> Optional[List[bool]]:
+    """
+    对 gameID ∈ [start_id, end_id] 批量判定 services.predict.evaluate_weather_clauses 的 ok，
+    返回按 gameID 顺序的 bool 列表；不满足平移前提（非 legacy 播种、gameID 或天数越界）时返回 None，
+    调用方应退回逐个 gameID 计算。
+    """
+    if end_id < start_id:
+        return []
+    if not clauses:
+        return [True] * (end_id - start_id + 1)
+    mn = min(int(c["start"]) for c in clauses)
+    mx = max(int(c["end"]) for c in clauses)
+    if not use_legacy or mn < 1 or mx < mn:
+        return None
+    # gameID + day - 1 不能在 % MBIG 处回绕，否则 (gameID, day) 与 t 的对应不成立
+    if start_id + mn - 1 <= -MBIG or end_id + mx - 1 >= MBIG or start_id <= -MBIG or end_id >= MBIG:
+        return None
+
+    static = {d: _static_weather(d) for d in range(mn, mx + 1)}
+    roll_days = [d for d in range(mn, mx + 1) if static[d] is None and _is_spring_fall(d)]
+    summer_days = [d for d in range(mn, mx + 1) if static[d] is None and not _is_spring_fall(d)]
+
+    # 比特流 bits[i] 对应 t = start_id + r0 - 1 + i，前缀和 prefix[i] = sum(bits[:i])
+    # gameID = start_id + off 的春秋日 d 对应 bits[off + d - r0]
+    prefix = [0]
+    r0 = roll_days[0] if roll_days else 0
+    if roll_days:
+        prefix += accumulate(_rain_bits(start_id + r0 - 1, end_id + roll_days[-1] - 1))
+
+    # 每个子句预先拆成：与 gameID 无关的命中数、春秋连续段、夏季日
+    plans = []
+    for c in clauses:
+        s = int(c["start"]); e = int(c["end"]); need = int(c["min_count"])
+        tset = set(c.get("targets", default_targets))
+        fixed = sum(1 for d in range(s, e + 1) if static[d] is not None and static[d] in tset)
+        runs = []
+        if "Rain" in tset or "Sun" in tset:
+            for d in range(s, e + 1):
+                if static[d] is None and _is_spring_fall(d):
+                    if runs and runs[-1][1] == d - 1:
+                        runs[-1][1] = d
+                    else:
+                        runs.append([d, d])
+        summer = [d for d in range(s, e + 1) if static[d] is None and not _is_spring_fall(d)]
+        plans.append((need, fixed, [(a - r0, b - r0 + 1, b - a + 1) for a, b in runs],
+                      "Rain" in tset, "Sun" in tset, summer, tset))
+
+    # 夏季日：整段区间一次算出日历，再按子句数目标天数
+    summer_counts = [[0] * (end_id - start_id + 1) for _ in plans]
+    if summer_days:
+        s0 = summer_days[0]
+        cals = weather_calendars(range(start_id, end_id + 1), s0, summer_days[-1], use_legacy)
+        for i, plan in enumerate(plans):
+            codes = {WEATHER_CODE[w] for w in plan[6] if w in WEATHER_CODE}
+            summer_counts[i] = count_codes(cals, [d - s0 for d in plan[5]], codes)
+
+    out = []
+    for off in range(end_id - start_id + 1):
+        ok = True
+        for (need, fixed, runs, want_rain, want_sun, summer, tset), sc in zip(plans, summer_counts):
+            cnt = fixed + sc[off]
+            for lo, hi, n in runs:
+                rain = prefix[off + hi] - prefix[off + lo]
+                if want_rain:
+                    cnt += rain
+                if want_sun:
+                    cnt += n - rain
+            if cnt < need:
+                ok = False
+                break
+        out.append(ok)
+    return out
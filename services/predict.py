@@ -1,50 +1,353 @@
-from typing import List, Dict, Tuple, Optional, Union, Set
-from functions.weather import WeatherPredictor, DayWeather
-from functions.mines import MinesPredictor, DayInfested
+from typing import Callable, Hashable, Iterable, List, Dict, Tuple, Optional, Union, Set
+from functions.weather import WeatherPredictor, DayWeather, WEATHER_CODE, day_chance, scan_weather_clauses, weather_calendars
+from functions.mines import MinesPredictor, DayInfested, scan_no_infested
 from functions.chests import ChestsPredictor
-from functions.trashcans import predict_saloon_trash_in_range
+from functions.desert_festival import DesertFestivalPredictor, DesertScenario
+from functions.chest_index import ChestIndex
+from functions.night_event_index import NightEventIndex
+from functions.trashcans import predict_saloon_trash_in_range, scan_saloon_dish
+
+# -------- gameID / 2 等价类 --------
+# 这些筛选项只通过 getRandomSeed(..., gameID / 2, ...) 播种，gameID 的其余部分不参与：
+#   legacy：种子 = floor(day + gameID/2 + ...)，等价于用 floor(gameID/2) —— 2k 与 2k+1 同类（负数同理：-2 与 -1）
+#   1.6 hash：参数先 trunc 成 int32，等价于用 trunc(gameID/2) —— 负数一侧变成 -3/-2、-1/0/1 同类
+# 值 = 是否跟随 use_legacy（夜间事件固定 legacy 播种）。
+# 天气（春季用完整 gameID）、宝箱（gameID*512）、垃圾桶（Dish 判定用完整 gameID）不在其中。
+HALF_ID_PREDICATES: Dict[str, bool] = {"mines": True, "desert": True, "night": False}
+
+# |gameID| 在这个范围内时 gameID/2 及各项之和都不会在 % MBIG 处回绕，上述等价严格成立
+_HALF_ID_LIMIT = 1 << 31
+
+
+def _half_id_key(game_id: int, legacy: bool, trunc: bool) -> Optional[Tuple[int, int]]:
+    g = int(game_id)
+    if not -_HALF_ID_LIMIT <= g < _HALF_ID_LIMIT:
+        return None
+    lo = g >> 1 if legacy else None
+    tr = (-((-g) >> 1) if g < 0 else g >> 1) if trunc else None
+    return (lo, tr)
+
+
+def half_id_key_for(enabled: Iterable[str], use_legacy: bool) -> Optional[Callable[[int], Optional[Hashable]]]:
+    """
+    enabled：本次启用的筛选项名字（night / desert / chests / weather / saloon / mines）。
+    全部只依赖 gameID / 2 时返回 key(game_id)：key 相同的 gameID 各项结果完全相同，
+    有序的块里 key 相同的相邻 gameID 只需算一个（见 services.query_plan.evaluate_installed_block，
+    由 utils.scan_engine.iter_scan_blocks 派发）；否则返回 None。
+    """
+    enabled = list(enabled)
+    if not enabled or any(name not in HALF_ID_PREDICATES for name in enabled):
+        return None
+    legacy = any(use_legacy or not HALF_ID_PREDICATES[n] for n in enabled)
+    trunc = any(HALF_ID_PREDICATES[n] and not use_legacy for n in enabled)
+    return lambda game_id: _half_id_key(game_id, legacy, trunc)
+
 
 # -------- 天气 --------
-def evaluate_weather_clauses(
-    wp: WeatherPredictor,
+# 子句（模式）格式：start / end 为绝对天数，targets 可选（不写则用默认目标），type 可选：
+#   "count"（默认）：[start, end] 内目标天数 >= min_count（可再加 max_count 上限）
+#   "none"        ：[start, end] 内没有目标天气（如“5~7 日不下雨”）
+#   "streak"      ：[start, end] 内至少 length 个连续目标天（如“春季连续 3 天雨”）
+#   "weekly"      ：[start, end] 内每个游戏周（每月 1~7 / 8~14 / 15~21 / 22~28 日）都有 >= min_count（默认 1）个目标天
+# 判定按“位切片”做：每天一个整数掩码，第 j 位 = 第 j 个 gameID 当天是否为目标天气，
+# 计数用逐位加法器的位平面，连续 / 每周都是掩码的 AND / OR，一次运算同时判定一整批 gameID。
+
+WeatherPattern = Tuple  # (kind, start, end, 目标天气码集合, 参数...)
+
+
+def compile_weather_patterns(clauses: List[Dict], default_targets: Tuple[str, ...]) -> List[WeatherPattern]:
+    out = []
+    for c in clauses:
+        kind = str(c.get("type", "count")).lower()
+        s = int(c["start"]); e = int(c["end"])
+        tcodes = frozenset(WEATHER_CODE[w] for w in tuple(c.get("targets", default_targets)) if w in WEATHER_CODE)
+        if kind == "count":
+            mx = c.get("max_count")
+            out.append(("count", s, e, tcodes, int(c["min_count"]), None if mx is None else int(mx)))
+        elif kind == "none":
+            out.append(("count", s, e, tcodes, 0, 0))
+        elif kind == "streak":
+            out.append(("streak", s, e, tcodes, int(c["length"])))
+        elif kind == "weekly":
+            out.append(("weekly", s, e, tcodes, int(c.get("min_count", 1))))
+        else:
+            raise ValueError(f"未知的天气模式类型：{kind}")
+    # 最挑剔（估计通过率最低）的子句排在前面：逐个判定时最早失败，整批判定时最早把掩码清零
+    out.sort(key=_pass_chance)
+    return out
+
+
+def _count_chance(chances: List[float], need: int, cap: Optional[int]) -> float:
+    """各天独立、命中概率为 chances 时，命中天数落在 [need, cap] 的概率（计数超过 top 的并成一格）"""
+    top = max(need, 0) if cap is None else cap + 1
+    dist = [1.0] + [0.0] * top
+    for q in chances:
+        for k in range(top, -1, -1):
+            v = dist[k] * q
+            dist[k] -= v
+            if k < top:
+                dist[k + 1] += v
+            else:
+                dist[k] += v
+    return sum(dist[max(need, 0):top + 1 if cap is None else top])
+
+
+def _pass_chance(p: WeatherPattern) -> float:
+    """随机 gameID 满足该模式的估计概率（functions.weather.day_chance，各天视为独立）"""
+    kind, s, e, tcodes = p[:4]
+    chances = [day_chance(d, tcodes) for d in range(s, e + 1)]
+    if kind == "count":
+        return _count_chance(chances, p[4], p[5])
+    if kind == "streak":
+        length = p[4]
+        if length <= 0:
+            return 1.0
+        state = [1.0] + [0.0] * (length - 1)  # state[r]：当前连续 r 天且尚未达成
+        done = 0.0
+        for q in chances:
+            done += state[-1] * q
+            state = [sum(state) * (1.0 - q)] + [v * q for v in state[:-1]]
+        return done
+    weeks: Dict[int, List[float]] = {}
+    for d, q in zip(range(s, e + 1), chances):
+        weeks.setdefault((d - 1) // 7, []).append(q)
+    out = 1.0
+    for qs in weeks.values():
+        out *= _count_chance(qs, p[4], None) if p[4] <= len(qs) else 0.0
+    return out
+
+
+def _count_holds(days, code: Callable[[int], int], tcodes: frozenset, need: int, cap: Optional[int]) -> bool:
+    """逐天数目标天气，达标（且无上限）/ 超上限 / 剩余天数不够时立即结束"""
+    left = len(days)
+    if need > left:
+        return False
+    if need <= 0 and cap is None:
+        return True
+    hits = 0
+    for d in days:
+        left -= 1
+        if code(d) in tcodes:
+            hits += 1
+            if cap is not None and hits > cap:
+                return False
+            if cap is None and hits >= need:
+                return True
+        elif hits + left < need:
+            return False
+    return hits >= need
+
+
+def _pattern_holds(p: WeatherPattern, code: Callable[[int], int]) -> bool:
+    """单个 gameID 判定一个模式，只按需算用到的日子（与 _pattern_mask 同语义）"""
+    kind, s, e, tcodes = p[:4]
+    if kind == "count":
+        return _count_holds(range(s, e + 1), code, tcodes, p[4], p[5])
+    if kind == "streak":
+        length = p[4]
+        if length <= 0:
+            return True
+        run = 0
+        for d in range(s, e + 1):
+            if e - d + 1 + run < length:
+                return False
+            if code(d) in tcodes:
+                run += 1
+                if run >= length:
+                    return True
+            else:
+                run = 0
+        return False
+    weeks: Dict[int, List[int]] = {}
+    for d in range(s, e + 1):
+        weeks.setdefault((d - 1) // 7, []).append(d)
+    return all(_count_holds(days, code, tcodes, p[4], None) for days in weeks.values())
+
+
+def _at_least(cols: List[int], n: int, ones: int) -> int:
+    """cols 里每一位（每个 gameID）为 1 的个数 >= n 的掩码"""
+    if n <= 0:
+        return ones
+    if n > len(cols):
+        return 0
+    planes: List[int] = []  # 计数器的位平面，低位在前
+    for x in cols:
+        carry = x
+        for i in range(len(planes)):
+            if not carry:
+                break
+            planes[i], carry = planes[i] ^ carry, planes[i] & carry
+        if carry:
+            planes.append(carry)
+    gt, eq = 0, ones
+    for i in reversed(range(max(len(planes), n.bit_length()))):
+        c = planes[i] if i < len(planes) else 0
+        if (n >> i) & 1:
+            eq &= c
+        else:
+            gt |= eq & c
+            eq &= ones ^ c
+    return gt | eq
+
+
+def _pattern_mask(p: WeatherPattern, column: Callable[[int, frozenset], int], ones: int) -> int:
+    kind, s, e, tcodes = p[:4]
+    days = range(s, e + 1)
+    if kind == "count":
+        _, _, _, _, need, cap = p
+        cols = [column(d, tcodes) for d in days]
+        mask = _at_least(cols, need, ones)
+        if cap is not None:
+            mask &= ones ^ _at_least(cols, cap + 1, ones)
+        return mask
+    if kind == "streak":
+        length = p[4]
+        if length <= 0:
+            return ones
+        cols = [column(d, tcodes) for d in days]
+        run = cols  # run[i]：从第 i 天起连续 k 天都是目标天气
+        for k in range(1, length):
+            run = [run[i] & cols[i + k] for i in range(len(run) - 1)]
+        acc = 0
+        for m in run:
+            acc |= m
+        return acc
+    # weekly：按游戏周分组（每月 1~7 / 8~14 / 15~21 / 22~28 日），每组都要满足
+    need = p[4]
+    weeks: Dict[int, List[int]] = {}
+    for d in days:
+        weeks.setdefault((d - 1) // 7, []).append(column(d, tcodes))
+    mask = ones
+    for cols in weeks.values():
+        mask &= _at_least(cols, need, ones)
+    return mask
+
+
+def match_weather_patterns(calendars, day0: int, patterns: List[WeatherPattern]) -> int:
+    """
+    calendars：functions.weather.weather_calendars 的结果（首日为 day0）。
+    返回满足全部模式的掩码：第 j 位 = 第 j 条日历满足。
+    """
+    n = len(calendars)
+    ones = (1 << n) - 1
+    if isinstance(calendars, list):
+        def build(k: int, tcodes: frozenset) -> int:
+            return int("".join("1" if row[k] in tcodes else "0" for row in reversed(calendars)) or "0", 2)
+    else:
+        import numpy as np
+        def build(k: int, tcodes: frozenset) -> int:
+            hit = np.isin(calendars[:, k], sorted(tcodes))
+            return int.from_bytes(np.packbits(hit, bitorder="little").tobytes(), "little")
+    cache: Dict[Tuple[int, frozenset], int] = {}
+
+    def column(day: int, tcodes: frozenset) -> int:
+        key = (day, tcodes)
+        if key not in cache:
+            cache[key] = build(day - day0, tcodes) if tcodes else 0
+        return cache[key]
+
+    mask = ones
+    for p in patterns:
+        mask &= _pattern_mask(p, column, ones)
+        if not mask:
+            break
+    return mask
+
+
+def scan_weather_patterns(
+    start_id: int,
+    end_id: int,
     clauses: List[Dict],
-    default_targets: Tuple[str, ...]
-) -> Tuple[bool, List[DayWeather]]:
+    default_targets: Tuple[str, ...],
+    use_legacy: bool = True,
+    block: int = 1 << 14,
+) -> List[bool]:
+    """对 gameID ∈ [start_id, end_id] 逐块（每块 block 个）判定天气模式，按 gameID 顺序返回 bool 列表"""
+    if end_id < start_id:
+        return []
     if not clauses:
+        return [True] * (end_id - start_id + 1)
+    patterns = compile_weather_patterns(clauses, default_targets)
+    mn = min(p[1] for p in patterns)
+    mx = max(p[2] for p in patterns)
+    out: List[bool] = []
+    for lo in range(start_id, end_id + 1, block):
+        hi = min(end_id, lo + block - 1)
+        mask = match_weather_patterns(weather_calendars(range(lo, hi + 1), mn, mx, use_legacy), mn, patterns)
+        out.extend(bool((mask >> j) & 1) for j in range(hi - lo + 1))
+    return out
+
+
+def evaluate_weather_patterns(
+    wp: WeatherPredictor,
+    patterns: List[WeatherPattern],
+    with_details: bool = True,
+) -> Tuple[bool, List[DayWeather]]:
+    """
+    单个 gameID 按已编译的模式判定：逐个模式提前结束，只算子句覆盖且真正读到的日子（同一天只算一次）。
+    with_details=True 时另给出各子句范围内的目标天气日（DayWeather 只为这些日子构造，用于展示），否则明细为 []。
+    """
+    if not patterns:
         return True, []
+    if min(p[1] for p in patterns) < 1 or max(p[2] for p in patterns) < min(p[1] for p in patterns):
+        raise ValueError("Invalid day range")
+    green_rain: Dict[int, int] = {}
+    if with_details:
+        # 明细要用到子句覆盖的每一天：先一次算好（区间之间的空档不算）
+        covered = set()
+        for p in patterns:
+            covered.update(range(p[1], p[2] + 1))
+        codes = {d: wp.day_code(d, green_rain) for d in sorted(covered)}
+        code = codes.__getitem__
+    else:
+        codes: Dict[int, int] = {}
 
-    mn = min(int(c["start"]) for c in clauses)
-    mx = max(int(c["end"]) for c in clauses)
-    all_days = wp.predict_range(mn, mx)
-    by_day: Dict[int, DayWeather] = {d.abs_day: d for d in all_days}
+        def code(day: int) -> int:
+            c = codes.get(day)
+            if c is None:
+                c = codes[day] = wp.day_code(day, green_rain)
+            return c
 
-    ok_all = True
-    matched_union: Dict[int, DayWeather] = {}
-    for c in clauses:
-        s = int(c["start"]); e = int(c["end"]); need = int(c["min_count"])
-        t = tuple(c.get("targets", default_targets))
-        tset = set(t)
-        hits = []
-        for day in range(s, e + 1):
-            dw = by_day.get(day)
-            if dw and dw.weather_en in tset:
-                hits.append(dw)
-                matched_union[dw.abs_day] = dw
-        if len(hits) < need:
-            ok_all = False
-
-    merged = [by_day[d] for d in sorted(matched_union.keys())]
+    ok_all = all(_pattern_holds(p, code) for p in patterns)
+    if not with_details:
+        return ok_all, []
+
+    matched_union: Set[int] = set()
+    for p in patterns:
+        _, s, e, tcodes = p[:4]
+        matched_union.update(day for day in range(s, e + 1) if code(day) in tcodes)
+    merged = [wp.day_weather(d, codes[d]) for d in sorted(matched_union)]
     return ok_all, merged
 
+
+def evaluate_weather_clauses(
+    wp: WeatherPredictor,
+    clauses: List[Dict],
+    default_targets: Tuple[str, ...],
+    with_details: bool = True,
+) -> Tuple[bool, List[DayWeather]]:
+    if not clauses:
+        return True, []
+    return evaluate_weather_patterns(wp, compile_weather_patterns(clauses, default_targets), with_details)
+
 # -------- 矿井 --------
-def no_infested_in_range(mp: MinesPredictor, start_day: int, end_day: int, floor_start: int, floor_end: int) -> Tuple[bool, List[DayInfested]]:
-    all_days = mp.predict_infested_in_range(start_day, end_day)
-    ok = True
-    for d in all_days:
-        if any(floor_start <= f <= floor_end for f in d.floors):
-            ok = False
-            break
-    return ok, all_days
+def no_infested_in_range(
+    mp: MinesPredictor,
+    start_day: int,
+    end_day: int,
+    floor_start: int,
+    floor_end: int,
+    *,
+    with_details: bool = True,
+) -> Tuple[bool, List[DayInfested]]:
+    """
+    with_details=False 时只要 是 / 否：只播种 [floor_start, floor_end] 内的楼层，遇到第一个怪物层就停，明细返回 []。
+    否则按天给出全部楼层（展示用），判定与明细共用同一张位图。
+    """
+    if not with_details:
+        return mp.first_infested(start_day, end_day, floor_start, floor_end) is None, []
+    atlas = mp.atlas(start_day, end_day)
+    return not atlas.any_in(floor_start, floor_end), atlas.days()
 
 # -------- 宝箱（嵌套 OR） --------
 ChestAtom = Tuple[int, str]
@@ -104,6 +407,26 @@ def check_chest_rules_nested(cp: ChestsPredictor, rules: List[ChestRule], mode:
     ok = any(flags) if mode.upper() == "ANY" else all(flags)
     return ok, pred
 
+# -------- 沙漠节（多场景） --------
+def desert_any_scenario(
+    df: DesertFestivalPredictor,
+    scenarios: Tuple[DesertScenario, ...],
+    require_leah: bool,
+    require_jas: bool,
+) -> Tuple[bool, Dict[str, List[str]]]:
+    """
+    任一场景满足 Leah / Jas 要求即通过；明细取第一个满足的场景（都不满足时取第一个场景）。
+    所有场景一次算完（见 DesertFestivalPredictor.vendors_for_scenarios）。
+    """
+    first = None
+    for v in df.vendors_for_scenarios(scenarios):
+        detail = {"春15": list(v[0:2]), "春16": list(v[2:4]), "春17": list(v[4:6])}
+        if first is None:
+            first = detail
+        if (not require_leah or "Leah" in v) and (not require_jas or "Jas" in v):
+            return True, detail
+    return False, first or {}
+
 # -------- 酒吧垃圾桶（区间统计） --------
 def evaluate_saloon_trash_range(
     seed: int,
@@ -143,3 +466,69 @@ def evaluate_saloon_trash_range(
         }
     }
     return ok, tag, out_ext
+
+# -------- 连续区间预筛 --------
+def prefilter_seed_range(
+    lo: int,
+    hi: int,
+    *,
+    use_legacy: bool,
+    weather: Optional[Tuple[List[Dict], Tuple[str, ...]]] = None,
+    mines: Optional[Tuple[int, int, int, int]] = None,
+    chests: Optional[Tuple[ChestIndex, List[ChestRule], str]] = None,
+    night: Optional[Tuple[NightEventIndex, int, bool]] = None,
+    saloon: Optional[Tuple[int, int, float, bool, int]] = None,
+) -> Optional[List[int]]:
+    """
+    对 gameID ∈ [lo, hi] 用批量方法先筛一遍，返回仍可能命中的 gameID（升序）；没有可用的批量方法时返回 None。
+      - chests = (索引, 规则, 模式)、night = (索引, 白天 D, 温室是否修复)：
+        索引覆盖该区间时直接从索引枚举候选（多个取交集），其余条件留给 worker 逐个判定；
+      - saloon = (start_day, end_day, 运势, 垃圾书, 最少命中天数)：没有索引候选时，
+        用原始样本表（functions.trashcans.SaloonRollTable）整段判定，同一区间只改运势 / 垃圾书时复用上一张表；
+      - weather = (子句, 默认目标)：平移比特流（functions.weather.scan_weather_clauses），
+        其余模式（连续 / 每周 / 不下雨）用位并行判定（scan_weather_patterns）；
+      - mines = (start_day, end_day, floor_start, floor_end)：种子位图筛（functions.mines.scan_no_infested）。
+    预筛只会去掉必然失败的 gameID，worker 仍对留下的 gameID 完整判定并给出明细。
+    """
+    candidates: Optional[Set[int]] = None
+
+    def narrow(found: Optional[List[int]]) -> None:
+        nonlocal candidates
+        if found is not None:
+            candidates = set(found) if candidates is None else candidates.intersection(found)
+
+    if chests is not None:
+        index, rules, mode = chests
+        if index is not None and index.covers(lo, hi, use_legacy):
+            try:
+                narrow(list(index.match_rules(rules, mode, lo, hi)))
+            except (TypeError, ValueError):
+                pass  # 规则格式有问题：交给 worker 逐个判定
+    if night is not None:
+        index, check_day, greenhouse = night
+        # 夜间事件固定 legacy 播种，与 use_legacy 无关
+        if index is not None and check_day >= 1:
+            narrow(index.game_ids_with_event("Fairy", [check_day], lo, hi, greenhouse_unlocked=greenhouse))
+    if candidates is None and saloon is not None:
+        s_start, s_end, luck, book, need = saloon
+        narrow(scan_saloon_dish(lo, hi, s_start, s_end, daily_luck=luck, has_garbage_book=book, require_min_hit_days=need))
+    if candidates is not None:
+        return sorted(candidates)
+
+    flags = []
+    if weather is not None:
+        clauses, targets = weather
+        try:
+            # 只有计数子句时先试平移比特流；其余模式或平移前提不成立时按块位并行判定
+            found = None
+            if all(str(c.get("type", "count")).lower() == "count" and "max_count" not in c for c in clauses):
+                found = scan_weather_clauses(lo, hi, clauses, targets, use_legacy)
+            flags.append(found if found is not None else scan_weather_patterns(lo, hi, clauses, targets, use_legacy))
+        except (KeyError, TypeError, ValueError):
+            pass  # 子句格式有问题：交给 worker 逐个判定（与原来一样记为未命中）
+    if mines is not None:
+        flags.append(scan_no_infested(lo, hi, *mines, use_legacy))
+    flags = [f for f in flags if f is not None]
+    if not flags:
+        return None
+    return [g for g, *oks in zip(range(lo, hi + 1), *flags) if all(oks)]
@@ -0,0 +1,575 @@
+# services/query_plan.py
+# 搜索请求编译：CLI（app.main）与 /api/search 先把参数编译成一个不可变的 QueryPlan，
+# 校验 / 归一只做一次（宝箱别名 → 掉落池下标、天气子句 → 模式、成本估计与执行顺序），
+# 每个子进程启动时装入一次 plan，之后对每个 gameID 只做判定。
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from dataclasses import dataclass, replace
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from data.chests_data import CHOICES as CHEST_CHOICES
+from functions.chest_index import open_index as open_chest_index
+from functions.chests import ChestsPredictor
+from functions.desert_festival import DesertFestivalPredictor, DesertScenario
+from functions.mines import MinesPredictor
+from functions.night_event_index import open_index as open_night_index
+from functions.night_events import predict_night_event_for_day
+from functions.weather import WeatherPredictor
+from services.predict import (
+    ChestRule,
+    WeatherPattern,
+    compile_weather_patterns,
+    desert_any_scenario,
+    evaluate_saloon_trash_range,
+    evaluate_weather_patterns,
+    half_id_key_for,
+    no_infested_in_range,
+    prefilter_seed_range,
+)
+from utils import sample_cache
+from utils.scan_engine import block_seeds, pack_ids
+from utils.dotnet_random import first_double
+
+
+@dataclass(frozen=True)
+class WeatherStep:
+    patterns: Tuple[WeatherPattern, ...]
+
+
+@dataclass(frozen=True)
+class MinesStep:
+    start_day: int
+    end_day: int
+    floor_start: int
+    floor_end: int
+    require_no_infested: bool
+
+
+@dataclass(frozen=True)
+class ChestStep:
+    levels: Tuple[int, ...]                                  # 规则涉及的楼层（升序）
+    rules: Tuple[Tuple[Tuple[Tuple[int, int], ...], ...], ...]  # 每条顶层规则 = OR(AND((楼层, 池下标), ...))
+    any_mode: bool
+
+
+@dataclass(frozen=True)
+class DesertStep:
+    require_leah: bool
+    require_jas: bool
+    scenarios: Tuple[DesertScenario, ...] = ()
+
+
+@dataclass(frozen=True)
+class SaloonStep:
+    start_day: int
+    end_day: int
+    daily_luck: float
+    has_garbage_book: bool
+    require_min_hit_days: int
+
+
+@dataclass(frozen=True)
+class NightStep:
+    check_day: int
+    greenhouse_unlocked: bool
+
+
+@dataclass(frozen=True)
+class SieveStep:
+    """
+    块内预筛（services.predict.prefilter_seed_range）的参数：worker 先对自己的 (start, stop) 块批量筛一遍，
+    只对留下的 gameID 逐个判定。索引只记路径，各进程按路径打开一次。
+    """
+    weather: Optional[Tuple[Tuple[Dict, ...], Tuple[str, ...]]] = None  # (原始子句, 默认目标)
+    mines: Optional[Tuple[int, int, int, int]] = None
+    chests: Optional[Tuple[str, List[ChestRule], str]] = None          # (索引路径, 规则, 模式)
+    night: Optional[Tuple[str, int, bool]] = None                      # (索引路径, 白天 D, 温室是否修复)
+    saloon: Optional[Tuple[int, int, float, bool, int]] = None
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    use_legacy: bool
+    weather: Optional[WeatherStep] = None
+    mines: Optional[MinesStep] = None
+    chests: Optional[ChestStep] = None
+    desert: Optional[DesertStep] = None
+    saloon: Optional[SaloonStep] = None
+    night: Optional[NightStep] = None
+    order: Tuple[str, ...] = ()     # 启用的筛选项，按成本估计从小到大（短路顺序；tune_plan 按实测重排）
+    catch_errors: bool = False      # True：某一项判定抛异常时记为未命中（/api/search 的行为）
+    details: bool = True            # False：只要是 / 否，命中明细（天气命中日）不展开
+    sieve: Optional[SieveStep] = None  # 块内预筛（None = 不筛，块里每个 gameID 都判定）
+
+    @property
+    def enabled(self) -> List[str]:
+        """启用的筛选项名字（供 services.predict.half_id_key_for）"""
+        return list(self.order)
+
+
+# ---------- 编译 ----------
+
+def _compile_chest_rules(rules: List[ChestRule], mode: str) -> ChestStep:
+    """
+    与 services.predict.check_chest_rules_nested 同语义：顶层每项是单条 (楼层, 物品) 或 OR 组，
+    OR 组里的元素是单条或 AND 子组。物品名按 ChestsPredictor.normalize_item 归一后换成掉落池下标，
+    不在池里（或非宝箱层）的记为 -1，永不相等。
+    """
+    norm = ChestsPredictor(0).normalize_item
+    levels = set()
+
+    def atom(node) -> Tuple[int, int]:
+        lv, item = node
+        want = norm(item)
+        pool = CHEST_CHOICES.get(lv)
+        levels.add(lv)
+        return lv, (pool.index(want) if pool is not None and want in pool else -1)
+
+    compiled = []
+    for node in rules:
+        if isinstance(node, list):
+            compiled.append(tuple(
+                tuple(atom(a) for a in elem) if isinstance(elem, list) else (atom(elem),)
+                for elem in node
+            ))
+        else:
+            compiled.append(((atom(node),),))
+    return ChestStep(levels=tuple(sorted(levels)), rules=tuple(compiled), any_mode=mode.upper() == "ANY")
+
+
+def compile_query(
+    *,
+    use_legacy: bool,
+    weather: Optional[Tuple[List[Dict], Tuple[str, ...]]] = None,
+    mines: Optional[Tuple[int, int, int, int, bool]] = None,
+    chests: Optional[Tuple[List[ChestRule], str]] = None,
+    desert: Optional[Tuple[bool, bool, Tuple[DesertScenario, ...]]] = None,
+    saloon: Optional[Tuple[int, int, float, bool, int]] = None,
+    night: Optional[Tuple[int, bool]] = None,
+    catch_errors: bool = False,
+    details: bool = True,
+    sieve: bool = False,
+    chest_index: Optional[str] = None,
+    night_index: Optional[str] = None,
+) -> QueryPlan:
+    """
+    各参数为 None 表示不启用该项；空的天气子句 / 宝箱规则等价于恒通过，同样不生成步骤。
+      weather = (子句, 默认目标)；mines = (start_day, end_day, floor_start, floor_end, 是否要求无怪物层)；
+      chests = (规则, 模式)；desert = (要 Leah, 要 Jas, 场景)；
+      saloon = (start_day, end_day, 运势, 垃圾书, 最少命中天数)；night = (白天 D, 温室是否修复)。
+    catch_errors：判定抛异常记为未命中；details=False：只要是 / 否，不展开命中明细。
+    sieve=True：worker 对每个区间块先批量预筛（见 SieveStep），chest_index / night_index 为索引文件路径。
+    对每个 gameID 都必然失败的参数（天数范围不合法、子句 / 规则格式错误）在这里直接抛异常。
+    """
+    steps = {}
+    costs = []  # (name, cost)，顺序即成本相同时的执行顺序
+
+    if night is not None:
+        steps["night"] = NightStep(check_day=int(night[0]), greenhouse_unlocked=bool(night[1]))
+        costs.append(("night", 1))
+
+    if desert is not None:
+        steps["desert"] = DesertStep(require_leah=bool(desert[0]), require_jas=bool(desert[1]), scenarios=tuple(desert[2]))
+        costs.append(("desert", 3))  # 固定 3 天
+
+    if chests is not None and chests[0]:
+        step = _compile_chest_rules(chests[0], str(chests[1]))
+        steps["chests"] = step
+        costs.append(("chests", max(1, len(step.levels))))
+
+    if weather is not None and weather[0]:
+        patterns = tuple(compile_weather_patterns(weather[0], tuple(weather[1])))
+        if min(p[1] for p in patterns) < 1 or max(p[2] for p in patterns) < min(p[1] for p in patterns):
+            raise ValueError("Invalid day range")
+        steps["weather"] = WeatherStep(patterns=patterns)
+        # 估算成本：所有子区间长度之和
+        costs.append(("weather", max(1, sum(p[2] - p[1] + 1 for p in patterns))))
+
+    if saloon is not None:
+        s_start, s_end, luck, book, need = saloon
+        if s_start < 1 or s_end < 1:
+            raise ValueError("start_day 和 end_day 必须为 >= 1 的正整数。")
+        steps["saloon"] = SaloonStep(int(s_start), int(s_end), float(luck), bool(book), int(need))
+        costs.append(("saloon", max(1, (s_end - s_start + 1) * 220)))  # 经验系数
+
+    if mines is not None:
+        m_start, m_end, f_start, f_end, require = mines
+        MinesPredictor._check_days(m_start, m_end)
+        steps["mines"] = MinesStep(int(m_start), int(m_end), int(f_start), int(f_end), bool(require))
+        costs.append(("mines", max(1, (m_end - m_start + 1) * 1000)))  # 经验系数（相对最贵）
+
+    order = tuple(name for name, _ in sorted(costs, key=lambda x: x[1]))
+    if sieve:
+        # 只给编译出了步骤的项配预筛：预筛只去掉必然失败的 gameID，少筛一项不影响结果
+        mstep = steps.get("mines")
+        sieve_step = SieveStep(
+            weather=(tuple(weather[0]), tuple(weather[1])) if "weather" in steps else None,
+            mines=(mstep.start_day, mstep.end_day, mstep.floor_start, mstep.floor_end) if mstep and mstep.require_no_infested else None,
+            chests=(chest_index, chests[0], str(chests[1])) if "chests" in steps and chest_index else None,
+            night=(night_index, steps["night"].check_day, steps["night"].greenhouse_unlocked) if "night" in steps and night_index else None,
+            saloon=saloon if "saloon" in steps else None,
+        )
+        if sieve_step != SieveStep():
+            steps["sieve"] = sieve_step
+    return QueryPlan(use_legacy=bool(use_legacy), order=order, catch_errors=catch_errors, details=details, **steps)
+
+
+# ---------- 判定 ----------
+
+def _eval_step(plan: QueryPlan, name: str, seed: int, out: Dict) -> bool:
+    """判定单个筛选项，明细写进 out（键名即 evaluate_plan 返回元组里的字段名）"""
+    use_legacy = plan.use_legacy
+    if name == "night":
+        step = plan.night
+        out["night_detail"] = ne = predict_night_event_for_day(
+            seed, step.check_day, day_adjust=0, greenhouse_unlocked=step.greenhouse_unlocked,
+        )
+        out["night_ok"] = ne.is_fairy
+        return ne.is_fairy
+    if name == "desert":
+        step = plan.desert
+        df = DesertFestivalPredictor(game_id=seed, use_legacy=use_legacy, year=1, leo_moved=False, debug=False)
+        if step.scenarios:
+            ok, out["desert_detail"] = desert_any_scenario(df, step.scenarios, step.require_leah, step.require_jas)
+            return ok
+        res = df.vendors_for_three_days()
+        v15, v16, v17 = res[0], res[1], res[2]
+        out["desert_detail"] = {"春15": v15, "春16": v16, "春17": v17}
+        return (not step.require_leah or any("Leah" in v for v in (v15, v16, v17))) and \
+               (not step.require_jas or any("Jas" in v for v in (v15, v16, v17)))
+    if name == "chests":
+        step = plan.chests
+        cp = ChestsPredictor(game_id=seed, use_legacy=use_legacy)
+        picks = {}
+        for lv in step.levels:
+            pool = CHEST_CHOICES.get(lv)
+            picks[lv] = None if pool is None else int(first_double(cp._seed_for_level(lv)) * len(pool))
+        out["chests_detail"] = {lv: (None if i is None else CHEST_CHOICES[lv][i]) for lv, i in picks.items()}
+        flags = (any(all(picks[lv] == i for lv, i in conj) for conj in node) for node in step.rules)
+        return any(flags) if step.any_mode else all(flags)
+    if name == "weather":
+        wp = WeatherPredictor(game_id=seed, use_legacy=use_legacy)
+        ok, _ = evaluate_weather_patterns(wp, plan.weather.patterns, with_details=False)
+        if ok and plan.details:
+            # 明细只为命中的 gameID 展开
+            _, out["matched"] = evaluate_weather_patterns(wp, plan.weather.patterns)
+        return ok
+    if name == "saloon":
+        step = plan.saloon
+        ok, out["saloon_tag"], out["saloon_out"] = evaluate_saloon_trash_range(
+            seed,
+            start_day=step.start_day,
+            end_day=step.end_day,
+            daily_luck=step.daily_luck,
+            has_garbage_book=step.has_garbage_book,
+            daily_luck_by_day=None,
+            require_min_hit_days=step.require_min_hit_days,
+        )
+        out["saloon_ok"] = ok
+        return ok
+    # mines
+    step = plan.mines
+    mp = MinesPredictor(game_id=seed, use_legacy=use_legacy)
+    if step.require_no_infested:
+        # 只要是 / 否：命中种子在楼层范围内本就没有怪物层，明细无需展开
+        ok, out["mines_detail"] = no_infested_in_range(
+            mp, step.start_day, step.end_day, step.floor_start, step.floor_end, with_details=False,
+        )
+        return ok
+    out["mines_detail"] = mp.predict_infested_in_range(step.start_day, step.end_day)
+    return True
+
+
+def evaluate_plan(plan: QueryPlan, seed: int, order: Optional[Sequence[str]] = None, stats: Optional["PredicateStats"] = None):
+    """
+    按 order（缺省 plan.order）依次判定，任一项失败立即返回。返回结构与原 worker 相同：
+    (seed, matched, mines_detail, chests_detail, desert_detail, ok, saloon_out, saloon_tag, saloon_ok, night_detail, night_ok)
+    传入 stats 时不短路：每一项都判定并把耗时 / 是否通过记进 stats（抽样测量用）。抛异常的项记为未通过、接着测后面的；
+    catch_errors 为 False 时，短路判定会走到的那一项出的异常在测完后照样抛出，与不带 stats 时一致。
+    """
+    out: Dict = {}
+    ok = True
+    error = None
+    for name in plan.order if order is None else order:
+        t0 = perf_counter() if stats is not None else 0.0
+        try:
+            passed = _eval_step(plan, name, seed, out)
+        except Exception as e:
+            if plan.catch_errors:
+                passed = False
+            elif stats is None:
+                raise
+            else:
+                if ok and error is None:
+                    error = e
+                passed = False
+        if stats is not None:
+            stats.record(name, passed, perf_counter() - t0)
+        elif not passed:
+            ok = False
+            break
+        ok = ok and passed
+    if error is not None:
+        raise error
+    return (
+        seed, out.get("matched", []), out.get("mines_detail", []), out.get("chests_detail", {}), out.get("desert_detail", {}),
+        ok, out.get("saloon_out"), out.get("saloon_tag"), out.get("saloon_ok", True), out.get("night_detail"), out.get("night_ok", True),
+    )
+
+
+# ---------- 自适应判定顺序 ----------
+# 固定的成本估计不考虑通过率：便宜但几乎全通过的筛选项排在前面并不划算。
+# 对每一项实测 平均耗时 c 与 淘汰率 r = 1 - 通过率，按 c / r（每淘汰一个 gameID 的期望耗时）升序排列，
+# 各项相互独立时这就是期望总耗时最小的顺序。
+
+STATS_MIN_SAMPLES = 16      # 每一项至少这么多次实测才参与排序，否则沿用原顺序
+STATS_MAX_SAMPLES = 4096    # 持久化时按此上限等比缩小旧样本，让统计能跟上实现 / 机器的变化
+OBSERVE_EVERY = 64          # 子进程里每隔这么多个 gameID 完整测量一次（不短路），据此在线调整顺序
+
+
+class PredicateStats:
+    """各筛选项的实测统计：name -> [次数, 通过次数, 总耗时（秒）]"""
+
+    def __init__(self, data: Optional[Dict[str, List[float]]] = None):
+        self.data: Dict[str, List[float]] = {k: list(v) for k, v in (data or {}).items()}
+
+    def record(self, name: str, passed: bool, seconds: float) -> None:
+        row = self.data.get(name)
+        if row is None:
+            row = self.data[name] = [0, 0, 0.0]
+        row[0] += 1
+        row[1] += 1 if passed else 0
+        row[2] += seconds
+
+    def pass_rate(self, name: str) -> Optional[float]:
+        row = self.data.get(name)
+        return row[1] / row[0] if row and row[0] else None
+
+    def mean_seconds(self, name: str) -> Optional[float]:
+        row = self.data.get(name)
+        return row[2] / row[0] if row and row[0] else None
+
+    def rank(self, name: str) -> float:
+        """每淘汰一个 gameID 的期望耗时；从不淘汰的项排最后"""
+        n, k, s = self.data[name]
+        return s / (n - k) if n > k else float("inf")
+
+    def order(self, names: Sequence[str]) -> Tuple[str, ...]:
+        """按 rank 升序重排；有一项样本不足时原样返回（不同单位的估计没法混排）"""
+        names = tuple(names)
+        if any(self.data.get(n, (0,))[0] < STATS_MIN_SAMPLES for n in names):
+            return names
+        return tuple(sorted(names, key=self.rank))
+
+    def describe(self, names: Sequence[str]) -> str:
+        parts = []
+        for n in names:
+            rate, sec = self.pass_rate(n), self.mean_seconds(n)
+            parts.append(n if rate is None else f"{n}(通过 {rate:.1%}，{sec * 1e6:.0f}µs)")
+        return " → ".join(parts)
+
+
+def _stats_key(plan: QueryPlan, name: str) -> str:
+    """持久化键：筛选项 + 参数形状（步骤的 repr）+ legacy"""
+    return f"{name}|{'legacy' if plan.use_legacy else 'xxhash'}|{getattr(plan, name)!r}"
+
+
+def load_stats(path: str, plan: QueryPlan) -> PredicateStats:
+    """读出 plan 各项的历史统计；文件不存在 / 损坏时为空"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return PredicateStats()
+    return PredicateStats({n: saved[_stats_key(plan, n)] for n in plan.order if _stats_key(plan, n) in saved})
+
+
+def save_stats(path: str, plan: QueryPlan, stats: PredicateStats) -> None:
+    """把 plan 各项的统计写回（保留文件里其他查询的记录），超过 STATS_MAX_SAMPLES 的按比例缩小"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        saved = {}
+    for name, (n, k, s) in stats.data.items():
+        if name in plan.order and n:
+            scale = min(1.0, STATS_MAX_SAMPLES / n)
+            saved[_stats_key(plan, name)] = [n * scale, k * scale, s * scale]
+    # 每次写各用一个临时文件：/api/search 的并发请求同时写回时互不覆盖，os.replace 后读到的总是完整文件
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(saved, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def tune_plan(
+    plan: QueryPlan,
+    seeds: Sequence[int],
+    samples: int = 128,
+    stats_path: Optional[str] = None,
+) -> Tuple[QueryPlan, PredicateStats]:
+    """
+    扫描前在 seeds 里均匀抽 samples 个 gameID 完整测量各项（样本不超过总数的 1/16），
+    与 stats_path 里的历史统计合并后重排 plan.order，并把合并结果写回 stats_path（写失败时忽略）。
+    只有一项（或没有）筛选时顺序无从选择，原样返回。
+    """
+    stats = load_stats(stats_path, plan) if stats_path else PredicateStats()
+    if len(plan.order) < 2:
+        return plan, stats
+    k = min(samples, len(seeds) // 16)
+    if k > 0:
+        stride = len(seeds) // k
+        for i in range(0, k * stride, stride):
+            try:
+                evaluate_plan(plan, seeds[i], stats=stats)
+            except Exception:
+                pass  # 抛异常的项已记为未通过；异常本身留给正式扫描按 catch_errors 处理
+        if stats_path:
+            try:
+                save_stats(stats_path, plan, stats)
+            except OSError:
+                pass  # 统计只影响判定顺序：写不回去不影响这次扫描
+    return replace(plan, order=stats.order(plan.order)), stats
+
+
+def plan_fingerprint(plan: QueryPlan) -> str:
+    """
+    断点续扫日志（utils.scan_journal）用的查询指纹：判定顺序、是否展开明细、块内预筛（只去掉必然失败的 gameID）
+    都不影响命中集合，不进指纹
+    """
+    key = replace(plan, order=tuple(sorted(plan.order)), details=True, sieve=None)
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+# ---------- 子进程 ----------
+# plan 通过 Pool 的 initializer 每个进程只传一次，任务里只传 gameID；
+# 每个进程各自抽样测量并在线调整判定顺序（判定结果与顺序无关）
+
+_plan: Optional[QueryPlan] = None
+_half_key = None
+_order: Tuple[str, ...] = ()
+_stats = PredicateStats()
+_calls = 0
+
+
+def _load_plan(plan: QueryPlan) -> None:
+    global _plan, _half_key, _order, _stats, _calls
+    _plan = plan
+    _half_key = half_id_key_for(plan.enabled, plan.use_legacy)
+    _order = plan.order
+    _stats = PredicateStats()
+    _calls = 0
+
+
+def install_plan(plan: QueryPlan, cache_size: int = sample_cache.DEFAULT_MAXSIZE, table_path: Optional[str] = None) -> None:
+    """子进程初始化：装入 plan，并配置进程内的 RNG 样本缓存 / 预计算表（见 utils.sample_cache.configure）"""
+    _load_plan(plan)
+    sample_cache.configure(cache_size, table_path)
+
+
+def evaluate_installed(seed: int):
+    global _order, _calls
+    _calls += 1
+    if _calls % OBSERVE_EVERY or len(_order) < 2:
+        return evaluate_plan(_plan, seed, _order)
+    result = evaluate_plan(_plan, seed, _order, stats=_stats)
+    _order = _stats.order(_order)
+    return result
+
+
+_sieve_indexes: Dict[Tuple[Optional[str], Optional[str]], Tuple] = {}
+
+
+def sieve_block(plan: QueryPlan, lo: int, hi: int) -> Optional[List[int]]:
+    """
+    对 gameID ∈ [lo, hi] 按 plan.sieve 预筛，返回可能命中的 gameID（升序）；没有可用的预筛时返回 None。
+    索引按路径在本进程里打开一次（文件不存在也只警告一次）。
+    """
+    s = plan.sieve
+    if s is None:
+        return None
+    paths = (s.chests[0] if s.chests else None, s.night[0] if s.night else None)
+    indexes = _sieve_indexes.get(paths)
+    if indexes is None:
+        indexes = _sieve_indexes[paths] = (open_chest_index(paths[0]), open_night_index(paths[1]))
+    return prefilter_seed_range(
+        lo, hi, use_legacy=plan.use_legacy,
+        weather=s.weather, mines=s.mines, saloon=s.saloon,
+        chests=(indexes[0], s.chests[1], s.chests[2]) if s.chests else None,
+        night=(indexes[1], s.night[1], s.night[2]) if s.night else None,
+    )
+
+
+def plan_block_seeds(plan: QueryPlan, task) -> Iterable[int]:
+    """块任务里要逐个判定的 gameID：区间块先过 plan.sieve，打包的 gameID 原样"""
+    if plan.sieve is not None and isinstance(task, tuple):
+        found = sieve_block(plan, task[0], task[1] - 1)
+        if found is not None:
+            return found
+    return block_seeds(task)
+
+
+def evaluate_installed_block(task):
+    """
+    区间块 worker（utils.scan_engine.iter_scan_blocks）：plan.details 为 False 时返回打包的命中 gameID，
+    否则返回命中结果列表。区间块先按 plan.sieve 预筛，只判定留下的 gameID（内存只与块大小有关）；
+    块内 gameID 有序，half_key 相同的相邻 gameID 沿用上一个的判定。
+    """
+    details = _plan.details
+    hits = []
+    last_key = last = None
+    for seed in plan_block_seeds(_plan, task):
+        k = None if _half_key is None else _half_key(seed)
+        if k is None or k != last_key:
+            last, last_key = evaluate_installed(seed), k
+        if last[5]:
+            hits.append(((seed,) + last[1:] if last[0] != seed else last) if details else seed)
+    return hits if details else pack_ids(hits)
+
+
+# ---------- 常驻进程池 ----------
+# 进程池跨请求复用时没法在 initializer 里装 plan：plan 先 pickle 成字节并算摘要（plan_blob，每个请求一次），
+# 随每个块任务发送；子进程按摘要缓存，只有换了查询才重新反序列化。
+
+_blob_digest: Optional[str] = None
+
+
+def plan_blob(plan: QueryPlan) -> Tuple[str, bytes]:
+    data = pickle.dumps(plan, protocol=pickle.HIGHEST_PROTOCOL)
+    return hashlib.sha1(data).hexdigest(), data
+
+
+def evaluate_blob_block(blob: Tuple[str, bytes], task):
+    """常驻进程池的区间块 worker：同 evaluate_installed_block，plan 随任务发送（见 plan_blob）"""
+    global _blob_digest
+    digest, data = blob
+    if digest != _blob_digest:
+        _load_plan(pickle.loads(data))
+        _blob_digest = digest
+    return evaluate_installed_block(task)
+
+
+def warm_up() -> None:
+    """把各筛选项都判定一次：导入期之外的惰性数据（年表 / 宝箱池 / 垃圾桶常量等）在子进程里先备好"""
+    plan = compile_query(
+        use_legacy=True,
+        weather=([{"start": 1, "end": 28, "min_count": 1}], ("Rain",)),
+        mines=(1, 1, 1, 10, True),
+        chests=([(10, "")], "ALL"),
+        desert=(False, False, ()),
+        saloon=(1, 1, 0.0, False, 1),
+        night=(1, False),
+    )
+    for seed in (0, 1):
+        evaluate_plan(plan, seed, stats=PredicateStats())  # 带 stats 时不短路，每一项都会跑到
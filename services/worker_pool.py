@@ -0,0 +1,205 @@
+# services/worker_pool.py
+# Flask 服务常驻的进程池：/api/search 不再每个请求新建 / 销毁 Pool（spawn 下每次都要重新起进程、导入模块）。
+# 子进程启动时配置样本缓存并把各筛选项预热一遍；plan 随任务发送（services.query_plan.plan_blob，
+# 每块多带几百字节到 2KB 左右，相对每块约 target_seconds 秒的计算可以忽略，子进程按摘要只反序列化一次），
+# 每个子进程执行 max_tasks 个块后自动换新（Pool 的 maxtasksperchild），空闲时定期 ping 一次，不响应就整池重建。
+import atexit
+import os
+import threading
+import time
+from functools import partial
+from multiprocessing import Pool, cpu_count
+from typing import Dict, Iterator, Optional
+
+from services.query_plan import QueryPlan, evaluate_blob_block, plan_blob, warm_up
+from utils import sample_cache
+from utils.scan_engine import ScanStats, iter_scan_blocks
+
+
+def _init_worker(cache_size: int, table_path: Optional[str]) -> None:
+    sample_cache.configure(cache_size, table_path)
+    warm_up()
+
+
+def _ping(_=None) -> int:
+    return os.getpid()
+
+
+class WorkerPool:
+    """
+    懒创建的常驻进程池（线程安全）：
+    - processes：进程数（None = cpu_count()）
+    - max_tasks：每个子进程最多执行的块数，到了就换新进程（None = 不换）
+    - health_interval：没有扫描在跑、且距上次检查超过这么多秒时，取池前先 ping 一次
+      （health_timeout 秒内不回应就重建）。有扫描在跑时从不重建：ping 排在它们的块后面，超时只说明忙。
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        cache_size: int = sample_cache.DEFAULT_MAXSIZE,
+        table_path: Optional[str] = None,
+        max_tasks: Optional[int] = 1000,
+        health_interval: float = 30.0,
+        health_timeout: float = 10.0,
+    ):
+        self.processes = processes or cpu_count()
+        self.initargs = (cache_size, table_path)
+        self.max_tasks = max_tasks
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._pool = None
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()  # 取池时的健康检查同一时间只做一个，其余取池方等它的结论
+        self._checked = 0.0
+        self._active = 0   # 正在这个池上跑的扫描数
+        self.restarts = 0
+        self.searches = 0
+
+    def _start(self) -> None:
+        self._pool = Pool(processes=self.processes, initializer=_init_worker, initargs=self.initargs,
+                          maxtasksperchild=self.max_tasks)
+        self._checked = time.monotonic()
+
+    def _stop(self) -> None:
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def _answers(self, pool) -> bool:
+        try:
+            pool.apply_async(_ping).get(timeout=self.health_timeout)
+        except Exception:
+            return False
+        return True
+
+    def _acquire(self):
+        """
+        取出可用的进程池并计入一次在途扫描（首次调用时创建；空闲且到了检查间隔先做健康检查）。
+        ping 在 self._lock 外做：最长 health_timeout 秒的等待不挡 health() / 扫描结束 / restart()。
+        """
+        with self._check_lock:
+            with self._lock:
+                if self._pool is None:
+                    self._start()
+                pool = self._pool
+                if self._active or time.monotonic() - self._checked <= self.health_interval:
+                    self._active += 1
+                    return pool
+            # 池空闲，ping 不用排队：超时就是真的不响应了（取池都排在 _check_lock 后面，ping 期间不会有新扫描）
+            ok = self._answers(pool)
+            with self._lock:
+                if self._pool is pool:
+                    if ok:
+                        self._checked = time.monotonic()
+                    elif not self._active:
+                        self._restart()
+                elif self._pool is None:  # ping 期间被 close()
+                    self._start()
+                self._active += 1
+                return self._pool
+
+    def _release(self) -> None:
+        with self._lock:
+            self._active -= 1
+
+    def _restart(self) -> None:
+        self._stop()
+        self._start()
+        self.restarts += 1
+
+    def restart(self) -> bool:
+        """没有扫描在跑时整池重建，返回是否重建了（有扫描在跑时不动，免得它们的块永远等不回来）"""
+        with self._lock:
+            if self._active:
+                return False
+            self._restart()
+            return True
+
+    def warm(self) -> None:
+        """启动服务时调用：立刻建好进程池并等所有子进程完成预热"""
+        pool = self._acquire()
+        try:
+            pool.map(_ping, range(self.processes), chunksize=1)
+        finally:
+            self._release()
+
+    def health(self) -> Dict:
+        """
+        ping 在锁外做，不挡 /api/search 取池。status：ok = 按时回应；busy = 有扫描在跑、ping 排在它们的块后面
+        没按时回来；dead = 没有扫描在跑也不回应；not_started = 还没建池。
+        """
+        with self._lock:
+            pool, active = self._pool, self._active
+        if pool is None:
+            status = "not_started"
+        elif self._answers(pool):
+            status = "ok"
+        else:
+            with self._lock:
+                status = "busy" if active or self._active else "dead"
+        return {"ok": status != "dead", "status": status, "active_scans": active, "processes": self.processes,
+                "max_tasks": self.max_tasks, "restarts": self.restarts, "searches": self.searches}
+
+    def scan_blocks(
+        self,
+        seeds,
+        plan: QueryPlan,
+        block: int = 4096,
+        target_seconds: Optional[float] = None,
+        stats: Optional[ScanStats] = None,
+        journal=None,
+    ) -> Iterator:
+        """
+        按区间块扫描 seeds（见 utils.scan_engine.iter_scan_blocks，journal 为断点续扫日志），plan 随任务发送：
+        池里的子进程会换新、也不能逐个安装，每块都带上 plan_blob（摘要 + pickle），子进程摘要没变就不再反序列化。
+        迭代期间计入在途扫描；池在扫描中途被关闭（close / configure）时抛 RuntimeError。
+        扫描出错不重建池，只让下一次空闲时取池先做健康检查。
+        """
+        pool = self._acquire()
+        with self._lock:
+            self.searches += 1
+        try:
+            yield from iter_scan_blocks(seeds, partial(evaluate_blob_block, plan_blob(plan)),
+                                        processes=self.processes, block=block, pool=pool,
+                                        target_seconds=target_seconds, stats=stats, journal=journal,
+                                        alive=lambda: self._pool is pool)
+        except Exception:
+            with self._lock:
+                self._checked = 0.0
+            raise
+        finally:
+            self._release()
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+
+
+# —— 进程级共享实例（由 Flask 服务持有，app.py 导入时配置；CLI 扫描仍各自建池）——
+_shared: Optional[WorkerPool] = None
+_shared_lock = threading.Lock()
+
+
+def configure(**kwargs) -> None:
+    """用 WorkerPool 的参数重设共享池（旧池立即关闭，新池在第一次使用时才启动）"""
+    global _shared
+    with _shared_lock:
+        if _shared is not None:
+            _shared.close()
+        _shared = WorkerPool(**kwargs)
+
+
+def shared() -> WorkerPool:
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = WorkerPool()
+        return _shared
+
+
+@atexit.register
+def _close_shared() -> None:
+    if _shared is not None:
+        _shared.close()
@@ -0,0 +1,31 @@
+# test_chest_index.py
+import os
+import tempfile
+
+from functions.chest_index import build, ChestIndex
+from functions.chests import ChestsPredictor
+from services.predict import check_chest_rules_nested
+
+# ===== 参数 =====
+ID_START = -2000
+ID_COUNT = 12000
+RULES = [
+    ([(20, "磁铁戒指"), [[(80, "长柄锤"), (110, "太空之靴")], [(80, "蹈火者靴"), (110, "巨锤")]]], "ALL"),
+    ([(20, "磁铁戒指"), (10, "股骨")], "ANY"),
+    ([(40, "弹弓"), (90, "黑曜石之刃")], "ALL"),
+]
+
+# ===== 主程序 =====
+path = os.path.join(tempfile.gettempdir(), "test_chest_index.bin")
+build(path, ID_START, ID_COUNT, verbose=False)
+idx = ChestIndex(path)
+print(f"宝箱索引：gameID [{idx.id_start}, {idx.id_start + idx.id_count})，楼层 {idx.floors}")
+
+lo, hi = ID_START + 100, ID_START + ID_COUNT - 100
+for rules, mode in RULES:
+    got = list(idx.match_rules(rules, mode, lo, hi, block=3000))
+    want = [g for g in range(lo, hi + 1) if check_chest_rules_nested(ChestsPredictor(g), rules, mode)[0]]
+    print(f"{mode} {rules}：索引 {len(got)} 个，逐个判定 {len(want)} 个，一致 {got == want}")
+
+idx.close()
+os.remove(path)
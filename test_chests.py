@@ -21,3 +21,44 @@ for floor in sorted(predicted.keys()):
     else:
         zh = cp.display_name(item_en)  # 中文别名
     print(f"  第 {floor} 层: {item_en} / {zh}")
+
+# 查询计划：宝箱别名编译成掉落池下标后逐个 gameID 判定，与按名字比较的旧判定对拍
+from services.predict import check_chest_rules_nested
+from services.query_plan import compile_query, evaluate_plan
+
+rules = [(20, "磁铁戒指"), [[(80, "长柄锤"), (110, "太空之靴")], (10, "股骨")]]
+for mode in ("ALL", "ANY"):
+    plan = compile_query(use_legacy=USE_LEGACY, chests=(rules, mode))
+    same = all(
+        evaluate_plan(plan, g)[5] == check_chest_rules_nested(ChestsPredictor(game_id=g, use_legacy=USE_LEGACY), rules, mode)[0]
+        for g in range(-2000, 2000)
+    )
+    print(f"查询计划 {mode}：与逐条规则判定一致 {same}")
+
+# 自适应判定顺序：抽样实测后重排，判定结果与顺序无关
+from services.query_plan import tune_plan
+
+plan = compile_query(use_legacy=USE_LEGACY, chests=(rules, "ANY"), mines=(5, 5, 1, 20, True))
+tuned, stats = tune_plan(plan, range(-2000, 2000), samples=128)
+print("判定顺序：", stats.describe(tuned.order))
+same = all(evaluate_plan(plan, g)[5] == evaluate_plan(tuned, g)[5] for g in range(-2000, 2000))
+print(f"重排前后判定一致 {same}")
+
+# 抽样测量（带 stats、不短路）时某一项抛异常：记为未通过、接着测后面的；短路判定会走到它时测完照样抛出
+from dataclasses import replace
+from services.query_plan import ChestStep, PredicateStats
+
+
+def outcome(p, g, stats=None):
+    try:
+        return evaluate_plan(p, g, stats=stats)[5]
+    except KeyError:
+        return "KeyError"
+
+
+broken = replace(plan, order=("mines", "chests"), chests=ChestStep(levels=(10,), rules=((((7, 0),),),), any_mode=False))
+probe = PredicateStats()
+same = all(outcome(broken, g) == outcome(broken, g, probe) for g in range(-2000, 2000))
+tuned, stats = tune_plan(broken, range(-2000, 2000), samples=128)
+print(f"抛异常的项：带 stats 与短路判定一致 {same}，宝箱一项记为通过率 {probe.pass_rate('chests')}，"
+      f"抽样调序不中断 {sorted(tuned.order) == ['chests', 'mines']}")
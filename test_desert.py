@@ -20,3 +20,29 @@ for seed in seeds:
 
     for d, (has_leah, lst) in res.items():
         print(f"春{15+d} : {lst}")
+
+# 多场景一次算完，与逐个场景分别计算对拍
+from functions.desert_festival import DesertScenario
+
+scenarios = (
+    DesertScenario(),
+    DesertScenario(leo_moved=True),
+    DesertScenario(year=2),
+    DesertScenario(day_adjust=1),
+    # NPC 顺序变了（同样大小的池，被选中的位置相同、名字不同）/ 少了几个 NPC（池变小）
+    DesertScenario(characters_in_order=tuple(reversed(DesertScenario().characters_in_order))),
+    DesertScenario(characters_in_order=tuple(n for n in DesertScenario().characters_in_order
+                                              if n not in ("Abigail", "Sam", "Jodi")), year=2),
+)
+for seed in range(7600, 7610):
+    dp = DesertFestivalPredictor(game_id=seed, use_legacy=True, year=1, leo_moved=False, debug=False)
+    fast = dp.vendors_for_scenarios(scenarios)
+    slow = []
+    for sc in scenarios:
+        one = DesertFestivalPredictor(game_id=seed, use_legacy=True, year=sc.year, leo_moved=sc.leo_moved, debug=False)
+        one.characters_in_order = list(sc.characters_in_order)
+        # dayAdjust 只把每天的播种日往后挪：逐个场景的参照也按同样的日子取样本
+        one._seed = lambda day_abs, base=one._seed, adj=sc.day_adjust: base(day_abs + adj)
+        res = one.vendors_for_three_days()
+        slow.append(tuple(v for d in range(3) for v in res[d]))
+    print(f"种子 {seed} 多场景一致：", [tuple(v) for v in fast] == slow, "Jas 出现：", dp.vendor_presence(scenarios, ["Jas"]))
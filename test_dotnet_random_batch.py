@@ -0,0 +1,55 @@
+# test_dotnet_random_batch.py
+from utils.dotnet_random import DotNetRandom
+from utils.dotnet_random_batch import DotNetRandomBatch
+
+# ===== 参数 =====
+SEEDS = [0, 1, -1, 42, 7605, 23456789, 2147483647, -2147483648, -123456789]
+STEPS = 200        # 每个 RNG 对拍多少次调用
+
+# ===== 主程序 =====
+batch = DotNetRandomBatch(SEEDS)
+scalars = [DotNetRandom(s) for s in SEEDS]
+
+mismatch = 0
+for step in range(STEPS):
+    kind = step % 3
+    if kind == 0:
+        got = batch.InternalSample().tolist()
+        want = [r.InternalSample() for r in scalars]
+    elif kind == 1:
+        got = batch.NextDouble().tolist()
+        want = [r.NextDouble() for r in scalars]
+    else:
+        got = batch.Next(27).tolist()
+        want = [r.Next(27) for r in scalars]
+    if got != want:
+        mismatch += 1
+        print(f"第 {step} 步不一致：batch={got} scalar={want}")
+
+print(f"{len(SEEDS)} 个种子 × {STEPS} 步，不一致 {mismatch} 次")
+
+# ===== skip(n)：跳过 n 个样本，与逐个调用对拍 =====
+SKIPS = [0, 1, 54, 55, 199, 5000, 123457]
+mismatch = 0
+for n in SKIPS:
+    batch = DotNetRandomBatch(SEEDS)
+    batch.skip(n)
+    got = batch.InternalSample().tolist()
+    want = []
+    for s in SEEDS:
+        r = DotNetRandom(s)
+        r2 = DotNetRandom(s)
+        r.skip(n)
+        for _ in range(n):
+            r2.InternalSample()
+        if r.InternalSample() != r2.InternalSample():
+            print(f"标量 skip({n}) 不一致：seed={s}")
+            mismatch += 1
+        r3 = DotNetRandom(s)
+        r3.skip(n)
+        want.append(r3.InternalSample())
+    if got != want:
+        mismatch += 1
+        print(f"批量 skip({n}) 不一致：batch={got} scalar={want}")
+
+print(f"skip 对拍 {len(SKIPS)} 组，不一致 {mismatch} 次")
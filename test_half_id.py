@@ -0,0 +1,112 @@
+# test_half_id.py
+from functions.mines import MinesPredictor
+from functions.desert_festival import DesertFestivalPredictor
+from functions.night_events import predict_night_event_for_day
+from services.predict import half_id_key_for
+
+# ===== 参数 =====
+GAME_IDS = list(range(-200, 200)) + list(range(2**31 - 50, 2**31)) + list(range(-2**31, -2**31 + 50))
+MINES_DAYS = (1, 8)
+NIGHT_DAYS = range(1, 6)
+
+# ===== 主程序 =====
+for use_legacy in (True, False):
+    key = half_id_key_for(["mines", "desert", "night"], use_legacy)
+
+    def signature(g):
+        mines = [sorted(d.floors) for d in MinesPredictor(g, use_legacy=use_legacy).predict_infested_in_range(*MINES_DAYS)]
+        desert = DesertFestivalPredictor(g, use_legacy=use_legacy).vendors_for_three_days()
+        night = [predict_night_event_for_day(g, d).event for d in NIGHT_DAYS]
+        return mines, desert, night
+
+    reps = {}  # key -> 第一个出现的 gameID（代表）
+    bad = [g for g in GAME_IDS if signature(g) != signature(reps.setdefault(key(g), g))]
+    print(f"use_legacy={use_legacy}：{len(GAME_IDS)} 个 gameID → {len(reps)} 个代表，与代表不一致 {len(bad)} 个 {bad[:5]}")
+
+print("含宝箱 / 天气 / 垃圾桶时不合并：",
+      half_id_key_for(["mines", "chests"], True) is None,
+      half_id_key_for(["night", "weather"], True) is None,
+      half_id_key_for(["desert", "saloon"], True) is None)
+
+# 区间块协议：任务只发 (start, stop) / 打包的候选 gameID，子进程回传打包的命中
+from dataclasses import replace
+from services.query_plan import compile_query, evaluate_plan, install_plan, evaluate_installed_block
+from utils.scan_engine import iter_scan_blocks
+
+plan = compile_query(use_legacy=True, night=(10, True), mines=(5, 5, 1, 20, True))
+quiet = replace(plan, details=False)
+for seeds in (range(-3000, 3000), GAME_IDS):
+    blocks = list(iter_scan_blocks(seeds, evaluate_installed_block, processes=2, block=333, initializer=install_plan, initargs=(quiet,)))
+    print(f"区间块扫描与逐个判定一致：{blocks == [g for g in seeds if evaluate_plan(plan, g)[5]]}，命中 {len(blocks)} 个")
+
+# 常驻进程池：跨查询复用（plan 随任务发送、按摘要缓存），子进程跑满 max_tasks 个块后换新
+from services.worker_pool import WorkerPool
+
+wp_pool = WorkerPool(processes=2, max_tasks=3)
+for q in (quiet, replace(compile_query(use_legacy=True, night=(3, False)), details=False), quiet):
+    got = list(wp_pool.scan_blocks(range(-3000, 3000), q, block=500))
+    print(f"常驻进程池扫描与逐个判定一致：{got == [g for g in range(-3000, 3000) if evaluate_plan(q, g)[5]]}，命中 {len(got)} 个")
+print("进程池状态：", wp_pool.health())
+# 有扫描在跑时不重建（否则它还没回来的块永远等不到）；扫描结束后才可以
+running = wp_pool.scan_blocks(range(-3000, 3000), quiet, block=500)
+first = next(running)
+print(f"扫描进行中不重建：{wp_pool.restart() is False}，扫完后可重建：{len([first] + list(running)) == 34 and wp_pool.restart()}")
+wp_pool.close()
+
+# 自适应块大小：按实测吞吐把每块调到约 target_seconds 秒，尾部逐块变小；结束后看各进程利用率
+from utils.scan_engine import ScanStats
+
+scan_stats = ScanStats()
+adaptive = list(iter_scan_blocks(range(-3000, 3000), evaluate_installed_block, processes=2, block=100,
+                                 initializer=install_plan, initargs=(quiet,), target_seconds=0.02, stats=scan_stats))
+print(f"自适应块大小扫描一致：{adaptive == [g for g in range(-3000, 3000) if evaluate_plan(plan, g)[5]]}")
+print("扫描统计：", scan_stats.describe())
+
+# 断点续扫日志：扫到一半中断（尾记录写坏），同一查询重扫只补剩下的块，结果与完整扫描一致
+import tempfile
+from services.query_plan import plan_fingerprint
+from utils.scan_journal import open_journal
+
+journal_dir = tempfile.mkdtemp()
+full = [g for g in range(-3000, 3000) if evaluate_plan(plan, g)[5]]
+journal = open_journal(journal_dir, plan_fingerprint(quiet), range(-3000, 3000))
+for i, _ in enumerate(iter_scan_blocks(range(-3000, 3000), evaluate_installed_block, processes=2, block=250,
+                                       initializer=install_plan, initargs=(quiet,), journal=journal)):
+    if i >= len(full) // 2:
+        break
+journal.close()
+with open(journal.path, "ab") as f:
+    f.write(b"\x00torn")
+journal = open_journal(journal_dir, plan_fingerprint(quiet), range(-3000, 3000))
+resumed = list(iter_scan_blocks(range(-3000, 3000), evaluate_installed_block, processes=2, block=250,
+                                initializer=install_plan, initargs=(quiet,), journal=journal))
+journal.close()
+print(f"断点续扫与完整扫描一致：{resumed == full}，日志里已完成 {journal.resumed_blocks} 块 / {journal.resumed_seeds} 个")
+
+# 块内预筛：worker 先对自己的 (start, stop) 块批量筛一遍（矿井无怪物层 / 垃圾桶），结果与不筛时一致
+for kw in (dict(mines=(5, 5, 1, 20, True)), dict(saloon=(1, 5, 0.0, False, 2))):
+    sieved, unsieved = (compile_query(use_legacy=True, details=False, sieve=s, **kw) for s in (True, False))
+    got = list(iter_scan_blocks(range(-3000, 3000), evaluate_installed_block, processes=2, block=500,
+                                initializer=install_plan, initargs=(sieved,)))
+    want = list(iter_scan_blocks(range(-3000, 3000), evaluate_installed_block, processes=2, block=500,
+                                 initializer=install_plan, initargs=(unsieved,)))
+    print(f"块内预筛 {list(kw)}：预筛 {sieved.sieve is not None}，命中 {len(got)} 个，与不预筛一致 {got == want}")
+
+# 预筛的断点续扫：日志按原始区间定位，已完成的块不再派发（也不再预筛），子进程只扫剩下的空档
+sieved = compile_query(use_legacy=True, details=False, sieve=True, mines=(5, 5, 1, 20, True))
+full = [g for g in range(-3000, 3000) if evaluate_plan(sieved, g)[5]]
+journal = open_journal(journal_dir, plan_fingerprint(sieved), range(-3000, 3000))
+for i, _ in enumerate(iter_scan_blocks(range(-3000, 3000), evaluate_installed_block, processes=2, block=250,
+                                       initializer=install_plan, initargs=(sieved,), journal=journal)):
+    if i >= len(full) // 2:
+        break
+journal.close()
+journal = open_journal(journal_dir, plan_fingerprint(sieved), range(-3000, 3000))
+scan_stats = ScanStats()
+resumed = list(iter_scan_blocks(range(-3000, 3000), evaluate_installed_block, processes=2, block=250,
+                                initializer=install_plan, initargs=(sieved,), journal=journal, stats=scan_stats))
+journal.close()
+dispatched = sum(int(row[1]) for row in scan_stats.workers.values())
+print(f"预筛断点续扫与完整扫描一致：{resumed == full}，日志里已完成 {journal.resumed_seeds} 个，"
+      f"重新派发 {dispatched} 个（应为 {6000 - journal.resumed_seeds}），"
+      f"指纹与不预筛相同 {plan_fingerprint(sieved) == plan_fingerprint(replace(sieved, sieve=None))}")
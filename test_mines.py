@@ -15,3 +15,20 @@ if floors:
     print(sorted(floors))
 else:
     print("无怪物层")
+
+# ===== 区间筛（种子位图 + 移位）与逐个 gameID 对拍 =====
+from functions.mines import scan_no_infested
+from services.predict import no_infested_in_range
+
+LO, HI = SEED - 1000, SEED + 1000
+START_DAY, END_DAY, FLOOR_START, FLOOR_END = 5, 6, 1, 25
+fast = scan_no_infested(LO, HI, START_DAY, END_DAY, FLOOR_START, FLOOR_END, USE_LEGACY)
+slow = [no_infested_in_range(MinesPredictor(g, USE_LEGACY), START_DAY, END_DAY, FLOOR_START, FLOOR_END)[0]
+        for g in range(LO, HI + 1)]
+print(f"\n区间 [{LO}, {HI}] 批量筛一致：", fast == slow, "无怪物层", sum(slow))
+
+# 楼层位图：按楼层范围只播种需要的层；是 / 否判定遇到第一个怪物层即停
+atlas = MinesPredictor(game_id=7605).atlas(1, 5, 1, 40, with_slime=True)
+for d in range(atlas.start_day, atlas.end_day + 1):
+    print(f"Day{d}: 怪物层 {sorted(atlas.floors(d))}，其中史莱姆层 {sorted(atlas.slime_floors(d))}")
+print("1~40 层第一个怪物层：", MinesPredictor(game_id=7605).first_infested(1, 5, 1, 40))
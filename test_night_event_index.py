@@ -0,0 +1,31 @@
+# test_night_event_index.py
+import os
+import tempfile
+
+from functions.night_event_index import build, NightEventIndex
+from functions.night_events import game_ids_with_night_event, predict_night_event_for_day
+
+# ===== 参数 =====
+SEED_START = -2000
+SEED_COUNT = 20000
+LO, HI = -3000, 3000
+QUERIES = [("Fairy", 1, 1), ("Fairy", 1, 28), ("Witch", 20, 30), ("Stone Owl", 85, 90)]
+
+# ===== 主程序 =====
+path = os.path.join(tempfile.gettempdir(), "test_night_index.bin")
+build(path, SEED_START, SEED_COUNT, verbose=False)
+idx = NightEventIndex(path)
+print(f"夜间事件索引：种子 [{idx.seed_start}, {idx.seed_start + idx.seed_count})，收录 {idx.n_entries} 个")
+
+for greenhouse in (False, True):
+    for event, d0, d1 in QUERIES:
+        fast = game_ids_with_night_event(event, d0, d1, LO, HI, greenhouse_unlocked=greenhouse, index=idx)
+        slow = game_ids_with_night_event(event, d0, d1, LO, HI, greenhouse_unlocked=greenhouse)
+        print(f"温室={greenhouse} {event} 白天 {d0}-{d1}：索引 {len(fast)} 个，逐个判定 {len(slow)} 个，一致 {fast == slow}")
+
+bad = sum(1 for g in range(LO, HI, 13) for d in (1, 6, 21, 90, 120)
+          if idx.event_for(g, d) != predict_night_event_for_day(g, d).event)
+print("单点 event_for 不一致：", bad)
+
+idx.close()
+os.remove(path)
@@ -0,0 +1,49 @@
+# test_random_seed_array.py
+import numpy as np
+
+from utils.rng_wrappers import get_random_seed, get_hash_from_string
+from utils.rng_wrappers_batch import get_random_seed_array
+
+# ===== 参数 =====
+rng = np.random.default_rng(7605)
+GAME_IDS = np.concatenate([
+    np.arange(-50, 50),
+    rng.integers(-2**31, 2**31, size=2000),
+    np.array([2**31 - 1, -2**31, 2**31 - 2, -2**31 + 1]),
+])
+H_WEATHER = get_hash_from_string("location_weather")
+H_SALOON = get_hash_from_string("Saloon")
+
+# 每组：(说明, 数组版调用, 标量版调用)
+CASES = [
+    ("沙漠节 (day, gameID/2)", lambda g: get_random_seed_array(15, g / 2), lambda g: get_random_seed(15, g / 2)),
+    ("矿井 (day, gameID/2, level*100)", lambda g: get_random_seed_array(5, g / 2, 8700), lambda g: get_random_seed(5, g / 2, 8700)),
+    ("宝箱 (gameID*512, floor)", lambda g: get_random_seed_array(g * 512, 110), lambda g: get_random_seed(g * 512, 110)),
+    ("天气 (hash, gameID, day-1)", lambda g: get_random_seed_array(H_WEATHER, g, 12), lambda g: get_random_seed(H_WEATHER, g, 12)),
+    ("垃圾桶 (day, gameID/2, 777+hash)", lambda g: get_random_seed_array(3, g / 2, 777 + H_SALOON), lambda g: get_random_seed(3, g / 2, 777 + H_SALOON)),
+    ("任意浮点 (gameID/3)", lambda g: get_random_seed_array(1, g / 3), lambda g: get_random_seed(1, g / 3)),
+]
+
+# ===== 主程序 =====
+for name, batch_fn, scalar_fn in CASES:
+    got = batch_fn(GAME_IDS).tolist()
+    want = [scalar_fn(int(g)) for g in GAME_IDS]
+    bad = sum(1 for x, y in zip(got, want) if x != y)
+    print(f"{name}：{len(want)} 个 gameID，不一致 {bad} 个")
+
+got = get_random_seed_array(range(-10, 10), 7).tolist()
+want = [get_random_seed(g, 7) for g in range(-10, 10)]
+print("range 输入一致：", got == want)
+
+# ===== use_legacy=False：批量 xxHash32 =====
+NEW_CASES = [
+    ("矿井 (non-legacy)", lambda g: get_random_seed_array(5, g / 2, 8700, use_legacy=False),
+     lambda g: get_random_seed(5, g / 2, 8700, use_legacy=False)),
+    ("天气 (non-legacy)", lambda g: get_random_seed_array(H_WEATHER, g, 12, use_legacy=False),
+     lambda g: get_random_seed(H_WEATHER, g, 12, use_legacy=False)),
+]
+for name, batch_fn, scalar_fn in NEW_CASES:
+    got = batch_fn(GAME_IDS).tolist()
+    want = [scalar_fn(int(g)) for g in GAME_IDS]
+    bad = sum(1 for x, y in zip(got, want) if x != y)
+    print(f"{name}：{len(want)} 个 gameID，不一致 {bad} 个")
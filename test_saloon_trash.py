@@ -35,3 +35,26 @@ for seed in seeds:
         print("没有符合的日期")
     else:
         print(f"符合日期：{dish_days}")
+
+# 原始样本表：建一次表，换运势 / 垃圾书只做整列比较；与逐个模拟对拍
+from functions.trashcans import SaloonRollTable
+from services.predict import evaluate_saloon_trash_range
+
+lo, hi = 7000, 7999
+table = SaloonRollTable(lo, hi, start_day, end_day)
+for luck, book, need in [(-0.1, False, 1), (0.0, False, 2), (0.1, True, 3)]:
+    fast = table.passing_ids(need, daily_luck=luck, has_garbage_book=book)
+    slow = [g for g in range(lo, hi + 1)
+            if evaluate_saloon_trash_range(g, start_day=start_day, end_day=end_day, daily_luck=luck,
+                                           has_garbage_book=book, require_min_hit_days=need)[0]]
+    print(f"运势={luck} 垃圾书={book} 至少 {need} 天：一致 {fast == slow}，命中 {len(slow)}")
+
+# 分段建表 / 超过缓存上限按块建表且不缓存：结果与一整张表一致
+import functions.trashcans as trashcans
+from functions.trashcans import scan_saloon_dish
+
+whole = table.passing_ids(1, daily_luck=0.0)
+trashcans._BUILD_SLICE, trashcans.SALOON_TABLE_MAX_CELLS = 97, 2000
+sliced = SaloonRollTable(lo, hi, start_day, end_day).passing_ids(1, daily_luck=0.0)
+blocked = scan_saloon_dish(lo, hi, start_day, end_day, daily_luck=0.0)
+print(f"分段建表一致：{sliced == whole}，按块建表一致：{blocked == whole}，大表未缓存：{trashcans._last_table is None}")
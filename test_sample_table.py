@@ -0,0 +1,40 @@
+# test_sample_table.py
+import os
+import tempfile
+
+from utils.dotnet_random import DotNetRandom, first_doubles, first_double, nth_sample
+from utils import sample_table
+
+# ===== 参数 =====
+SEED_START = -1000
+SEED_COUNT = 5000
+K = 8
+
+# ===== 主程序 =====
+path = os.path.join(tempfile.gettempdir(), "test_rng_samples.bin")
+sample_table.build(path, SEED_START, SEED_COUNT, K, verbose=False)
+
+table = sample_table.install(path)
+print(f"样本表：种子 [{table.seed_start}, {table.seed_start + table.seed_count})，k={table.k}")
+
+mismatch = 0
+for seed in list(range(SEED_START, SEED_START + SEED_COUNT, 37)) + [SEED_START + SEED_COUNT + 5]:
+    r = DotNetRandom(seed)
+    want = [r.NextDouble() for _ in range(K + 2)]
+    if first_doubles(seed, K + 2) != want or first_doubles(seed, 3) != want[:3] or first_double(seed) != want[0]:
+        mismatch += 1
+        print(f"种子 {seed} 不一致")
+    if nth_sample(seed, K) != int(round(want[K - 1] * DotNetRandom.MBIG)):
+        mismatch += 1
+        print(f"种子 {seed} 第 {K} 个样本不一致")
+
+sample_table.uninstall()
+os.remove(path)
+print(f"不一致 {mismatch} 次")
+
+# n 从 1 开始：n < 1 不再悄悄读到仿射表的错误槽位
+try:
+    nth_sample(12345, 0)
+    print("nth_sample(12345, 0) 没有报错")
+except ValueError as e:
+    print(f"nth_sample(12345, 0) 报错：{e}")
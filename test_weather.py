@@ -20,3 +20,37 @@ for d in days:
 
 rainy = [d.dom for d in days if d.weather_en in {"Rain", "Storm", "Green Rain"}]
 print("\n雨天：", rainy)
+
+# 区间批量判定（平移比特流 + 前缀和）与逐个 gameID 的 evaluate_weather_clauses 对拍
+from services.predict import evaluate_weather_clauses
+from functions.weather import scan_weather_clauses
+
+scan_lo, scan_hi = game_id - 500, game_id + 500
+clauses = [{"start": 1, "end": 28, "min_count": 6}, {"start": 60, "end": 80, "min_count": 4}]
+targets = ("Rain", "Storm", "Green Rain")
+fast = scan_weather_clauses(scan_lo, scan_hi, clauses, targets, use_legacy)
+slow = [evaluate_weather_clauses(WeatherPredictor(g, use_legacy), clauses, targets)[0] for g in range(scan_lo, scan_hi + 1)]
+print(f"\n区间 [{scan_lo}, {scan_hi}] 批量判定一致：", fast == slow, "命中", sum(slow))
+
+# 天气码日历：整年一次算出，批量版与逐个 gameID 对拍
+from functions.weather import WEATHER_CODES, weather_calendars
+
+cal = wp.calendar_years(1, 2)
+print("\n第1~2年天气码长度：", len(cal), "夏季前7天：", [WEATHER_CODES[c] for c in cal[28:35]])
+ids = list(range(game_id - 50, game_id + 50))
+batch = weather_calendars(ids, 1, 224, use_legacy)
+print("批量日历一致：", all(bytes(batch[i]) == WeatherPredictor(g, use_legacy).calendar(1, 224) for i, g in enumerate(ids)))
+
+# 天气模式（连续 / 不下雨 / 每周）：区间位并行判定与逐个 gameID 对拍
+from services.predict import scan_weather_patterns
+
+patterns = [{"type": "weekly", "start": 1, "end": 28}, {"type": "none", "start": 5, "end": 7},
+            {"type": "streak", "start": 29, "end": 56, "length": 2, "targets": ["Sun"]}]
+fast = scan_weather_patterns(scan_lo, scan_hi, patterns, targets, use_legacy)
+slow = [evaluate_weather_clauses(WeatherPredictor(g, use_legacy), patterns, targets)[0] for g in range(scan_lo, scan_hi + 1)]
+print("天气模式批量判定一致：", fast == slow, "命中", sum(slow))
+
+# 逐个 gameID 判定只算子句覆盖的日子并提前结束；不要明细时结果不变
+sparse = [{"start": 5, "end": 7, "min_count": 1}, {"start": 200, "end": 210, "min_count": 3, "targets": ["Rain"]}]
+quick = [evaluate_weather_clauses(WeatherPredictor(g, use_legacy), sparse, targets, with_details=False)[0] for g in range(scan_lo, scan_hi + 1)]
+print("稀疏子句提前结束一致：", quick == scan_weather_patterns(scan_lo, scan_hi, sparse, targets, use_legacy), "命中", sum(quick))
@@ -1,5 +1,8 @@
 # utils/dotnet_random.py
 # 精确还原 C# System.Random（legacy RNG）
+import threading
+from operator import mul as _mul
+
 
 class DotNetRandom:
     MBIG = 2147483647
@@ -84,3 +87,234 @@ class DotNetRandom:
     def NextBytes(self, buffer):
         for i in range(len(buffer)):
             buffer[i] = int(self.InternalSample() % 256)
+
+    def skip(self, n: int) -> None:
+        """
+        等价于连续调用 n 次 InternalSample() 并丢弃结果。
+        n 较小时用局部变量直接递推；n 很大时按线性递推做多项式跳跃，代价约 O(55^2 * log n)。
+        """
+        n = int(n)
+        if n <= 0:
+            return
+        s = self.SeedArray
+        if n < _SKIP_JUMP_MIN:
+            M = self.MBIG
+            i = self.inext
+            ip = self.inextp
+            for _ in range(n):
+                i += 1
+                if i >= 56:
+                    i = 1
+                ip += 1
+                if ip >= 56:
+                    ip = 1
+                # 状态值恒在 [0, MBIG) 内，差值不会等于 MBIG
+                v = s[i] - s[ip]
+                if v < 0:
+                    v += M
+                s[i] = v
+            self.inext = i
+            self.inextp = ip
+            return
+        # 窗口：按“由旧到新”排列的 55 个状态槽；跳跃后写回同样的槽位，inext / inextp 不变
+        slots = [((self.inext + k) % 55) + 1 for k in range(55)]
+        window = [s[k] for k in slots]
+        for k, v in zip(slots, _jump_window(window, n)):
+            s[k] = v
+
+
+# ------------------------------------------------------------
+# 快速路径：只要“种子 s 的前 k 个样本”时，不构造 DotNetRandom 对象。
+# 播种、混洗、采样里的每一步都是 [0, MBIG) 内的减法再“<0 则 +MBIG”，恰好就是 mod MBIG，
+# 所以整条序列对 mj = MSEED - |seed| 是仿射的：第 n 个 InternalSample = (A[n]*mj + B[n]) % MBIG。
+# 系数只与算法有关、与种子无关，导入时符号执行一遍即可；之后每个样本只需一次乘加取模。
+# ------------------------------------------------------------
+_MBIG = DotNetRandom.MBIG
+_MSEED = DotNetRandom.MSEED
+_INV_MBIG = 1.0 / _MBIG
+
+_AFFINE: list = []          # _AFFINE[n-1] = (A, B)，对应第 n 个样本
+_affine_window: list = []   # 最近 55 个 (A, B)，用于按需往后延伸
+_affine_lock = threading.Lock()
+
+
+def _affine_init() -> None:
+    """对 DotNetRandom.__init__ 做一次符号执行：状态值用 (a, b) 表示 a*mj + b"""
+    M = _MBIG
+
+    def sub(x, y):
+        return ((x[0] - y[0]) % M, (x[1] - y[1]) % M)
+
+    s = [(0, 0)] * 56
+    mj = (1, 0)
+    s[55] = mj
+    mk = (0, 1)
+    for i in range(1, 55):
+        ii = (21 * i) % 55
+        s[ii] = mk
+        mk = sub(mj, mk)
+        mj = s[ii]
+    for k in range(1, 5):
+        for i in range(1, 56):
+            s[i] = sub(s[i], s[1 + (i + 30) % 55])
+    _affine_window[:] = s[1:56]
+
+
+def _affine_extend(k: int) -> None:
+    """把系数表延伸到至少 k 个样本：y[n] = y[n-55] - y[n-34]"""
+    with _affine_lock:
+        M = _MBIG
+        w = _affine_window
+        while len(_AFFINE) < k:
+            n = len(_AFFINE)
+            a0, b0 = w[n % 55]
+            a1, b1 = w[(n + 21) % 55]
+            v = ((a0 - a1) % M, (b0 - b1) % M)
+            w[n % 55] = v
+            _AFFINE.append(v)
+
+
+_affine_init()
+_affine_extend(256)
+
+
+# 预计算样本表（由 utils.sample_table.install 设置）：(seed_start, seed_count, k, memoryview)
+# 命中范围内的种子直接读表，其余照常现算
+_table = None
+
+
+def _mj_of_seed(seed: int) -> int:
+    subtraction = 2147483647 if seed == -2147483648 else abs(seed)
+    mj = _MSEED - subtraction
+    if mj < 0:
+        mj += _MBIG
+    return mj
+
+
+def first_samples(seed: int, k: int) -> list:
+    """
+    等价于 r = DotNetRandom(seed); [r.InternalSample() for _ in range(k)]，但不分配 RNG 对象。
+    seed 为 get_random_seed 输出的 int32。
+    """
+    if k <= 0:
+        return []
+    tb = _table
+    if tb is not None and k <= tb[2] and 0 <= seed - tb[0] < tb[1]:
+        base = (seed - tb[0]) * tb[2]
+        return tb[3][base:base + k].tolist()
+    if k > len(_AFFINE):
+        _affine_extend(k)
+    x = _mj_of_seed(seed)
+    M = _MBIG
+    return [(a * x + b) % M for a, b in _AFFINE[:k]]
+
+
+def first_doubles(seed: int, k: int) -> list:
+    """等价于前 k 次 NextDouble()；Next(n) 即 int(d * n)"""
+    if k <= 0:
+        return []
+    inv = _INV_MBIG
+    tb = _table
+    if tb is not None and k <= tb[2] and 0 <= seed - tb[0] < tb[1]:
+        base = (seed - tb[0]) * tb[2]
+        return [v * inv for v in tb[3][base:base + k]]
+    if k > len(_AFFINE):
+        _affine_extend(k)
+    x = _mj_of_seed(seed)
+    M = _MBIG
+    return [((a * x + b) % M) * inv for a, b in _AFFINE[:k]]
+
+
+def first_double(seed: int) -> float:
+    """最常见的“播种后只取一次 NextDouble()”"""
+    tb = _table
+    if tb is not None and 0 <= seed - tb[0] < tb[1]:
+        return tb[3][(seed - tb[0]) * tb[2]] * _INV_MBIG
+    a, b = _AFFINE[0]
+    return ((a * _mj_of_seed(seed) + b) % _MBIG) * _INV_MBIG
+
+
+def nth_sample(seed: int, n: int) -> int:
+    """新播种 RNG 的第 n 个 InternalSample()（n 从 1 开始），等价于 skip(n-1) 后再取一次"""
+    if n < 1:
+        raise ValueError("n must be at least 1.")
+    tb = _table
+    if tb is not None and n <= tb[2] and 0 <= seed - tb[0] < tb[1]:
+        return tb[3][(seed - tb[0]) * tb[2] + n - 1]
+    if n > len(_AFFINE):
+        _affine_extend(n)
+    a, b = _AFFINE[n - 1]
+    return (a * _mj_of_seed(seed) + b) % _MBIG
+
+
+def nth_double(seed: int, n: int) -> float:
+    """新播种 RNG 的第 n 次 NextDouble()（n 从 1 开始）"""
+    return nth_sample(seed, n) * _INV_MBIG
+
+
+# ------------------------------------------------------------
+# 跳跃：输出序列满足 y[k+55] = y[k] - y[k+21] (mod MBIG)，特征多项式 P(x) = x^55 + x^21 - 1。
+# 若 x^n ≡ Σ c_j x^j (mod P)，则对任意 k 有 y[k+n] = Σ c_j y[k+j]，
+# 所以跳 n 步只需算出 x^n, x^(n+1), ..., x^(n+54) mod P，再与当前窗口做点积。
+# ------------------------------------------------------------
+_SKIP_JUMP_MIN = 1 << 11   # 低于此步数时直接递推更快
+_x_pow2_cache: list = []   # _x_pow2_cache[i] = x^(2^i) mod P
+
+
+def _poly_mulmod(a: list, b: list) -> list:
+    M = _MBIG
+    prod = [0] * 109
+    for i, ai in enumerate(a):
+        if ai:
+            prod[i:i + 55] = [p + ai * bj for p, bj in zip(prod[i:i + 55], b)]
+    # x^d = x^(d-55) * x^55 = x^(d-55) - x^(d-34)
+    for d in range(108, 54, -1):
+        c = prod[d]
+        if c:
+            prod[d - 55] += c
+            prod[d - 34] -= c
+    return [v % M for v in prod[:55]]
+
+
+def _poly_mul_x(c: list) -> list:
+    top = c[54]
+    out = [0] + c[:54]
+    out[0] = top % _MBIG
+    out[21] = (out[21] - top) % _MBIG
+    return out
+
+
+def _x_pow(n: int) -> list:
+    with _affine_lock:
+        if not _x_pow2_cache:
+            x = [0] * 55
+            x[1] = 1
+            _x_pow2_cache.append(x)
+        while (1 << (len(_x_pow2_cache) - 1)) < n:
+            last = _x_pow2_cache[-1]
+            _x_pow2_cache.append(_poly_mulmod(last, last))
+    result = None
+    bit = 0
+    while n:
+        if n & 1:
+            p = _x_pow2_cache[bit]
+            result = p if result is None else _poly_mulmod(result, p)
+        n >>= 1
+        bit += 1
+    return result
+
+
+def _jump_rows(n: int) -> list:
+    """x^(n+i) mod P 的系数，i = 0..54（即跳 n 步的 55x55 变换矩阵的各行）"""
+    row = _x_pow(n)
+    rows = [row]
+    for _ in range(54):
+        row = _poly_mul_x(row)
+        rows.append(row)
+    return rows
+
+
+def _jump_window(window: list, n: int) -> list:
+    """由旧到新的 55 个值 y[k..k+54] → y[k+n..k+n+54]"""
+    M = _MBIG
+    return [sum(map(_mul, row, window)) % M for row in _jump_rows(n)]
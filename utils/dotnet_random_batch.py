@@ -0,0 +1,178 @@
+# utils/dotnet_random_batch.py
+# 批量版 C# System.Random（legacy RNG）：一次播种 / 采样 N 个 RNG
+# 与 utils.dotnet_random.DotNetRandom 逐位一致，只是把每一步改成按列的 NumPy 运算。
+# 依赖 NumPy（可选依赖）；没有 NumPy 时导入本模块会抛 ImportError，调用方自行回退到标量实现。
+
+import numpy as np
+
+from .dotnet_random import DotNetRandom, _AFFINE, _SKIP_JUMP_MIN, _affine_extend, _jump_rows
+
+
+class DotNetRandomBatch:
+    """
+    N 个独立的 System.Random，状态存成 (N, 56) 的 int64 矩阵（列优先存储，按列运算是连续内存）。
+    所有 RNG 同步前进（inext / inextp 是共享的标量），每次调用返回长度 N 的数组。
+    """
+    MBIG = DotNetRandom.MBIG
+    MSEED = DotNetRandom.MSEED
+    MZ = DotNetRandom.MZ
+
+    def __init__(self, seeds):
+        seeds = np.asarray(seeds, dtype=np.int64).reshape(-1)
+        n = seeds.shape[0]
+        MBIG = self.MBIG
+
+        self.SeedArray = np.zeros((n, 56), dtype=np.int64, order="F")
+        self.inext = 0
+        self.inextp = 21
+        s = self.SeedArray
+
+        subtraction = np.where(seeds == -2147483648, 2147483647, seeds)
+        subtraction = np.abs(subtraction)
+
+        mj = self.MSEED - subtraction
+        np.add(mj, MBIG, out=mj, where=mj < 0)
+        s[:, 55] = mj
+
+        mk = np.ones(n, dtype=np.int64)
+        for i in range(1, 55):
+            ii = (21 * i) % 55
+            s[:, ii] = mk
+            mk = mj - mk
+            np.add(mk, MBIG, out=mk, where=mk < 0)
+            mj = s[:, ii]
+
+        for k in range(1, 5):
+            for i in range(1, 56):
+                col = s[:, i]
+                np.subtract(col, s[:, 1 + (i + 30) % 55], out=col)
+                np.add(col, MBIG, out=col, where=col < 0)
+
+    def __len__(self) -> int:
+        return self.SeedArray.shape[0]
+
+    def InternalSample(self) -> np.ndarray:
+        self.inext += 1
+        if self.inext >= 56:
+            self.inext = 1
+        self.inextp += 1
+        if self.inextp >= 56:
+            self.inextp = 1
+
+        s = self.SeedArray
+        # 状态值恒在 [0, MBIG) 内，差值不可能等于 MBIG，所以省掉标量版的 retVal == MBIG 分支
+        retVal = s[:, self.inext] - s[:, self.inextp]
+        np.add(retVal, self.MBIG, out=retVal, where=retVal < 0)
+
+        s[:, self.inext] = retVal
+        return retVal
+
+    def Sample(self) -> np.ndarray:
+        return self.InternalSample() * (1.0 / self.MBIG)
+
+    def GetSampleForLargeRange(self) -> np.ndarray:
+        result = self.InternalSample()
+        negate = (self.InternalSample() % 2) == 0
+        result = np.where(negate, -result, result)
+        d = result.astype(np.float64)
+        d += self.MBIG - 1
+        return d / (2.0 * self.MBIG - 1)
+
+    def Next(self, minValue=None, maxValue=None) -> np.ndarray:
+        """
+        与标量版同语义；minValue / maxValue 可以是标量，也可以是长度 N 的数组（每个 RNG 各自的上界）。
+        """
+        if minValue is None:
+            return self.InternalSample()
+        if maxValue is None:
+            maxv = np.asarray(minValue, dtype=np.int64)
+            if np.any(maxv < 0):
+                raise ValueError("minValue must be non-negative.")
+            return (self.Sample() * maxv).astype(np.int64)
+        minv = np.asarray(minValue, dtype=np.int64)
+        maxv = np.asarray(maxValue, dtype=np.int64)
+        if np.any(minv > maxv):
+            raise ValueError("minValue must be less than maxValue.")
+        range_ = maxv - minv
+        if np.all(range_ <= self.MBIG):
+            return (self.Sample() * range_).astype(np.int64) + minv
+        # 混合范围时与标量版一样：每个 RNG 只消耗自己那条分支需要的样本数，这里无法同步前进
+        if np.any(range_ <= self.MBIG):
+            raise ValueError("mixed small/large ranges are not supported in a batch.")
+        return (self.GetSampleForLargeRange() * range_).astype(np.int64) + minv
+
+    def NextDouble(self) -> np.ndarray:
+        return self.Sample()
+
+    def skip(self, n) -> None:
+        """
+        等价于每个 RNG 各自连续调用 n 次 InternalSample()；n 可以是标量，也可以是长度 N 的数组（每行步数不同）。
+        步数较大或各行不同时，用 55x55 跳跃矩阵一次变换窗口，不逐步生成。
+        """
+        steps = np.asarray(n, dtype=np.int64)
+        if steps.ndim == 0 or np.all(steps == steps.reshape(-1)[0]):
+            u = int(steps.reshape(-1)[0]) if steps.ndim else int(steps)
+            if u <= 0:
+                return
+            if u < _SKIP_JUMP_MIN:
+                for _ in range(u):
+                    self.InternalSample()
+                return
+            self._jump_rows_of(slice(None), u)
+            return
+        for u in np.unique(steps):
+            if u > 0:
+                self._jump_rows_of(np.nonzero(steps == u)[0], int(u))
+
+    def _jump_rows_of(self, rows, n: int) -> None:
+        # 窗口：按“由旧到新”排列的 55 个状态槽；写回同样的槽位，共享的 inext / inextp 不变
+        slots = [((self.inext + k) % 55) + 1 for k in range(55)]
+        s = self.SeedArray
+        if isinstance(rows, slice):
+            window = s[:, slots]
+        else:
+            window = s[np.ix_(rows, slots)]
+        J = np.array(_jump_rows(n), dtype=np.int64)
+        # 系数与状态都 < 2^31，直接相乘会溢出 int64 的 55 项和；把系数拆成高低 16 位分两次乘
+        lo = window @ (J & 0xFFFF).T
+        hi = window @ (J >> 16).T
+        out = ((hi % self.MBIG) * 65536 + lo) % self.MBIG
+        if isinstance(rows, slice):
+            s[:, slots] = out
+        else:
+            s[np.ix_(rows, slots)] = out
+
+    def NextBytes(self, length: int) -> np.ndarray:
+        """返回 (N, length) 的 uint8 矩阵（标量版是原地填 buffer）"""
+        out = np.empty((len(self), int(length)), dtype=np.uint8)
+        for i in range(int(length)):
+            out[:, i] = self.InternalSample() % 256
+        return out
+
+
+def nth_samples(seeds, n) -> np.ndarray:
+    """
+    每个新播种 RNG 的第 n 个 InternalSample()（n 从 1 开始，可为标量或每行一个），
+    等价于 DotNetRandomBatch(seeds).skip(n-1) 后取一次，但直接用仿射系数表，O(1)/行。
+    """
+    seeds = np.asarray(seeds, dtype=np.int64).reshape(-1)
+    n = np.asarray(n, dtype=np.int64)
+    if n.size and int(n.min()) < 1:
+        raise ValueError("n must be at least 1.")
+    top = int(n.max()) if n.size else 0
+    if top > len(_AFFINE):
+        _affine_extend(top)
+    coef = np.array(_AFFINE[:max(top, 1)], dtype=np.int64)
+    a = coef[n - 1, 0]
+    b = coef[n - 1, 1]
+    MBIG = DotNetRandom.MBIG
+    subtraction = np.abs(np.where(seeds == -2147483648, 2147483647, seeds))
+    mj = DotNetRandom.MSEED - subtraction
+    np.add(mj, MBIG, out=mj, where=mj < 0)
+    # a, mj < 2^31，乘积 < 2^62，不会溢出 int64
+    return (a * mj + b) % MBIG
+
+
+def nth_doubles(seeds, n) -> np.ndarray:
+    """每个新播种 RNG 的第 n 次 NextDouble()"""
+    return nth_samples(seeds, n) * (1.0 / DotNetRandom.MBIG)
@@ -1,8 +1,8 @@
 # utils/rng_wrappers.py
-# 1.6 的 RNG 封装（legacy 路径），严格对齐 mouseypounds 的 JS 语义
+# 1.6 的 RNG 封装（legacy 与 1.6 新随机的 hash 播种），严格对齐 mouseypounds 的 JS 语义
 
 import math
-from .dotnet_random import DotNetRandom
+from functools import lru_cache
 
 MBIG = 2147483647  # 2^31 - 1
 
@@ -16,6 +16,8 @@ def get_random_seed(a, b = 0, c = 0, d = 0, e = 0, *, use_legacy: bool = True) -
     legacy: Math.floor((a % M + b % M + c % M + d % M + e % M) % M)
     注意：JS 用 Math.floor（向下取整），不能用 Python 的 int()（向零截断）。
     返回值标准化为 int32（可能为负）。
+    非 legacy（1.6 新随机）：getHashFromArray(a % M, b % M, c % M, d % M, e % M)，
+    即把 5 个值按 Int32Array（向零截断）排成 20 字节后做 xxHash32。
     """
     if use_legacy:
         total = js_mod(a, MBIG) + js_mod(b, MBIG) + js_mod(c, MBIG) + js_mod(d, MBIG) + js_mod(e, MBIG)
@@ -28,23 +30,71 @@ def get_random_seed(a, b = 0, c = 0, d = 0, e = 0, *, use_legacy: bool = True) -
             total -= 2**32
         return total
     else:
-        raise NotImplementedError("use_legacy=False 留待后续实现（NetRandom / getHashFromArray）")
+        return get_hash_from_array(
+            math.trunc(js_mod(a, MBIG)), math.trunc(js_mod(b, MBIG)), math.trunc(js_mod(c, MBIG)),
+            math.trunc(js_mod(d, MBIG)), math.trunc(js_mod(e, MBIG)),
+        )
+
+# ---------------- xxHash32 (seed=0) ----------------
+PRIME32_1 = 0x9E3779B1
+PRIME32_2 = 0x85EBCA77
+PRIME32_3 = 0xC2B2AE3D
+PRIME32_4 = 0x27D4EB2F
+PRIME32_5 = 0x165667B1
+
+def _rotl32(x, r):
+    return ((x << r) & 0xFFFFFFFF) | (x >> (32 - r))
+
+def _to_signed32(h32: int) -> int:
+    if h32 >= 2**31:
+        h32 -= 2**32
+    return h32
+
+def get_hash_from_array(*values: int) -> int:
+    """
+    JS: XXH.h32().update(new Int32Array(values).buffer)，即按小端 int32 排列后做 xxHash32。
+    这里直接按 32 位字处理，不经过 bytes。返回有符号 int32。
+    """
+    words = [v & 0xFFFFFFFF for v in values]
+    length = 4 * len(words)
+    idx = 0
+
+    if length >= 16:
+        v1 = (PRIME32_1 + PRIME32_2) & 0xFFFFFFFF
+        v2 = PRIME32_2
+        v3 = 0
+        v4 = (-PRIME32_1) & 0xFFFFFFFF
+        while idx + 4 <= len(words):
+            v1 = (_rotl32((v1 + words[idx] * PRIME32_2) & 0xFFFFFFFF, 13) * PRIME32_1) & 0xFFFFFFFF
+            v2 = (_rotl32((v2 + words[idx + 1] * PRIME32_2) & 0xFFFFFFFF, 13) * PRIME32_1) & 0xFFFFFFFF
+            v3 = (_rotl32((v3 + words[idx + 2] * PRIME32_2) & 0xFFFFFFFF, 13) * PRIME32_1) & 0xFFFFFFFF
+            v4 = (_rotl32((v4 + words[idx + 3] * PRIME32_2) & 0xFFFFFFFF, 13) * PRIME32_1) & 0xFFFFFFFF
+            idx += 4
+        h32 = (_rotl32(v1, 1) + _rotl32(v2, 7) + _rotl32(v3, 12) + _rotl32(v4, 18)) & 0xFFFFFFFF
+    else:
+        h32 = PRIME32_5
+
+    h32 = (h32 + length) & 0xFFFFFFFF
+    for k1 in words[idx:]:
+        h32 = (_rotl32((h32 + k1 * PRIME32_3) & 0xFFFFFFFF, 17) * PRIME32_4) & 0xFFFFFFFF
 
+    h32 ^= (h32 >> 15)
+    h32 = (h32 * PRIME32_2) & 0xFFFFFFFF
+    h32 ^= (h32 >> 13)
+    h32 = (h32 * PRIME32_3) & 0xFFFFFFFF
+    h32 ^= (h32 >> 16)
+    return _to_signed32(h32)
+
+@lru_cache(maxsize=None)
 def get_hash_from_string(s: str) -> int:
     """
     xxHash32 (h32, seed=0) over UTF-8 bytes.
     Returns signed 32-bit int (may be negative), matching JS XXH.h32().toNumber().
+    结果按字符串记忆化：调用方用到的常量哈希只会真正计算一次。
     """
     data = s.encode("utf-8")
 
-    PRIME32_1 = 0x9E3779B1
-    PRIME32_2 = 0x85EBCA77
-    PRIME32_3 = 0xC2B2AE3D
-    PRIME32_4 = 0x27D4EB2F
-    PRIME32_5 = 0x165667B1
-
-    def rotl32(x, r):
-        return ((x << r) & 0xFFFFFFFF) | (x >> (32 - r))
+    rotl32 = _rotl32
 
     length = len(data)
     idx = 0
@@ -105,7 +155,4 @@ def get_hash_from_string(s: str) -> int:
     h32 = (h32 * PRIME32_3) & 0xFFFFFFFF
     h32 ^= (h32 >> 16)
 
-    # convert to signed 32-bit
-    if h32 >= 2**31:
-        h32 -= 2**32
-    return h32
+    return _to_signed32(h32)
@@ -0,0 +1,135 @@
+# utils/rng_wrappers_batch.py
+# get_random_seed 的数组版：一次把一批 gameID（NumPy 数组 / range）换算成 int32 RNG 种子。
+# 与 utils.rng_wrappers.get_random_seed 逐个结果完全一致（含负数 gameID、gameID / 2 这类半整数）。
+# 依赖 NumPy（可选依赖），与 utils.dotnet_random_batch 相同。
+
+import numpy as np
+
+from .rng_wrappers import MBIG, PRIME32_1, PRIME32_2, PRIME32_3, PRIME32_4, PRIME32_5
+
+# 所有整数 / 半整数输入的量级都远小于 2^53：此时 JS 的 a % m 与 C 的 fmod 完全相同，
+# 标量版 a - int(a / m) * m 里的 int(a / m) 也不会因舍入而偏一，可以直接用 fmod
+_EXACT_LIMIT = float(1 << 52)
+
+
+def _as_array(x):
+    if isinstance(x, range):
+        return np.arange(x.start, x.stop, x.step, dtype=np.int64)
+    return np.asarray(x)
+
+
+def _doubled(x):
+    """整数或半整数 → 2*x 的 int64；否则返回 None"""
+    if x.dtype.kind in "iub":
+        return x.astype(np.int64) * 2
+    if x.dtype.kind != "f":
+        return None
+    h = x.astype(np.float64) * 2.0
+    if h.size and (np.abs(h).max() >= _EXACT_LIMIT or not np.array_equal(h, np.trunc(h))):
+        return None
+    return h.astype(np.int64)
+
+
+def _js_mod_float(a, m):
+    # 逐步模仿标量版：q = int(a / m)（向零截断），a - q * m
+    return a - np.trunc(a / m) * m
+
+
+def get_random_seed_array(a, b=0, c=0, d=0, e=0, *, use_legacy: bool = True) -> np.ndarray:
+    """
+    数组版 legacy getRandomSeed：任意参数都可以是标量、NumPy 数组或 range（按 NumPy 规则广播）。
+    返回 int32 数组。
+      - 全是整数：int64 上直接 fmod；
+      - 含 gameID / 2 这类半整数：整体乘 2 后在 int64 上对 2*MBIG 取 fmod，最后向下取整除以 2；
+      - 其他浮点：按标量版的步骤在 float64 上逐步计算。
+    use_legacy=False 时对应 1.6 的 getHashFromArray 种子，走下面的批量 xxHash32。
+    """
+    args = [_as_array(x) for x in (a, b, c, d, e)]
+
+    if not use_legacy:
+        # getHashFromArray(a % M, ..., e % M)：每项向零截断成 int32 后整体做 xxHash32
+        cols = []
+        for x in args:
+            if x.dtype.kind in "iub":
+                cols.append(np.fmod(x.astype(np.int64), MBIG))
+            else:
+                cols.append(np.trunc(_js_mod_float(x.astype(np.float64), MBIG)).astype(np.int64))
+        cols = np.broadcast_arrays(*cols)
+        return hash_from_array_batch(np.stack(cols, axis=-1))
+
+    if all(x.dtype.kind in "iub" for x in args):
+        total = np.fmod(args[0].astype(np.int64), MBIG)
+        for x in args[1:]:
+            total = total + np.fmod(x.astype(np.int64), MBIG)
+        total = np.fmod(total, MBIG)
+        # |total| < MBIG，int32 规范化是恒等变换
+        return total.astype(np.int32)
+
+    doubled = [_doubled(x) for x in args]
+    if all(h is not None for h in doubled):
+        M2 = 2 * MBIG
+        total = np.fmod(doubled[0], M2)
+        for h in doubled[1:]:
+            total = total + np.fmod(h, M2)
+        total = np.fmod(total, M2)
+        return np.floor_divide(total, 2).astype(np.int32)
+
+    fargs = [x.astype(np.float64) for x in args]
+    total = _js_mod_float(fargs[0], MBIG)
+    for x in fargs[1:]:
+        total = total + _js_mod_float(x, MBIG)
+    total = _js_mod_float(total, MBIG)
+    total = np.floor(total).astype(np.int64)
+    total &= 0xFFFFFFFF
+    total = np.where(total >= 2**31, total - 2**32, total)
+    return total.astype(np.int32)
+
+
+# ---------------- 批量 xxHash32 (seed=0) ----------------
+_P1 = np.uint32(PRIME32_1)
+_P2 = np.uint32(PRIME32_2)
+_P3 = np.uint32(PRIME32_3)
+_P4 = np.uint32(PRIME32_4)
+_P5 = np.uint32(PRIME32_5)
+
+
+def _rotl(x, r: int):
+    return (x << np.uint32(r)) | (x >> np.uint32(32 - r))
+
+
+def hash_from_array_batch(values) -> np.ndarray:
+    """
+    getHashFromArray 的批量版：values 形状 (..., L)，最后一维是一行 int32 值（小端 Int32Array），
+    对每一行做 xxHash32，返回形状 (...) 的 int32。uint32 乘加自然按 2^32 回绕。
+    """
+    words = np.asarray(values).astype(np.int64).astype(np.uint32)
+    n_words = words.shape[-1]
+    length = np.uint32(4 * n_words)
+    with np.errstate(over="ignore"):
+        idx = 0
+        if n_words >= 4:
+            shape = words.shape[:-1]
+            v1 = np.full(shape, (PRIME32_1 + PRIME32_2) & 0xFFFFFFFF, dtype=np.uint32)
+            v2 = np.full(shape, PRIME32_2, dtype=np.uint32)
+            v3 = np.zeros(shape, dtype=np.uint32)
+            v4 = np.full(shape, (-PRIME32_1) & 0xFFFFFFFF, dtype=np.uint32)
+            while idx + 4 <= n_words:
+                v1 = _rotl(v1 + words[..., idx] * _P2, 13) * _P1
+                v2 = _rotl(v2 + words[..., idx + 1] * _P2, 13) * _P1
+                v3 = _rotl(v3 + words[..., idx + 2] * _P2, 13) * _P1
+                v4 = _rotl(v4 + words[..., idx + 3] * _P2, 13) * _P1
+                idx += 4
+            h32 = _rotl(v1, 1) + _rotl(v2, 7) + _rotl(v3, 12) + _rotl(v4, 18)
+        else:
+            h32 = np.full(words.shape[:-1], PRIME32_5, dtype=np.uint32)
+
+        h32 = h32 + length
+        for i in range(idx, n_words):
+            h32 = _rotl(h32 + words[..., i] * _P3, 17) * _P4
+
+        h32 = h32 ^ (h32 >> np.uint32(15))
+        h32 = h32 * _P2
+        h32 = h32 ^ (h32 >> np.uint32(13))
+        h32 = h32 * _P3
+        h32 = h32 ^ (h32 >> np.uint32(16))
+    return h32.view(np.int32)
@@ -0,0 +1,86 @@
+# utils/sample_cache.py
+# 按 int32 RNG 种子缓存“已抽出的 NextDouble() 前缀”，每个进程一份，所有预测器共享。
+# 不同 (day, gameID, ...) 组合经常归约到同一个 int32 种子（例如相邻 gameID 2k / 2k+1 的 gameID/2 相同），
+# 同一扫描块里的夜间事件 / 沙漠节等多样本预测就能直接复用已算过的前缀。
+# 注意：只取一次 NextDouble() 的预测（宝箱 / 矿井 / 天气）直接用 first_double，
+# 仿射公式算一个样本比查一次缓存还便宜，走缓存反而更慢。
+
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from .dotnet_random import first_doubles
+
+DEFAULT_MAXSIZE = 1 << 16
+
+
+class SampleCache:
+    """
+    有界 LRU：key = int32 RNG 种子，value = 该种子前若干次 NextDouble() 的列表（只增不改）。
+    maxsize <= 0 表示关闭缓存（直接现算）。返回的列表为共享对象，调用方只读。
+    不加锁：OrderedDict 的单个操作在 GIL 下是原子的，并发淘汰导致的 KeyError 直接忽略。
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE):
+        self.maxsize = int(maxsize)
+        self._data: "OrderedDict[int, List[float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def doubles(self, seed: int, k: int) -> List[float]:
+        """种子 seed 的前 k 次 NextDouble()（可能返回更长的前缀）；已缓存的不够长时整体补算到 k"""
+        if self.maxsize <= 0:
+            return first_doubles(seed, k)
+        data = self._data
+        prefix = data.get(seed)
+        if prefix is not None and len(prefix) >= k:
+            self.hits += 1
+            try:
+                data.move_to_end(seed)
+            except KeyError:  # 另一线程刚好把它淘汰了
+                pass
+            return prefix
+        self.misses += 1
+        prefix = first_doubles(seed, k)
+        data[seed] = prefix
+        if len(data) > self.maxsize:
+            try:
+                data.popitem(last=False)
+            except KeyError:
+                pass
+        return prefix
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+# —— 进程级共享实例（多进程时每个 worker 进程各一份）——
+_shared = SampleCache()
+
+
+def cached_doubles(seed: int, k: int) -> List[float]:
+    return _shared.doubles(seed, k)
+
+
+def configure(maxsize: int = DEFAULT_MAXSIZE, table_path: Optional[str] = None) -> None:
+    """
+    重设缓存容量并清空；table_path 非空时同时映射预计算样本表（见 utils.sample_table）。
+    可直接作为进程池的 initializer。
+    """
+    global _shared
+    _shared = SampleCache(maxsize)
+    if table_path:
+        from . import sample_table
+        sample_table.install(table_path)
+
+
+def clear() -> None:
+    _shared.clear()
+
+
+def stats() -> Dict[str, int]:
+    return _shared.stats()
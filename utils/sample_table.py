@@ -0,0 +1,178 @@
+# utils/sample_table.py
+# 预计算表：对一段 int32 RNG 种子，把 DotNetRandom(seed) 的前 K 个 InternalSample() 写成扁平二进制文件，
+# 扫描时用 mmap 映射、按偏移直接读（不拷贝整表）。
+#
+# 文件格式（小端）：
+#   头 32 字节：magic(8s) = b"SDVRNG01", seed_start(q), seed_count(q), k(i), reserved(i)
+#   数据：seed_count 行 × k 列 int32，第 r 行对应种子 seed_start + r
+#
+# 生成（每台机器一次）：
+#   python -m utils.sample_table build --out rng_samples.bin --start -1000000 --count 200000000 --k 16
+# 然后在 config.py 里设置 RNG_SAMPLE_TABLE_PATH = "rng_samples.bin"
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Optional
+
+from . import dotnet_random
+from .dotnet_random import first_samples
+
+MAGIC = b"SDVRNG01"
+HEADER = struct.Struct("<8sqqii")
+INT32_MIN = -2147483648
+INT32_MAX = 2147483647
+
+
+class SampleTable:
+    """只读映射一个样本表文件；samples() 返回零拷贝的 memoryview 切片，不在表内返回 None"""
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise RuntimeError("样本表按小端存储，当前平台不支持直接映射")
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, start, count, k, _reserved = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} 不是样本表文件（magic={magic!r}）")
+        expected = HEADER.size + count * k * 4
+        if len(self._mm) < expected:
+            self.close()
+            raise ValueError(f"{path} 文件不完整：需要 {expected} 字节，实际 {len(self._mm)}")
+        self.seed_start = start
+        self.seed_count = count
+        self.k = k
+        self._mv = memoryview(self._mm)[HEADER.size:expected].cast("i")
+
+    def covers(self, seed: int, k: int = 1) -> bool:
+        return k <= self.k and 0 <= seed - self.seed_start < self.seed_count
+
+    def samples(self, seed: int, k: int) -> Optional[memoryview]:
+        off = seed - self.seed_start
+        if k > self.k or not (0 <= off < self.seed_count):
+            return None
+        base = off * self.k
+        return self._mv[base:base + k]
+
+    def close(self) -> None:
+        mv = getattr(self, "_mv", None)
+        if mv is not None:
+            mv.release()
+            self._mv = None
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+            self._file = None
+
+
+_installed: Optional[SampleTable] = None
+
+
+def install(path: Optional[str]) -> Optional[SampleTable]:
+    """
+    让 utils.dotnet_random 的 first_samples / first_doubles / first_double 先查表再现算。
+    path 为空则卸载；文件不存在时只打印提示，继续走现算。
+    """
+    global _installed
+    uninstall()
+    if not path:
+        return None
+    if not os.path.exists(path):
+        print(f"[WARNING] 样本表 {path} 不存在，回退到现算")
+        return None
+    table = SampleTable(path)
+    _installed = table
+    dotnet_random._table = (table.seed_start, table.seed_count, table.k, table._mv)
+    return table
+
+
+def uninstall() -> None:
+    global _installed
+    dotnet_random._table = None
+    if _installed is not None:
+        _installed.close()
+        _installed = None
+
+
+# —— 生成 ——
+
+def _rows_numpy(start: int, count: int, k: int):
+    import numpy as np
+    from .dotnet_random_batch import nth_samples
+
+    seeds = np.arange(start, start + count, dtype=np.int64)
+    out = np.empty((count, k), dtype="<i4")
+    for n in range(1, k + 1):
+        out[:, n - 1] = nth_samples(seeds, n)
+    return out.tobytes()
+
+
+def _rows_python(start: int, count: int, k: int) -> bytes:
+    buf = array("i")
+    for seed in range(start, start + count):
+        buf.extend(first_samples(seed, k))
+    if sys.byteorder != "little":
+        buf.byteswap()
+    return buf.tobytes()
+
+
+def build(path: str, start: int, count: int, k: int, block: int = 1 << 20, verbose: bool = True) -> None:
+    """把 [start, start+count) 每个种子的前 k 个样本写到 path（先写临时文件，完成后原子替换）"""
+    if k < 1:
+        raise ValueError("k 必须 >= 1")
+    if count < 1 or start < INT32_MIN or start + count - 1 > INT32_MAX:
+        raise ValueError("种子范围必须落在 int32 内")
+    try:
+        import numpy  # noqa: F401
+        rows = _rows_numpy
+    except ImportError:
+        rows = _rows_python
+        block = min(block, 1 << 16)
+
+    tmp = path + ".tmp"
+    t0 = time.time()
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, start, count, k, 0))
+        done = 0
+        while done < count:
+            n = min(block, count - done)
+            f.write(rows(start + done, n, k))
+            done += n
+            if verbose:
+                print(f"\r已写入 {done}/{count} 个种子（{time.time() - t0:.1f}s）", end="", flush=True)
+    os.replace(tmp, path)
+    if verbose:
+        size_mb = (HEADER.size + count * k * 4) / (1 << 20)
+        print(f"\n完成：{path}，{size_mb:.1f} MB")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="DotNetRandom 前 K 个样本预计算表")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="生成样本表")
+    b.add_argument("--out", default="rng_samples.bin")
+    b.add_argument("--start", type=int, default=-(1 << 24), help="起始 int32 种子（含）")
+    b.add_argument("--count", type=int, default=1 << 25, help="种子个数")
+    b.add_argument("--k", type=int, default=16, help="每个种子保存的样本数")
+    i = sub.add_parser("info", help="查看样本表头")
+    i.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        build(args.out, args.start, args.count, args.k)
+    else:
+        t = SampleTable(args.path)
+        print(f"{t.path}: seeds [{t.seed_start}, {t.seed_start + t.seed_count}), k={t.k}")
+        t.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,298 @@
 # utils/scan_engine.py
+import os
+import queue
+import time
+from array import array
+from dataclasses import dataclass, field
+from itertools import islice
 from multiprocessing import Pool, cpu_count
-from typing import Callable, Iterable, Any, List
+from typing import Callable, Dict, Iterable, Iterator, Any, List, Optional, Tuple
 
 
-def run_scan(
+class _Done:
+    """_stream 的任务参数占位：这一块不用派发，结果已知（例如从断点续扫日志里读出的块）"""
+    __slots__ = ("result",)
+
+    def __init__(self, result: Any):
+        self.result = result
+
+
+# 传了 alive 时等结果的轮询间隔（秒）：每隔这么久确认一次进程池还在
+_ALIVE_POLL = 0.5
+
+
+def _wait(done: "queue.SimpleQueue", alive: Callable[[], bool] | None):
+    if alive is None:
+        return done.get()
+    while True:
+        try:
+            return done.get(timeout=_ALIVE_POLL)
+        except queue.Empty:
+            if not alive():
+                # 池被 terminate 后挂着的 apply_async 回调永远不会来，不能一直等下去
+                raise RuntimeError("进程池已关闭或被替换，未完成的块不会再返回")
+
+
+def _stream(
+    pool,
+    tasks: Iterator[Tuple[Any, Any]],
+    fn: Callable[..., Any],
+    ordered: bool,
+    max_pending: int,
+    on_done: Callable[[Any, Any], None] | None = None,
+    alive: Callable[[], bool] | None = None,
+) -> Iterator[Tuple[Any, Any]]:
+    """
+    tasks 逐个产出 (meta, args)，子进程里算 fn(*args)，按块产出 (meta, 结果)。
+    同时在途（含重排缓冲里已算完未产出）的块不超过 max_pending；ordered=False 时先算完先产出。
+    tasks 是惰性的：每空出一个名额才取下一块，on_done(meta, 结果) 在每块算完时（进重排缓冲之前）调用，
+    可以据此决定后面的块怎么切。args 为 _Done 时不派发，直接当作已算完（结果为 _Done.result）。
+    alive()：等结果时定期调用，返回 False（池已关闭 / 被替换）时抛 RuntimeError。
+    """
+    done: "queue.SimpleQueue[Tuple[int, Any, Optional[BaseException]]]" = queue.SimpleQueue()
+    metas = {}    # 块号 -> meta
+    buffer = {}   # 重排缓冲：块号 -> 结果
+    submitted = emitted = 0
+    while True:
+        while submitted - emitted < max_pending:
+            task = next(tasks, None)
+            if task is None:
+                break
+            metas[submitted], args = task
+            if isinstance(args, _Done):
+                done.put((submitted, args.result, None))
+                submitted += 1
+                continue
+            pool.apply_async(
+                fn, args,
+                callback=lambda res, cid=submitted: done.put((cid, res, None)),
+                error_callback=lambda exc, cid=submitted: done.put((cid, None, exc)),
+            )
+            submitted += 1
+        if emitted == submitted:
+            return
+        cid, res, exc = _wait(done, alive)
+        if exc is not None:
+            raise exc
+        if on_done is not None:
+            on_done(metas[cid], res)
+        if not ordered:
+            emitted += 1
+            yield metas.pop(cid), res
+            continue
+        buffer[cid] = res
+        while emitted in buffer:
+            out = (metas.pop(emitted), buffer.pop(emitted))
+            emitted += 1
+            yield out
+
+
+# ---------------- 区间块协议 ----------------
+# 任务只传整数：连续区间发 (start, stop)，稀疏的候选列表发打包好的 int32 缓冲（bytes）；
+# 查询参数在进程池 initializer 里装一次。子进程只回传命中：打包的 int32 gameID 缓冲，
+# 或（需要明细时）命中结果列表。便宜的判定（如夜间事件）几乎不再有序列化开销。
+
+def pack_ids(ids: Iterable[int]) -> bytes:
+    """gameID 序列 → int32 缓冲；超出 int32 的整段改用 int64，首字节标明类型码"""
+    ids = list(ids)
+    try:
+        return b"i" + array("i", ids).tobytes()
+    except OverflowError:
+        return b"q" + array("q", ids).tobytes()
+
+
+def unpack_ids(buf: bytes) -> array:
+    out = array(chr(buf[0]))
+    out.frombytes(buf[1:])
+    return out
+
+
+def block_seeds(task) -> Iterable[int]:
+    """子进程侧：把任务还原成 gameID 序列（(start, stop) → range，打包缓冲 → array）"""
+    if isinstance(task, tuple):
+        return range(task[0], task[1])
+    return unpack_ids(task)
+
+
+def _timed_block(block_worker: Callable[[Any], Any], task) -> Tuple[int, float, Any]:
+    """子进程里跑一块并计时：(pid, 耗时秒数, 结果)"""
+    t0 = time.perf_counter()
+    out = block_worker(task)
+    return os.getpid(), time.perf_counter() - t0, out
+
+
+@dataclass
+class ScanStats:
+    """一次区间块扫描的统计：各子进程的块数 / gameID 数 / 忙碌时间，总墙钟时间，块大小范围"""
+    wall: float = 0.0
+    workers: Dict[int, List[float]] = field(default_factory=dict)  # pid -> [块数, gameID 数, 忙碌秒数]
+    min_block: int = 0
+    max_block: int = 0
+
+    def record(self, pid: int, n: int, seconds: float) -> None:
+        row = self.workers.setdefault(pid, [0, 0, 0.0])
+        row[0] += 1
+        row[1] += n
+        row[2] += seconds
+        self.min_block = n if not self.min_block else min(self.min_block, n)
+        self.max_block = max(self.max_block, n)
+
+    def utilization(self) -> Dict[int, float]:
+        """各子进程忙碌时间 / 扫描墙钟时间（换新的子进程各算各的）"""
+        return {pid: (row[2] / self.wall if self.wall > 0 else 0.0) for pid, row in self.workers.items()}
+
+    def as_dict(self) -> Dict:
+        util = self.utilization()
+        return {
+            "wall": round(self.wall, 4),
+            "block_range": [self.min_block, self.max_block],
+            "workers": [{"pid": pid, "blocks": int(row[0]), "seeds": int(row[1]), "busy": round(row[2], 4),
+                         "utilization": round(util[pid], 4)} for pid, row in sorted(self.workers.items())],
+        }
+
+    def describe(self) -> str:
+        util = self.utilization()
+        parts = [f"进程 {pid}：{int(row[0])} 块 / {int(row[1])} 个，利用率 {util[pid]:.0%}"
+                 for pid, row in sorted(self.workers.items())]
+        return f"块大小 {self.min_block}~{self.max_block}；" + "；".join(parts)
+
+
+class _BlockSizer:
+    """
+    块大小：有 target_seconds 时按已完成块的吞吐（gameID/秒，指数滑动平均）取 吞吐 * target_seconds；
+    剩余量已知时尾部按 剩余 / (2 * 进程数) 递减（guided 调度），最后几块小，空闲进程能分走剩下的活。
+    """
+
+    def __init__(self, first: int, target_seconds: Optional[float], min_block: int, max_block: int, procs: int):
+        self.size = max(1, first)
+        self.target = target_seconds
+        self.min_block = max(1, min_block)
+        self.max_block = max(self.min_block, max_block)
+        self.procs = procs
+        self.rate: Optional[float] = None
+
+    def observe(self, n: int, seconds: float) -> None:
+        if self.target is None or n <= 0:
+            return
+        r = n / max(seconds, 1e-6)
+        self.rate = r if self.rate is None else 0.7 * self.rate + 0.3 * r
+        self.size = int(min(self.max_block, max(self.min_block, self.rate * self.target)))
+
+    def next(self, remaining: Optional[int]) -> int:
+        if self.target is None or remaining is None:
+            return self.size
+        return max(1, min(self.size, max(self.min_block, -(-remaining // (2 * self.procs)))))
+
+
+def iter_scan_blocks(
     seeds: Iterable[int],
-    worker: Callable[[int], Any],
+    block_worker: Callable[[Any], Any],
     processes: int | None = None,
-    chunksize: int = 1000,
-) -> List[Any]:
+    block: int = 4096,
+    initializer: Callable[..., Any] | None = None,
+    initargs: Tuple = (),
+    ordered: bool = True,
+    max_pending: int | None = None,
+    pool=None,
+    target_seconds: Optional[float] = None,
+    min_block: int = 64,
+    max_block: int = 1 << 20,
+    stats: Optional[ScanStats] = None,
+    journal=None,
+    replay: Callable[[int], Any] | None = None,
+    hit_id: Callable[[Any], int] | None = None,
+    alive: Callable[[], bool] | None = None,
+) -> Iterator[Any]:
     """
-    并行扫描通用引擎：
-    - seeds: 可迭代的种子序列
-    - worker(seed) -> Any: 对单个 seed 的计算逻辑（由功能模块提供）
-    - processes: 进程数（默认用 cpu_count()）
-    - chunksize: 每批分发给子进程的任务量（按你的任务耗时可调大一点更快）
-    返回：按 seeds 顺序对应的结果列表
+    按区间块扫描：seeds 为步长 1 的 range 时每块只发 (start, stop)，否则每块打包成 int32 缓冲。
+    block_worker(task) 在子进程里用 block_seeds(task) 取回本块的 gameID，返回 pack_ids 打包的命中
+    （这里解包后逐个 yield gameID），或命中结果的列表（原样逐个 yield）。
+    同时在途的块不超过 max_pending（默认 进程数 * 4），内存只与在途块数有关，与区间长度无关；
+    ordered=True 时先算完的块进重排缓冲，按 seeds 顺序产出，False 时哪块先算完先产出。
+    调用方中途停止迭代时，自建的进程池随之终止。
+    pool：已有的（常驻）进程池，用完不关闭；此时 initializer / initargs 不起作用（processes 只用来定在途块数），
+    查询参数需随 block_worker 一起发送（见 services.worker_pool）；alive() 返回 False 表示池已被关闭 / 替换，
+    还没回来的块不会再回来，此时抛 RuntimeError 而不是一直等。
+    target_seconds：None 时每块固定 block 个；否则 block 只是第一批的大小，之后按实测吞吐把每块调到约
+    target_seconds 秒（限制在 [min_block, max_block]），尾部逐块变小（见 _BlockSizer）。
+    stats：传入 ScanStats 时记下每块的子进程 / 大小 / 耗时，扫描结束后可看各进程利用率。
+    journal：断点续扫日志（utils.scan_journal.ScanJournal，调用方负责按查询定位和关闭）。每块算完就在本进程
+    追加一条 (块在 seeds 里的位置区间, 命中 gameID)，子进程不写；日志里已完成的块不再派发，命中直接产出
+    （经 replay(gameID) 还原成结果，缺省原样产出 gameID），只扫剩下的空档。有 journal 时 seeds 需能按下标取
+    （range / 列表）。hit_id(结果) 从列表形式的命中里取 gameID，缺省取整数本身或元组首项。
     """
     procs = processes or cpu_count()
-    with Pool(processes=procs) as pool:
-        return list(pool.imap(worker, seeds, chunksize=chunksize))
+    sizer = _BlockSizer(block, target_seconds, min_block, max_block, procs)
+    stats = stats if stats is not None else ScanStats()
+    total = len(seeds) if hasattr(seeds, "__len__") else None
+    contiguous = isinstance(seeds, range) and seeds.step == 1
+    if journal is not None and not hasattr(seeds, "__getitem__"):
+        seeds = list(seeds)
+        total = len(seeds)
+    hit_id = hit_id or (lambda r: r if isinstance(r, int) else r[0])
+
+    def task_for(lo: int, hi: int):
+        """位置区间 [lo, hi) 的任务参数"""
+        if contiguous:
+            return seeds.start + lo, seeds.start + hi
+        return pack_ids(seeds[lo:hi])
+
+    def tasks() -> Iterator[Tuple[Any, Any]]:
+        # meta = (位置 lo, 位置 hi, gameID 数)；没有 journal 的惰性迭代器不记位置
+        if journal is not None:
+            done_blocks = journal.completed(total)
+            pos = k = 0
+            while pos < total:
+                if k < len(done_blocks) and done_blocks[k][0] == pos:
+                    lo, hi, ids = done_blocks[k]
+                    k += 1
+                    yield (lo, hi, hi - lo), _Done((None, 0.0, ids))
+                    pos = hi
+                    continue
+                stop = done_blocks[k][0] if k < len(done_blocks) else total
+                hi = min(pos + sizer.next(total - pos), stop)
+                yield (pos, hi, hi - pos), (block_worker, task_for(pos, hi))
+                pos = hi
+            return
+        if contiguous:
+            pos = 0
+            while pos < total:
+                hi = min(pos + sizer.next(total - pos), total)
+                yield (pos, hi, hi - pos), (block_worker, task_for(pos, hi))
+                pos = hi
+            return
+        it = iter(seeds)
+        sent = 0
+        while True:
+            chunk = list(islice(it, sizer.next(None if total is None else total - sent)))
+            if not chunk:
+                return
+            sent += len(chunk)
+            yield (None, None, len(chunk)), (block_worker, pack_ids(chunk))
+
+    def on_done(meta: Tuple[Optional[int], Optional[int], int], res: Tuple[Optional[int], float, Any]) -> None:
+        lo, hi, n = meta
+        pid, seconds, out = res
+        if pid is None:  # 日志里读出的块
+            return
+        stats.record(pid, n, seconds)
+        sizer.observe(n, seconds)
+        if journal is not None:
+            journal.append(lo, hi, unpack_ids(out) if isinstance(out, bytes) else (hit_id(r) for r in out))
+
+    def run(p) -> Iterator[Any]:
+        t0 = time.perf_counter()
+        try:
+            for _, (pid, _, out) in _stream(p, tasks(), _timed_block, ordered, max_pending or procs * 4, on_done, alive):
+                if pid is None:
+                    yield from out if replay is None else map(replay, out)
+                else:
+                    yield from unpack_ids(out) if isinstance(out, bytes) else out
+        finally:
+            stats.wall = time.perf_counter() - t0
+
+    if pool is not None:
+        yield from run(pool)
+        return
+    with Pool(processes=procs, initializer=initializer, initargs=initargs) as own:
+        yield from run(own)
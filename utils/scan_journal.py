@@ -0,0 +1,148 @@
+# utils/scan_journal.py
+# 长区间扫描的断点续扫日志：每完成一块就追加一条记录（块在 seeds 序列里的位置区间 + 命中的 gameID），
+# 文件名是“查询 + 种子区间”的指纹。中断（崩溃 / Ctrl-C / 服务重启）后用同一查询重新扫描时，
+# 已完成的块直接从日志里取命中，只扫剩下的空档（见 utils.scan_engine.iter_scan_blocks 的 journal 参数）。
+#
+# 记录格式（小端）：lo int64, hi int64, 长度 uint32, crc32 uint32, 载荷（utils.scan_engine.pack_ids 打包的命中）。
+# 只有派发任务的主进程写日志，子进程不碰；每条记录一次 os.write（O_APPEND）整条追加，
+# 同一进程内再加一把锁。写到一半断掉的尾记录在下次打开时校验失败，被截掉后继续追加。
+# 日志文件带着完整的文件头一次出现（临时文件写好头再 link 过去），读的一方从不删文件。
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from array import array
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from utils.scan_engine import pack_ids, unpack_ids
+
+MAGIC = b"SDVJRNL1"
+_HEADER = struct.Struct("<qqII")
+JOURNAL_VERSION = 1  # 判定逻辑有不兼容改动时加一，旧日志自动失效（进指纹）
+
+
+def seeds_fingerprint(seeds: Sequence[int]) -> str:
+    """种子序列的指纹：连续区间只看首尾，其余按内容哈希"""
+    if isinstance(seeds, range):
+        return f"range({seeds.start},{seeds.stop},{seeds.step})"
+    return "ids:" + hashlib.sha1(pack_ids(seeds)).hexdigest()
+
+
+class ScanJournal:
+    """
+    追加式扫描日志。open() 读出已有记录并打开文件准备追加（文件损坏 / 不可写在这里就报错），
+    completed() 给出已完成且互不重叠的块（按位置排序），append(lo, hi, ids) 记一块：位置区间 [lo, hi) 已扫完，命中为 ids。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._lock = threading.Lock()
+        self._loaded: Optional[List[Tuple[int, int, array]]] = None
+        self.resumed_blocks = 0
+        self.resumed_seeds = 0
+
+    def open(self) -> "ScanJournal":
+        """读出已有记录并打开追加用的文件：不是扫描日志抛 ValueError，读写不了抛 OSError"""
+        self._loaded = self._records()
+        with self._lock:
+            if self._fd is None:
+                self._fd = self._open()
+        return self
+
+    def _records(self) -> List[Tuple[int, int, array]]:
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        if not data.startswith(MAGIC):
+            if not MAGIC.startswith(data):
+                raise ValueError(f"不是扫描日志：{self.path}")
+            return []  # 文件头不完整：当作还没有记录（文件留给写它的一方）
+        out = []
+        off = len(MAGIC)
+        while off + _HEADER.size <= len(data):
+            lo, hi, n, crc = _HEADER.unpack_from(data, off)
+            payload = data[off + _HEADER.size:off + _HEADER.size + n]
+            if n < 1 or len(payload) < n or zlib.crc32(payload) != crc:
+                break
+            out.append((lo, hi, unpack_ids(payload)))
+            off += _HEADER.size + n
+        if off < len(data):
+            # 写到一半的尾记录：截掉，后面的追加才能接在完整记录之后
+            with open(self.path, "r+b") as f:
+                f.truncate(off)
+        return out
+
+    def completed(self, total: int) -> List[Tuple[int, int, array]]:
+        """位置 [0, total) 内已完成的块：按 lo 排序，与前面已接受的块重叠的丢掉（重叠部分会重扫）"""
+        accepted = []
+        end = 0
+        records, self._loaded = (self._records() if self._loaded is None else self._loaded), None
+        for lo, hi, ids in sorted(records, key=lambda r: (r[0], -r[1])):
+            if lo >= end and lo < hi <= total:
+                accepted.append((lo, hi, ids))
+                end = hi
+        self.resumed_blocks = len(accepted)
+        self.resumed_seeds = sum(hi - lo for lo, hi, _ in accepted)
+        return accepted
+
+    def append(self, lo: int, hi: int, ids: Iterable[int]) -> None:
+        payload = pack_ids(ids)
+        record = _HEADER.pack(lo, hi, len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._fd is None:
+                self._fd = self._open()
+            os.write(self._fd, record)
+
+    def _create(self) -> None:
+        # 先在同目录的临时文件里写好文件头，再 link 成日志文件名：日志一出现就带着完整的头，
+        # 几个扫描同时建同一个日志时只有一个 link 成功，其余的直接用它
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".", suffix=".tmp",
+                                   dir=os.path.dirname(self.path) or ".")
+        try:
+            try:
+                os.write(fd, MAGIC)
+            finally:
+                os.close(fd)
+            try:
+                os.link(tmp, self.path)
+            except FileExistsError:
+                pass
+        finally:
+            os.remove(tmp)
+
+    def _open(self) -> int:
+        flags = os.O_WRONLY | os.O_APPEND | getattr(os, "O_BINARY", 0)
+        while True:
+            if not os.path.exists(self.path):
+                self._create()
+            try:
+                return os.open(self.path, flags)
+            except FileNotFoundError:
+                continue  # 刚建好又被删掉（例如有人清理日志目录）：重建
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def __enter__(self) -> "ScanJournal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_journal(directory: str, query_fingerprint: str, seeds: Sequence[int]) -> ScanJournal:
+    """
+    directory 下按 (查询指纹, 种子序列, JOURNAL_VERSION) 定位并打开日志文件（目录不存在时创建）。
+    目录不可写抛 OSError，文件不是扫描日志抛 ValueError：都在开始扫描之前。
+    """
+    os.makedirs(directory, exist_ok=True)
+    key = f"{JOURNAL_VERSION}|{query_fingerprint}|{seeds_fingerprint(seeds)}"
+    return ScanJournal(os.path.join(directory, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".journal")).open()